@@ -0,0 +1,8 @@
+##
+#  Benchmarks for Chore Chart. Run each one from the top of the repository
+#  as a module, for example:
+#
+#      python -m benchmarks.chore_memory
+#      python -m benchmarks.workload fixture.db --households 10000
+#      python -m benchmarks.menu_operations --database fixture.db --output results.json
+#      python -m benchmarks.query_plans
@@ -0,0 +1,93 @@
+##
+#  Memory used by a large catalog of chores.
+#
+#  Builds the same catalog of chores, as if read from the database for many
+#  households, in four ways and reports the memory each one holds:
+#
+#      dict        a class with the same attributes and an instance dictionary,
+#                  as Chore was before it had slots
+#      validated   Chore(name, frequency)
+#      trusted     Chore.trusted(name, frequency)
+#      shared      Chore.shared(name, frequency, validate=False)
+#
+#  Every name is a new string, as it would be when read from a row, so the
+#  saving from interning is counted.
+#
+#      python -m benchmarks.chore_memory [--count N] [--json]
+
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from chores_list_module import Chore
+
+NAMES = ("wash up", "vacuum stairs", "dusting", "empty bin", "hoover", "clean bathroom",
+         "mop kitchen", "take out recycling", "water plants", "change beds")
+
+
+class _DictChore() :
+
+    def __init__(self, the_chore_name, the_frequency) :
+        self._chore_name = the_chore_name
+        self._frequency = the_frequency
+
+
+def _rows(count) :
+    # "".join makes a new string per row, like sqlite3 does.
+    for i in range(count) :
+        yield "".join(NAMES[i % len(NAMES)]), i % Chore.MAXIMUM_CHORE_FREQUENCY + 1
+
+
+def _measure(make, count) :
+    Chore._shared.clear()
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    chores = [make(name, frequency) for name, frequency in _rows(count)]
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del chores
+    return {"bytes": current, "peak_bytes": peak, "bytes_per_chore": current / count,
+            "seconds": elapsed}
+
+
+##  Measure each way of building the catalog.
+#
+#   @param count the number of chores
+#   @return a dictionary of name -> {"bytes", "peak_bytes", "bytes_per_chore",
+#           "seconds"}
+#
+def run(count) :
+    return {
+        "dict": _measure(_DictChore, count),
+        "validated": _measure(Chore, count),
+        "trusted": _measure(Chore.trusted, count),
+        "shared": _measure(lambda name, frequency : Chore.shared(name, frequency, False), count),
+    }
+
+
+def main(argv=None) :
+    parser = argparse.ArgumentParser(description="Memory used by a catalog of chores.")
+    parser.add_argument("--count", type=int, default=1000000, help="number of chores")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.count)
+    if args.json :
+        print(json.dumps({"count": args.count, "results": results}, indent=2))
+        return 0
+
+    print("{:,} chores".format(args.count))
+    print("{:<10} {:>12} {:>10} {:>9}".format("", "MB", "bytes/each", "seconds"))
+    for name, result in results.items() :
+        print("{:<10} {:>12.1f} {:>10.1f} {:>9.2f}".format(
+            name, result["bytes"] / 1e6, result["bytes_per_chore"], result["seconds"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
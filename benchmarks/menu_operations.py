@@ -0,0 +1,354 @@
+##
+#  Latency and throughput of the Chore Chart menu operations.
+#
+#  Each operation is done the way the menu does it, through a
+#  HouseholdRegistry over a ChoreStore, against a copy of a database so the
+#  database itself is not changed:
+#
+#      create             add a new household
+#      view               read a household and render its participants and chores
+#      log                read a household and add to one of its scores
+#      leaderboard        read a household and render its leaderboard
+#      remove_participant read a household and remove one of its participants
+#      remove_chore       read a household and remove one of its chores
+#      wipe               remove every household (from a fresh copy each time)
+#
+#  Households are picked at random, with a fixed seed, from the whole
+#  database, so a database much larger than the registry cache is mostly
+#  read from disk. Each operation is timed on its own, then run a few more
+#  times under tracemalloc for its peak memory, which is not included in
+#  the timings.
+#
+#  Without --database a database is generated with benchmarks.workload.
+#  Results can be saved with --output and compared with an earlier run with
+#  --compare; the exit status is 1 if any operation's p95 latency is more
+#  than --tolerance slower.
+#
+#      python -m benchmarks.menu_operations [--database file] [--iterations N]
+#             [--output file] [--compare file] [--tolerance F] [--json]
+#             [workload arguments, see benchmarks.workload]
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import render_module
+import schema_module
+from registry_module import HouseholdRegistry
+from storage_module import ChoreStore
+
+from benchmarks import workload as workload_module
+
+try :
+    import resource
+except ImportError :
+    resource = None
+
+## Version of the results format.
+RESULTS_VERSION = 1
+
+OPERATIONS = ("create", "view", "log", "leaderboard", "remove_participant", "remove_chore", "wipe")
+
+DEFAULT_ITERATIONS = 200
+DEFAULT_WIPES = 5
+DEFAULT_TOLERANCE = 0.25
+
+# Extra runs of each operation under tracemalloc.
+_TRACED_RUNS = 10
+
+
+##  Return the p-th percentile of sorted values, by nearest rank.
+#
+def percentile(values, p) :
+    if not values :
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def _summary(seconds) :
+    seconds = sorted(seconds)
+    total = sum(seconds)
+    return {"count": len(seconds), "seconds": total,
+            "ops_per_second": len(seconds) / total if total else None,
+            "p50_ms": percentile(seconds, 50) * 1000, "p95_ms": percentile(seconds, 95) * 1000,
+            "p99_ms": percentile(seconds, 99) * 1000, "max_ms": seconds[-1] * 1000}
+
+
+class _Bench() :
+
+    ## Set up a copy of the database to run operations against.
+    #
+    #  @param fixture the database file, which is not changed
+    #  @param directory a directory for the copies
+    #  @param workload the Workload used for the households that are created
+    #  @param seed the random seed for picking households
+    #
+    def __init__(self, fixture, directory, workload, seed) :
+        self.fixture = fixture
+        self.directory = directory
+        self.workload = workload
+        self.rng = random.Random(seed)
+        self.path = self._copy("bench.db")
+        self.store = ChoreStore(self.path)
+        self.registry = HouseholdRegistry(self.store)
+        self.names = self.registry.names()
+        self.created = 0
+        self._removable = None
+        self._wipe_store = None
+
+    def _copy(self, name) :
+        path = os.path.join(self.directory, name)
+        for suffix in ("-wal", "-shm") :
+            if os.path.exists(path + suffix) :
+                os.remove(path + suffix)
+        shutil.copyfile(self.fixture, path)
+        return path
+
+    def close(self) :
+        self.store.close()
+        if self._wipe_store is not None :
+            self._wipe_store.close()
+
+    def _household(self) :
+        return self.registry.get(self.rng.choice(self.names))
+
+    ## Return an action for each run of the operation, and a function to
+    #  call after each run, or None.
+    #
+    def actions(self, operation) :
+        return getattr(self, "_" + operation)()
+
+    def _create(self) :
+        participant_names = workload_module.participant_names(self.workload)
+        chores = workload_module.chores(self.workload)
+
+        def create() :
+            self.created = self.created + 1
+            self.registry.add_to_household("BenchNew{:07d}".format(self.created),
+                                           participant_names, chores)
+        return create, None
+
+    def _view(self) :
+        return lambda : render_module.render_household(self._household()), None
+
+    def _log(self) :
+        def log() :
+            household = self._household()
+            self.registry.increment_score(household.household_name,
+                                          self.rng.choice(household.chore_log.participants),
+                                          self.rng.choice(household.chore_log.chores), 1)
+        return log, None
+
+    def _leaderboard(self) :
+        return lambda : render_module.render_leaderboard(self._household()), None
+
+    def _next_removable(self) :
+        # Each removal is from a different household, so none runs out.
+        if self._removable is None :
+            self._removable = list(self.names)
+            self.rng.shuffle(self._removable)
+        if not self._removable :
+            raise ValueError("There are not enough households to remove from.")
+        return self.registry.get(self._removable.pop())
+
+    def _remove_participant(self) :
+        def remove() :
+            household = self._next_removable()
+            self.registry.remove_participant(household.household_name,
+                                             household.chore_log.participants[-1])
+        return remove, None
+
+    def _remove_chore(self) :
+        def remove() :
+            household = self._next_removable()
+            self.registry.remove_chore(household.household_name, household.chore_log.chores[-1])
+        return remove, None
+
+    def _wipe(self) :
+        # A fresh copy for every wipe, opened and read before the clock starts.
+        registries = []
+
+        def setup() :
+            self._wipe_store = ChoreStore(self._copy("wipe.db"))
+            registries[:] = [HouseholdRegistry(self._wipe_store)]
+            registries[0].names()
+
+        def teardown() :
+            self._wipe_store.close()
+            setup()
+
+        setup()
+        return lambda : registries[0].wipe(), teardown
+
+
+##  Time one operation.
+#
+#   @param bench a _Bench
+#   @param operation one of OPERATIONS
+#   @param iterations the number of timed runs
+#   @return a summary of the timings, with "peak_bytes"
+#
+def time_operation(bench, operation, iterations) :
+    action, teardown = bench.actions(operation)
+    seconds = []
+    for i in range(iterations) :
+        started = time.perf_counter()
+        action()
+        seconds.append(time.perf_counter() - started)
+        if teardown is not None :
+            teardown()
+
+    peak = 0
+    for i in range(min(_TRACED_RUNS, iterations)) :
+        tracemalloc.start()
+        action()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        if teardown is not None :
+            teardown()
+
+    result = _summary(seconds)
+    result["peak_bytes"] = peak
+    return result
+
+
+##  Run every operation against a database.
+#
+#   @param fixture the database file, which is not changed
+#   @param workload the Workload for the households created, and the sizes
+#          reported if the database was generated
+#   @param iterations the number of timed runs of each operation
+#   @param wipes the number of timed runs of wipe
+#   @param operations the operations to run
+#   @return the results, as a dictionary ready for JSON
+#
+def run(fixture, workload, iterations=DEFAULT_ITERATIONS, wipes=DEFAULT_WIPES,
+        operations=OPERATIONS) :
+    directory = tempfile.mkdtemp()
+    bench = _Bench(fixture, directory, workload, workload.seed)
+    results = {}
+    try :
+        for operation in operations :
+            results[operation] = time_operation(bench, operation,
+                                                wipes if operation == "wipe" else iterations)
+        cache = bench.registry.cache_info()
+        households = len(bench.names)
+    finally :
+        bench.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {"version": RESULTS_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+            "schema_version": schema_module.SCHEMA_VERSION,
+            "database_bytes": os.path.getsize(fixture), "households": households,
+            "workload": workload._asdict(), "iterations": iterations,
+            "registry_cache": cache,
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+            "operations": results}
+
+
+##  Compare two sets of results.
+#
+#   @param old the earlier results
+#   @param new the later results
+#   @param tolerance how much slower an operation's p95 latency may get, as a
+#          fraction
+#   @return a list of (operation, old p95 ms, new p95 ms, ratio, regressed)
+#           for the operations in both
+#
+def compare(old, new, tolerance=DEFAULT_TOLERANCE) :
+    rows = []
+    for operation, result in new["operations"].items() :
+        before = old["operations"].get(operation)
+        if before is None :
+            continue
+        ratio = result["p95_ms"] / before["p95_ms"] if before["p95_ms"] else float("inf")
+        rows.append((operation, before["p95_ms"], result["p95_ms"], ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def _print_results(results) :
+    print("{:,} households, {} iterations, database {:.1f} MB".format(
+        results["households"], results["iterations"], results["database_bytes"] / 1e6))
+    print("{:<19} {:>9} {:>9} {:>9} {:>9} {:>10}".format(
+        "", "ops/s", "p50 ms", "p95 ms", "p99 ms", "peak KB"))
+    for operation, result in results["operations"].items() :
+        print("{:<19} {:>9.1f} {:>9.3f} {:>9.3f} {:>9.3f} {:>10.1f}".format(
+            operation, result["ops_per_second"], result["p50_ms"], result["p95_ms"],
+            result["p99_ms"], result["peak_bytes"] / 1024))
+    print("registry cache: {}".format(results["registry_cache"]))
+    if results["max_rss_kb"] is not None :
+        print("peak resident memory: {:,} KB".format(results["max_rss_kb"]))
+
+
+def main(argv=None) :
+    parser = argparse.ArgumentParser(description="Time the Chore Chart menu operations.")
+    parser.add_argument("--database", help="an existing database to copy, instead of generating one")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS,
+                        help="timed runs of each operation")
+    parser.add_argument("--wipes", type=int, default=DEFAULT_WIPES, help="timed runs of wipe")
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=list(OPERATIONS),
+                        help="the operations to run")
+    parser.add_argument("--output", help="save the results as JSON to this file")
+    parser.add_argument("--compare", help="compare with results saved by an earlier run")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="fraction by which p95 latency may grow before --compare fails")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    workload_module.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try :
+        workload = workload_module.from_arguments(args)
+    except ValueError as err :
+        parser.error(str(err))
+    if args.iterations < 1 or args.wipes < 1 :
+        parser.error("--iterations and --wipes must be at least 1.")
+    if args.database is None and min(workload.participants, workload.chores) < 3 :
+        # A removal must leave a household its minimum of two of each.
+        parser.error("--participants and --chores must be at least 3.")
+
+    directory = None
+    fixture = args.database
+    if fixture is None :
+        directory = tempfile.mkdtemp()
+        fixture = os.path.join(directory, "fixture.db")
+        workload_module.generate(fixture, workload)
+    try :
+        results = run(fixture, workload, args.iterations, args.wipes, args.operations)
+    finally :
+        if directory is not None :
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if args.output :
+        with open(args.output, "w") as results_file :
+            json.dump(results, results_file, indent=2)
+    if args.json :
+        print(json.dumps(results, indent=2))
+    else :
+        _print_results(results)
+
+    status = 0
+    if args.compare :
+        with open(args.compare) as results_file :
+            old = json.load(results_file)
+        print("\n{:<19} {:>12} {:>12} {:>7}".format("p95 ms", "before", "after", "ratio"))
+        for operation, before, after, ratio, regressed in compare(old, results, args.tolerance) :
+            print("{:<19} {:>12.3f} {:>12.3f} {:>7.2f}{}".format(
+                operation, before, after, ratio, "  REGRESSED" if regressed else ""))
+            if regressed :
+                status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
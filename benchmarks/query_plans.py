@@ -0,0 +1,243 @@
+##
+#  Query plan guard for Chore Chart.
+#
+#  Runs the household, logging, leaderboard and removal paths against a copy
+#  of a database with a Profiler that keeps every statement (slow_ms=0),
+#  then checks the EXPLAIN QUERY PLAN of each one. A statement fails if its
+#  plan scans HouseData, ChoreData or ScoreLog without an index. Foreign key
+#  cascades do not appear in the plans, so the lookup each cascade makes in
+#  a child table is checked the same way.
+#
+#  Each failure is reported with the path and the function that ran the
+#  statement. The exit status is 1 if there are any, so the guard can be run
+#  after every schema or query change:
+#
+#      python -m benchmarks.query_plans [--database file] [--json]
+#             [workload arguments, see benchmarks.workload]
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+from collections import namedtuple
+
+import profile_module
+import rollups_module
+from chores_list_module import Chore
+from registry_module import HouseholdRegistry
+from storage_module import ChoreStore
+
+from benchmarks import workload as workload_module
+
+## The tables that must not be scanned without an index.
+GUARDED_TABLES = ("HouseData", "ChoreData", "ScoreLog")
+
+## The paths that are run, in order.
+PATHS = ("household", "logging", "leaderboard", "removal")
+
+## The path given to foreign key cascades.
+CASCADE = "removal (cascade)"
+
+## A statement whose plan scans a guarded table without an index.
+#  caller    the function that ran it, as "module.function:line"
+#  step      the line of the plan that scans the table
+#
+PlanProblem = namedtuple("PlanProblem", ["path", "caller", "sql", "step"])
+
+# Small households from the workload, so the guard runs in a few seconds.
+_DEFAULT_WORKLOAD = workload_module.Workload(households=2000, participants=5, chores=5,
+                                             logs=10, seed=1)
+
+_SCAN = re.compile(r"\s*SCAN (\w+)(.*)")
+_ALIAS_AS = re.compile(r"\b(\w+)\s+AS\s+(\w+)", re.IGNORECASE)
+# FROM Table alias or JOIN Table alias, where the word after the table is
+# not the next clause.
+_BARE_ALIAS = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)\s+(?!(?:AS|ON|USING|WHERE|GROUP|ORDER|LIMIT|"
+                         r"HAVING|WINDOW|UNION|EXCEPT|INTERSECT|RETURNING|INDEXED|NOT|"
+                         r"JOIN|LEFT|RIGHT|FULL|INNER|OUTER|CROSS|NATURAL)\b)(\w+)",
+                         re.IGNORECASE)
+
+
+##  Return the names a statement uses for each guarded table: the table
+#   name and any alias given to it, with or without AS. An alias that the
+#   statement also gives to something else, such as a common table
+#   expression, is left out, as the plan does not say which one a step is
+#   for.
+#
+#   @return a dictionary of name -> table
+#
+def table_names(sql, tables=GUARDED_TABLES) :
+    names = {table: table for table in tables}
+    ambiguous = set()
+    for source, alias in _ALIAS_AS.findall(sql) + _BARE_ALIAS.findall(sql) :
+        table = next((table for table in tables if table.lower() == source.lower()), None)
+        if table is None or names.get(alias, table) != table :
+            ambiguous.add(alias)
+        else :
+            names[alias] = table
+    for alias in ambiguous :
+        names.pop(alias, None)
+    return names
+
+
+##  Return the steps of a plan that scan a guarded table without an index.
+#
+#   @param sql the statement
+#   @param plan its EXPLAIN QUERY PLAN, as from profile_module.query_plan
+#   @return a list of plan lines
+#
+def unindexed_scans(sql, plan, tables=GUARDED_TABLES) :
+    names = table_names(sql, tables)
+    steps = []
+    for step in plan or [] :
+        match = _SCAN.match(step)
+        if match and match.group(1) in names and "INDEX" not in match.group(2) :
+            steps.append(step.strip())
+    return steps
+
+
+##  Check the plans of the statements a profiler kept.
+#
+#   @param profiler a Profiler created with slow_ms=0
+#   @param paths only check statements run in these actions
+#   @return a list of PlanProblem, one per statement and function
+#
+def check_statements(profiler, paths=PATHS) :
+    problems = []
+    seen = set()
+    for query in profiler.slow_queries() :
+        if query.action not in paths or (query.caller, query.sql) in seen :
+            continue
+        seen.add((query.caller, query.sql))
+        for step in unindexed_scans(query.sql, query.plan) :
+            problems.append(PlanProblem(query.action, query.caller, " ".join(query.sql.split()), step))
+    return problems
+
+
+##  Check the lookups that ON DELETE cascades make in the guarded tables.
+#
+#   @param conn an open sqlite3 connection
+#   @return a list of PlanProblem
+#
+def check_cascades(conn, tables=GUARDED_TABLES) :
+    problems = []
+    for table in tables :
+        keys = {}
+        for row in conn.execute("PRAGMA foreign_key_list({})".format(table)) :
+            keys.setdefault((row[0], row[2]), []).append(row[3])
+        for (key, parent), columns in sorted(keys.items()) :
+            sql = "SELECT 1 FROM {} WHERE {}".format(
+                table, " AND ".join(column + "=?" for column in columns))
+            plan = profile_module.query_plan(conn, sql, [None] * len(columns))
+            for step in unindexed_scans(sql, plan, tables) :
+                problems.append(PlanProblem(CASCADE, "foreign key {}({}) -> {}".format(
+                    table, ", ".join(columns), parent), sql, step))
+    return problems
+
+
+def _run_paths(registry, store, profiler) :
+    names = registry.names()
+    house_name = names[len(names) // 2]
+
+    with profiler.action("household") :
+        registry.page()
+        registry.page(names[0], 20)
+        registry.page(prefix=house_name[:-2])
+        registry.page(contains=house_name[-4:])
+        registry.page(contains=house_name[-2:])
+        registry.exists(house_name)
+        household = registry.get(house_name)
+        store.participant_names(house_name)
+        store.chores(house_name)
+        registry.add_to_household(house_name, ["guardnew"], [Chore("guard chore", 1)])
+
+    person_name = household.chore_log.participants[0]
+    chore_name = household.chore_log.chores[0]
+    with profiler.action("logging") :
+        store.increment_score(house_name, person_name, chore_name, 1)
+        store.log_scores(house_name, [(person_name, chore_name, 1), ("guardnew", "guard chore", 2)])
+        store.history(house_name)
+        store.history(house_name, person_name)
+        store.get_score(house_name, person_name, chore_name)
+
+    week = rollups_module.recent_window("week", 4)
+    with profiler.action("leaderboard") :
+        store.leaderboard(house_name)
+        store.leaderboard(house_name, 3)
+        store.window_leaderboard(house_name, "week", *week)
+        store.participant_rank(house_name, person_name)
+        store.top_participants(10)
+        store.window_top_participants("week", week[0], week[1], 10)
+
+    with profiler.action("removal") :
+        registry.remove_participant(house_name, "guardnew")
+        registry.remove_chore(house_name, chore_name)
+        registry.remove_household(names[0])
+
+
+##  Run the paths against a copy of a database and check their plans.
+#
+#   @param fixture the database file, which is not changed
+#   @return a tuple (problems, number of statements checked)
+#
+def run(fixture) :
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "plans.db")
+    shutil.copyfile(fixture, path)
+    profiler = profile_module.Profiler(slow_ms=0)
+    store = ChoreStore(path, profiler=profiler)
+    try :
+        _run_paths(HouseholdRegistry(store), store, profiler)
+        problems = check_statements(profiler) + check_cascades(store.connection())
+        checked = len({(query.caller, query.sql) for query in profiler.slow_queries()
+                       if query.action in PATHS})
+    finally :
+        store.close()
+        shutil.rmtree(directory, ignore_errors=True)
+    return problems, checked
+
+
+def main(argv=None) :
+    parser = argparse.ArgumentParser(description="Check the query plans of Chore Chart's SQL.")
+    parser.add_argument("--database", help="an existing database to copy, instead of generating one")
+    parser.add_argument("--json", action="store_true", help="print the problems as JSON")
+    workload_module.add_arguments(parser)
+    parser.set_defaults(**_DEFAULT_WORKLOAD._asdict())
+    args = parser.parse_args(argv)
+
+    try :
+        workload = workload_module.from_arguments(args)
+    except ValueError as err :
+        parser.error(str(err))
+    if args.database is None and min(workload.participants, workload.chores) < 2 :
+        # The removal path must leave a household its minimum of two of each.
+        parser.error("--participants and --chores must be at least 2.")
+
+    directory = None
+    fixture = args.database
+    if fixture is None :
+        directory = tempfile.mkdtemp()
+        fixture = os.path.join(directory, "fixture.db")
+        workload_module.generate(fixture, workload)
+    try :
+        problems, checked = run(fixture)
+    finally :
+        if directory is not None :
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if args.json :
+        print(json.dumps({"checked": checked,
+                          "problems": [problem._asdict() for problem in problems]}, indent=2))
+    else :
+        for problem in problems :
+            print("{} {}: {}\n    {}".format(problem.path, problem.caller, problem.step, problem.sql))
+        print("{} statements checked, {} unindexed scan{} of {}".format(
+            checked, len(problems), "" if len(problems) == 1 else "s", ", ".join(GUARDED_TABLES)))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
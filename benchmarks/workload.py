@@ -0,0 +1,136 @@
+##
+#  Synthetic Chore Chart databases for benchmarking.
+#
+#  Writes a database of generated households through ChoreStore, so it has
+#  the same schema, totals and events as one built from the menu. The same
+#  seed and sizes always give the same database. The sizes are not checked
+#  against Participants.MAXIMUM_HOUSEHOLD_SIZE or
+#  ChoresList.MAXIMUM_NUMBER_OF_CHORES, so larger households can be used
+#  for stress testing.
+#
+#      python -m benchmarks.workload file [--households N] [--participants N]
+#                                         [--chores N] [--logs N] [--seed N]
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+
+from chores_list_module import Chore
+from household_module import Household
+from storage_module import ChoreStore
+
+## The size of a generated database.
+#  logs       the number of chore log entries written per household
+#
+Workload = namedtuple("Workload", ["households", "participants", "chores", "logs", "seed"])
+
+DEFAULT_WORKLOAD = Workload(households=1000, participants=5, chores=5, logs=20, seed=1)
+
+# Households written per transaction.
+_BATCH_SIZE = 500
+
+# Chore log entries are small counts, as they would be for one week.
+_MOST_COMPLETED = min(5, Household.MAXIMUM_CHORES_DONE)
+
+
+##  Return the name of the i-th generated household.
+#
+def household_name(i) :
+    return "House{:07d}".format(i)
+
+
+##  Return the participant names of a generated household.
+#
+def participant_names(workload) :
+    return ["person{:03d}".format(i) for i in range(workload.participants)]
+
+
+##  Return the chores of a generated household.
+#
+def chores(workload) :
+    return [Chore.trusted("chore {:03d}".format(i), i % Chore.MAXIMUM_CHORE_FREQUENCY + 1)
+            for i in range(workload.chores)]
+
+
+##  Return the chore log entries of the i-th generated household.
+#
+#   @return a list of (person_name, chore_name, number_completed)
+#
+def log_entries(workload, i) :
+    rng = random.Random("{}:{}".format(workload.seed, i))
+    names = participant_names(workload)
+    chore_names = [chore.chore_name for chore in chores(workload)]
+    return [(rng.choice(names), rng.choice(chore_names), rng.randint(1, _MOST_COMPLETED))
+            for entry in range(workload.logs)]
+
+
+##  Write a generated database. An existing file is replaced.
+#
+#   @param path the database file
+#   @param workload a Workload
+#   @return the number of seconds taken
+#
+def generate(path, workload=DEFAULT_WORKLOAD) :
+    for suffix in ("", "-wal", "-shm") :
+        if os.path.exists(path + suffix) :
+            os.remove(path + suffix)
+
+    started = time.perf_counter()
+    store = ChoreStore(path)
+    names = participant_names(workload)
+    the_chores = chores(workload)
+    try :
+        for first in range(0, workload.households, _BATCH_SIZE) :
+            with store.transaction() :
+                for i in range(first, min(first + _BATCH_SIZE, workload.households)) :
+                    store.add_to_household(household_name(i), names, the_chores)
+                    store.log_scores(household_name(i), log_entries(workload, i))
+    finally :
+        store.close()
+    return time.perf_counter() - started
+
+
+##  Add the workload arguments to an argument parser.
+#
+def add_arguments(parser) :
+    parser.add_argument("--households", type=int, default=DEFAULT_WORKLOAD.households,
+                        help="number of households")
+    parser.add_argument("--participants", type=int, default=DEFAULT_WORKLOAD.participants,
+                        help="participants per household")
+    parser.add_argument("--chores", type=int, default=DEFAULT_WORKLOAD.chores,
+                        help="chores per household")
+    parser.add_argument("--logs", type=int, default=DEFAULT_WORKLOAD.logs,
+                        help="chore log entries per household")
+    parser.add_argument("--seed", type=int, default=DEFAULT_WORKLOAD.seed,
+                        help="random seed")
+
+
+##  Return the Workload given by parsed arguments.
+#
+def from_arguments(args) :
+    workload = Workload(args.households, args.participants, args.chores, args.logs, args.seed)
+    if min(workload.households, workload.participants, workload.chores) < 1 or workload.logs < 0 :
+        raise ValueError("Households, participants and chores must be at least 1, and logs at least 0.")
+    return workload
+
+
+def main(argv=None) :
+    parser = argparse.ArgumentParser(description="Write a generated Chore Chart database.")
+    parser.add_argument("file", help="the database file to write")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try :
+        workload = from_arguments(args)
+    except ValueError as err :
+        parser.error(str(err))
+    seconds = generate(args.file, workload)
+    print("Wrote {:,} households to {} in {:.2f}s".format(workload.households, args.file, seconds))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,26 +4,58 @@
 #
 #  Author: Ryan Sulit and Mohammed Hasan
 #  Date: April 2019
+#
+#  Run without arguments for the menu, or with a subcommand for scripted use
+#  (see cli_module.py): python chore_chart.py --help
+#  Run with --profile alone for the menu with a summary of the SQL run by
+#  each action when it quits.
 
 from household_module import Household
 from chores_list_module import ChoresList, Chore
 from participants_list_module import Participants
+from storage_module import ChoreStore
+from registry_module import HouseholdRegistry
+from leaderboard_module import leaderboard_string
+import cli_module
+import profile_module
+import sys
 
 ## Constants used for validation
 
 MENU_CHOICES = ['A', 'C', 'V', 'L', 'S', 'Q', 'E', 'W', 'R']
 
-## Importing SQLite for database storage
+## SQLite database storage. The file is opened, and its tables created or
+#  upgraded, the first time the store is used.
+#
+#  Writes are committed in groups of COMMIT_EVERY, or once the oldest
+#  uncommitted write is COMMIT_INTERVAL_MS old. The defaults commit every
+#  write as soon as it is made. With INCREMENTAL_VACUUM the file shrinks
+#  when households, participants or chores are removed.
 
-import sqlite3
 sqlite_file = 'chore_chart.db'  
-conn = sqlite3.connect(sqlite_file)
-c = conn.cursor()
+COMMIT_EVERY = 1
+COMMIT_INTERVAL_MS = None
+INCREMENTAL_VACUUM = False
+store = ChoreStore(sqlite_file, commit_every=COMMIT_EVERY, commit_interval_ms=COMMIT_INTERVAL_MS,
+                   incremental_vacuum=INCREMENTAL_VACUUM)
+
+## The households, read from the store when first needed. Up to
+#  HOUSEHOLDS_IN_MEMORY households are kept in memory. The menu writes through
+#  the registry so that it stays up to date.
+
+HOUSEHOLDS_IN_MEMORY = 128
+registry = HouseholdRegistry(store, capacity=HOUSEHOLDS_IN_MEMORY)
+
+## Number of households listed at a time when choosing a household.
+HOUSEHOLDS_PER_PAGE = 20
 
-## Creating tables within database file
-c.execute('CREATE TABLE IF NOT EXISTS HouseData (house_name TEXT, person_num INTEGER, person_name TEXT)')
-c.execute('CREATE TABLE IF NOT EXISTS ChoreData (house_name TEXT, chore_num INTEGER, chore_name TEXT, chore_freq INTEGER)')
-c.execute('CREATE TABLE IF NOT EXISTS ScoreLog (house_name TEXT, person_num INTEGER, person_name TEXT, chore_name TEXT, chore_score INTEGER DEFAULT 0)')
+## With --profile, statements slower than PROFILE_SLOW_MS milliseconds are
+#  printed with their query plan as they run.
+PROFILE_SLOW_MS = profile_module.DEFAULT_SLOW_MS
+
+## The action each menu option's SQL is grouped under when profiling.
+MENU_ACTIONS = {'C': 'create', 'E': 'add', 'W': 'wipe', 'R': 'remove', 'V': 'view',
+                'L': 'log', 'S': 'leaderboard'}
 
 ## Prints the menu for the application. 
 #
@@ -64,9 +96,10 @@ def create_household(all_households) :
     household_obj = household_exists(new_household_name, all_households)
     
     if  household_obj == None:
-        members_set = get_participants_names(new_household_name)
-        chores_set = get_chores(new_household_name, members_set)
+        members_set = get_participants_names()
+        chores_set = get_chores()
         household_obj = Household(new_household_name, members_set, chores_set)
+        registry.add_to_household(new_household_name, members_set, chores_set)
         all_households.append(household_obj)        
         
     else:
@@ -83,20 +116,7 @@ def create_household(all_households) :
 #
 #
 def household_exists(new_household_name, all_households) :
-    h_obj = None
-
-    c.execute('SELECT DISTINCT house_name FROM HouseData')
-    allRows = c.fetchall()
-    
-    existing_households = []
-    for item in allRows:
-        existing_households.append(item[0])
-        
-    for household in existing_households:
-        if household == new_household_name :
-            h_obj = household
-
-    return h_obj
+    return registry.get(new_household_name)
         
 
 ##  Prompts the user for a household name and checks that the name is
@@ -146,12 +166,11 @@ def get_chore_frequency() :
 
 
 ##  Gets the names for the people in the household and stores them in a set
-#   In addition, stores information into a database file
 #   Invariants: duplicate names are not allowed
 #
 #   @return a set containing the names.
 #
-def get_participants_names(new_household_name):
+def get_participants_names():
     household_names = set()
     
     name = "AAA"    # dummy value so that we can start the while loop
@@ -175,13 +194,6 @@ def get_participants_names(new_household_name):
                 print(("\n\t\tSorry, you already have a household member called {}, " + \
                       "try again.").format(name))       
     
-    #Storing to database
-    houseTitleDB = new_household_name
-    namesListDB = list(household_names)
-    personNumberDB = range(len(namesListDB))
-    for i in range(len(namesListDB)):
-            c.execute("INSERT INTO HouseData (house_name, person_num, person_name) VALUES (?, ?, ?)", (houseTitleDB, int(personNumberDB[i])+1, namesListDB[i]))
-    
     return household_names
 
 
@@ -213,7 +225,7 @@ def get_person_name(participant_number) :
     return person_name
 
 
-##  Gets the chores. Stores chores into a set and a database file.
+##  Gets the chores. Stores chores into a set.
 #
 #   Invariants: duplicate chore names are not allowed,
 #               names must consist of words which are alphanumeric characters,
@@ -224,11 +236,9 @@ def get_person_name(participant_number) :
 #
 #   @return a list containing chore objects.
 #
-def get_chores(new_household_name, members_set):
+def get_chores():
 
     chores_list = set()
-    chores_frequency_list = set()
-    chores_name_list = set()
     new_chore = "AAA"    # dummy value so that we can start the while loop
     number_of_chores = 0
 
@@ -244,30 +254,13 @@ def get_chores(new_household_name, members_set):
             try :
                 ChoresList.is_unique(new_chore, chores_list)
                 chore_frequency = get_chore_frequency()
-                chores_frequency_list.add(chore_frequency)
                 chore_obj = Chore(new_chore, chore_frequency)
                 chores_list.add(chore_obj)
-                chores_name_list.add(new_chore)
                 number_of_chores = number_of_chores + 1
                 
             except ValueError as err :
                 print(err)
     
-    # Storing to database
-    houseTitleDB = new_household_name
-    namesListDB = list(members_set)
-    personNumberDB = range(len(namesListDB))
-    choresListDB = list(chores_name_list)
-    choreNumberDB = range(len(choresListDB))
-    choreFreqDB = list(chores_frequency_list)
-    
-    for i in range(len(choresListDB)):
-        c.execute("INSERT INTO ChoreData (house_name, chore_num, chore_name, chore_freq) VALUES (?, ?, ?, ?)", (houseTitleDB, int(choreNumberDB[i])+1, str(choresListDB[i]), choreFreqDB[i]))
-    
-    for i in range(len(namesListDB)):
-        for j in range(len(choresListDB)):
-            c.execute("INSERT INTO ScoreLog (house_name, person_num, person_name, chore_name) VALUES (?, ?, ?, ?)", (houseTitleDB, int(personNumberDB[i])+1, namesListDB[i], str(choresListDB[j])))
-    
     return chores_list 
 
 
@@ -327,102 +320,84 @@ def is_blank(any_string):
         return False
 
 
-##  View household.
+##  Prints the households a page at a time and prompts the user to choose
+#   one. Pressing Enter shows the next page, and /text lists the households
+#   whose names contain text.
 #   @param all_households, a list of household objects
+#   @return the household object, or None if the household does not exist.
 #
-def view_household(all_households):
-    #Obtain household name
-    c.execute('SELECT DISTINCT house_name FROM HouseData')
-    allRows = c.fetchall()
-    
-    householdPrintDB = []
-    for item in allRows:
-        householdPrintDB.append(item[0])
-    
-    print("\n \nHouseholds:")
+def choose_household(all_households):
+    after = None
+    search = None
     counter = 1
-    for i in range(len(householdPrintDB)):
-        print("\t " + str(counter) + ". " + householdPrintDB[i])
-        counter += 1
-    
-    
-    input_household = input("\nEnter the desired household name: ")
+    input_household = ""
+
+    print("\n \nHouseholds:")
+    while True :
+        page = registry.page(after, HOUSEHOLDS_PER_PAGE, contains=search)
+        for household_name in page.names:
+            print("\t " + str(counter) + ". " + household_name)
+            counter += 1
+
+        prompt = "\nEnter the desired household name"
+        if page.next != None:
+            prompt = prompt + ", Enter for more households"
+        input_household = input(prompt + " or /text to search: ")
+
+        if input_household == "" and page.next != None:
+            after = page.next
+        elif input_household.startswith("/"):
+            search = input_household[1:].strip() or None
+            after = None
+            counter = 1
+            print("\n \nHouseholds" + ("" if search == None else " containing " + search) + ":")
+        else:
+            break
+
     chosen_household = household_exists(input_household, all_households)
     
     #Validation of input
     if chosen_household == None:        
         print("Household {} does not exist, returning to the menu.".format(input_household))
-    else:
-        #Obtain participant list
-        c.execute('SELECT * FROM HouseData WHERE house_name=?', (chosen_household,))
-        allRows = c.fetchall()
 
-        namePrintingDB = []
-        for item in allRows:
-            namePrintingDB.append(item[2])
+    return chosen_household
 
-        print("\nHousehold: " + input_household)
+
+##  View household.
+#   @param all_households, a list of household objects
+#   @return the household object, or None if the household does not exist.
+#
+def view_household(all_households):
+    chosen_household = choose_household(all_households)
+    
+    if chosen_household != None:
+        print("\nHousehold: " + chosen_household.household_name)
         print("\nParticipants:")
         counter = 1
-        for i in range(len(namePrintingDB)):
-            print("\t " + str(counter) + ". " + namePrintingDB[i])
+        for person_name in chosen_household.chore_log.participants:
+            print("\t " + str(counter) + ". " + person_name)
             counter += 1
 
-        #Obtain chore list incl. frequency
-        c.execute('SELECT * FROM ChoreData WHERE house_name=?', (chosen_household,))
-        allRows = c.fetchall()
-
-        chorePrintingDB = []
-        for item in allRows:
-            chorePrintingDB.append(item[2])
-        chorefreqPrintingDB = []
-        for item in allRows:
-            chorefreqPrintingDB.append(item[3])
-
         print("\n \nWeekly Chores:")
         counter = 1
-        for i in range(len(chorePrintingDB)):
-            print("\t " + str(counter) + ". " + chorePrintingDB[i] + " (" + str(chorefreqPrintingDB[i]) + ")")   
+        for chore_name in chosen_household.chore_log.chores:
+            chore_freq = chosen_household.chores.get(chore_name).frequency
+            print("\t " + str(counter) + ". " + chore_name + " (" + str(chore_freq) + ")")   
             counter += 1
 
-    return    
+    return chosen_household
   
 
 ##  Log chores. Contains part of the view_household 
 # @param all_households, a list of household objects
 #
 def log_chores(all_households):
-    #Obtain household name
-    c.execute('SELECT DISTINCT house_name FROM HouseData')
-    allRows = c.fetchall()
+    chosen_household = choose_household(all_households)
     
-    householdPrintDB = []
-    for item in allRows:
-        householdPrintDB.append(item[0])
-    
-    print("\n \nHouseholds:")
-    counter = 1
-    for i in range(len(householdPrintDB)):
-        print("\t " + str(counter) + ". " + householdPrintDB[i])
-        counter += 1
-    
-    
-    input_household = input("\nEnter the desired household name: ")
-    chosen_household = household_exists(input_household, all_households)
-    
-    #Validation of input
-    if chosen_household == None:        
-        print("Household {} does not exist, returning to the menu.".format(input_household))
-    else:
-        #Obtain participant list
-        c.execute('SELECT * FROM HouseData WHERE house_name=?', (chosen_household,))
-        allRows = c.fetchall()
-
-        namePrintingDB = []
-        for item in allRows:
-            namePrintingDB.append(item[2])
+    if chosen_household != None:
+        namePrintingDB = chosen_household.chore_log.participants
 
-        print("\nHousehold: " + input_household)
+        print("\nHousehold: " + chosen_household.household_name)
         print("\nParticipants:")
         counter = 1
         for i in range(len(namePrintingDB)):
@@ -433,12 +408,7 @@ def log_chores(all_households):
         
         print("\nYou are logging " + namePrintingDB[listNumberDB-1] + "'s chores.")
         
-        c.execute('SELECT * FROM ChoreData WHERE house_name=?', (chosen_household,))
-        allRows = c.fetchall()
-        
-        chorePrintingDB = []
-        for item in allRows:
-            chorePrintingDB.append(item[2])
+        chorePrintingDB = chosen_household.chore_log.chores
         
         print("\n \nWeekly Chores:")
         counter = 1
@@ -448,20 +418,21 @@ def log_chores(all_households):
         
         chorelistNumberDB = int(input("\nEnter the chore number: "))
         
-        scorePrinting = []
-        c.execute('SELECT chore_score FROM ScoreLog WHERE house_name=? AND person_name=? AND chore_name=? ', (chosen_household, namePrintingDB[listNumberDB-1], chorePrintingDB[listNumberDB-1]))
-        allRows = c.fetchall()
-        for item in allRows:
-            scorePrinting.append(item[0])
+        person_name = namePrintingDB[listNumberDB-1]
+        chore_name = chorePrintingDB[chorelistNumberDB-1]
+        current_score = chosen_household.chore_log[person_name][chore_name]
         
-        print("\n{} has done {} {} times.".format(namePrintingDB[listNumberDB-1], chorePrintingDB[chorelistNumberDB-1], scorePrinting[0]))
+        print("\n{} has done {} {} times.".format(person_name, chore_name, current_score))
         
-        moreTimes = int(input("\nHow many more times has {} done {}:".format(namePrintingDB[listNumberDB-1], chorePrintingDB[chorelistNumberDB-1])))
-        updatedScore = scorePrinting[0] + moreTimes
-        print("\n{} has done {} {} more times.".format(namePrintingDB[listNumberDB-1], chorePrintingDB[chorelistNumberDB-1], str(updatedScore)))
+        moreTimes = int(input("\nHow many more times has {} done {}:".format(person_name, chore_name)))
         
         #Update database
-        c.execute('UPDATE ScoreLog SET chore_score=? WHERE house_name=? AND person_name=? AND chore_name=? ', (updatedScore, chosen_household, namePrintingDB[listNumberDB-1], chorePrintingDB[chorelistNumberDB-1]))
+        try:
+            updatedScore = registry.increment_score(chosen_household.household_name, person_name,
+                                                    chore_name, moreTimes)
+            print("\n{} has now done {} {} times.".format(person_name, chore_name, str(updatedScore)))
+        except (TypeError, ValueError, LookupError) as err:
+            print(err)
     return  
 
 
@@ -469,47 +440,11 @@ def log_chores(all_households):
 # @param all_households, a list of household objects
 #
 def show_leaderboard(all_households):
-    #Obtain household name
-    c.execute('SELECT DISTINCT house_name FROM HouseData')
-    allRows = c.fetchall()
-    
-    householdPrintDB = []
-    for item in allRows:
-        householdPrintDB.append(item[0])
-    
-    print("\n \nHouseholds:")
-    counter = 1
-    for i in range(len(householdPrintDB)):
-        print("\t " + str(counter) + ". " + householdPrintDB[i])
-        counter += 1
+    chosen_household = choose_household(all_households)
     
-    
-    input_household = input("\nEnter the desired household name: ")
-    chosen_household = household_exists(input_household, all_households)
-    
-    #Validation of input
-    if chosen_household == None:        
-        print("Household {} does not exist, returning to the menu.".format(input_household))
-    else:
-        c.execute('SELECT * FROM HouseData WHERE house_name=? ', (chosen_household,))
-        allRows = c.fetchall()
-        
-        namePrintingDB = []
-        for item in allRows:
-            namePrintingDB.append(item[2])
-        
-        for i in range(len(namePrintingDB)):
-            print(namePrintingDB[i]+":")
-            allRows=[]
-            c.execute('SELECT * FROM ScoreLog WHERE house_name=? AND person_name=?', (chosen_household, namePrintingDB[i]))
-            allRows = c.fetchall()
-            allChores=[]
-            allScores=[]
-            for item in list(allRows):
-                allScores.append(item[4])
-                allChores.append(item[3])
-            for j in range(len(allScores)):
-                print("\t" + str(allChores[j]) + "    (" + str(allScores[j]) + ")")
+    if chosen_household != None:
+        print("\nLeaderboard for " + chosen_household.household_name + ":")
+        print(leaderboard_string(store.leaderboard(chosen_household.household_name)))
     
     return
 
@@ -527,12 +462,17 @@ def addto_household(all_households):
         print("Household {} does not exist, returning to the menu."
               .format(new_household_name))
     else:
-        members_set = get_participants_names(new_household_name)
-        chores_set = get_chores(new_household_name, members_set)
-        household_obj = Household(new_household_name, members_set, chores_set)
-        all_households.append(household_obj)        
+        members_set = get_participants_names()
+        chores_set = get_chores()
+        try:
+            household_obj.validate_addition(members_set, chores_set)
+        except (ValueError, TypeError) as err:
+            print(err)
+            print("Household {} has not been changed.".format(new_household_name))
+            return
+        registry.add_to_household(new_household_name, members_set, chores_set)
         print("\nCurrently Existing Households: ")
-        print([Household.household_name for Household in all_households])
+        print(registry.names())
     return 
 
 ## Wipe the database of all households.
@@ -542,9 +482,7 @@ def wipe_households(all_households):
     wipe=input("Are you sure you want to remove all data? \nEnter <w> to wipe, otherwise input any other character: ")
 
     if wipe.lower()=="w":
-        c.execute("DELETE from HouseData")
-        c.execute("DELETE from ScoreLog")
-        c.execute("DELETE from ChoreData")
+        registry.wipe()
         print("\nData has been wiped.")
     else:
         print("\nData has not been wiped.")
@@ -553,40 +491,46 @@ def wipe_households(all_households):
 #  @param all_households
 #  
 def remove_household(all_households):
-    view_household(all_households)
-    
+    chosen_household = view_household(all_households)
     
+    if chosen_household == None:
+        return
+    household_name = chosen_household.household_name
     
     removalPrompt = str(input("\nRemove participant (P), chore (C) or both(B):"))
     
     if removalPrompt == 'P':
         removalName=str(input("\nEnter the name of the participant you would like to remove: "))
-        remove_participant(removalName)
+        remove_participant(household_name, removalName)
         
     elif removalPrompt == 'C':
         removalChore=input("\nEnter the name of the chore you would like to remove: ")
-        remove_participant(removalChore)
+        remove_chore(household_name, removalChore)
     elif removalPrompt == 'B':
         removalName=str(input("\nEnter the name of the participant you would like to remove: "))
         removalChore=input("\nEnter the name of the chore you would like to remove: ")
-        remove_participant(removalName)
-        remove_chore(removalChore)
+        remove_participant(household_name, removalName)
+        remove_chore(household_name, removalChore)
     else:
         print("Invalid input.")
 
 ## Remove participant from household
 #
-def remove_participant(removalName):
-    c.execute("DELETE from HouseData where person_name=?", (removalName,))
-    c.execute("DELETE from ScoreLog where person_name=?", (removalName,))
-    print(removalName + " has been removed from the household.")
+def remove_participant(household_name, removalName):
+    try:
+        registry.remove_participant(household_name, removalName)
+        print(removalName + " has been removed from the household.")
+    except (LookupError, ValueError) as err:
+        print(err)
 
 ## Remove chore from household
 #
-def remove_chore(removalChore):
-    c.execute("DELETE from ChoreData where chore_name=?", (removalChore,))
-    c.execute("DELETE from ScoreLog where chore_name=?", (removalChore,))
-    print(removalChore + " has been removed from the household.")
+def remove_chore(household_name, removalChore):
+    try:
+        registry.remove_chore(household_name, removalChore)
+        print(removalChore + " has been removed from the household.")
+    except (LookupError, ValueError) as err:
+        print(err)
         
         
 ##  Prints the menu, prompts the user for an option and validates the option.
@@ -604,46 +548,60 @@ def get_option():
 
 
 ## The menu is displayed until the user quits
+#  @param profile True to print a summary of the SQL run on quitting
 # 
-def main() :
-    global c
-    global conn
-    global sqlite_file
+def main(profile=False) :
     all_households = []   
     option = '*'
+    if profile:
+        store.profiler = profile_module.Profiler(PROFILE_SLOW_MS, sys.stdout)
+    store.install_signal_handlers()
     
     while option != 'Q':
-        option = get_option()        
-        if option == 'A':
-            about()
-            returnMenu = input("\nPress Enter to return to menu:")
-        elif option == 'C':
-            create_household(all_households)
-            returnMenu = input("\nPress Enter to return to menu:")
-        elif option == 'E':
-            addto_household(all_households)
-            returnMenu = input("\nPress Enter to return to menu:")
-        elif option == 'W':
-            wipe_households(all_households)
-            returnMenu = input("\nPress Enter to return to menu:")
-        elif option == 'R':
-            remove_household(all_households)
-            returnMenu = input("\nPress Enter to return to menu:")
-        elif option == 'V':
-            view_household(all_households)
-            returnMenu = input("\nPress Enter to return to menu:")
-        elif option == 'L':
-            log_chores(all_households)
-            returnMenu = input("\nPress Enter to return to menu:")
-        elif option == 'S':
-            show_leaderboard(all_households)
-            returnMenu = input("\nPress Enter to return to menu:")
+        option = get_option()
+        with cli_module.profiled(store, MENU_ACTIONS.get(option, profile_module.NO_ACTION)):
+            run_option(option, all_households)
     
-    conn.commit()
-    conn.close()
+    store.close()
+    if profile:
+        print("\n" + store.profiler.summary())
     print("\n\nBye, bye.")
 
+
+## Carry out a menu option.
+#  @param option the option chosen
+#  @param all_households
+#
+def run_option(option, all_households):
+    if option == 'A':
+        about()
+        returnMenu = input("\nPress Enter to return to menu:")
+    elif option == 'C':
+        create_household(all_households)
+        returnMenu = input("\nPress Enter to return to menu:")
+    elif option == 'E':
+        addto_household(all_households)
+        returnMenu = input("\nPress Enter to return to menu:")
+    elif option == 'W':
+        wipe_households(all_households)
+        returnMenu = input("\nPress Enter to return to menu:")
+    elif option == 'R':
+        remove_household(all_households)
+        returnMenu = input("\nPress Enter to return to menu:")
+    elif option == 'V':
+        view_household(all_households)
+        returnMenu = input("\nPress Enter to return to menu:")
+    elif option == 'L':
+        log_chores(all_households)
+        returnMenu = input("\nPress Enter to return to menu:")
+    elif option == 'S':
+        show_leaderboard(all_households)
+        returnMenu = input("\nPress Enter to return to menu:")
+
         
-# Start the program
+# Start the program: the menu by default, a single command when arguments
+# are given.
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1:] != ["--profile"]:
+        sys.exit(cli_module.main(sys.argv[1:], store))
+    main(profile=len(sys.argv) > 1)
\ No newline at end of file
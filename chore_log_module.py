@@ -0,0 +1,306 @@
+##
+#  Chore log of a household, stored as a participant x chore matrix.
+#
+#  The counts are held in one flat array of integers, row by row, with
+#  dictionaries mapping participant and chore names to row and column
+#  numbers. Updating a count is one index calculation, a row or column total
+#  is a sum over a slice of the array, and a household costs a few bytes per
+#  count instead of a dictionary per participant.
+#
+#  The log can still be read like the dictionary of dictionaries it
+#  replaces:
+#
+#      {"fred" : {"chore1": 0, "chore2": 0}, walt : {"chore1": 0, "chore2": 0}}
+#
+#      log["fred"]["chore1"], log.to_dict(), for name, chores in log.items()
+
+from array import array
+from collections.abc import Mapping
+
+from leaderboard_module import LeaderboardEntry
+
+## Type code of the counts: signed 64 bit integers.
+TYPECODE = "q"
+
+
+class ChoreLog(Mapping) :
+
+    __slots__ = ("_people", "_chores", "_counts", "_version")
+
+    ## Constructor. Every count starts at zero.
+    #
+    #  @param the_participants an iterable of participant names, in row order
+    #  @param the_chores an iterable of chore names, in column order
+    #
+    def __init__(self, the_participants, the_chores) :
+        self._people = {name: row for row, name in enumerate(the_participants)}
+        self._chores = {name: column for column, name in enumerate(the_chores)}
+        self._counts = array(TYPECODE, bytes(len(self._people) * len(self._chores)
+                                             * array(TYPECODE).itemsize))
+        self._version = 0
+
+    ## Return a number that changes whenever a count, the participants or
+    #  the chores change, however the log is written to.
+    #
+    @property
+    def version(self) :
+        return self._version
+
+    ## The participant names, in the order they were added.
+    #
+    @property
+    def participants(self) :
+        return list(self._people)
+
+    ## The chore names, in column order.
+    #
+    @property
+    def chores(self) :
+        return list(self._chores)
+
+    def _index(self, name, chore) :
+        try :
+            row = self._people[name]
+        except KeyError :
+            raise KeyError("{} is not a participant.".format(name))
+        try :
+            column = self._chores[chore]
+        except KeyError :
+            raise KeyError("{} is not a chore.".format(chore))
+        return row * len(self._chores) + column
+
+    ##  Return the number of times a participant has done a chore.
+    #
+    def get_count(self, name, chore) :
+        return self._counts[self._index(name, chore)]
+
+    ##  Set the number of times a participant has done a chore.
+    #
+    def set_count(self, name, chore, count) :
+        self._counts[self._index(name, chore)] = count
+        self._version = self._version + 1
+
+    ##  Add to the number of times a participant has done a chore.
+    #
+    #   @return the new count
+    #
+    def add(self, name, chore, number_completed) :
+        index = self._index(name, chore)
+        self._counts[index] = self._counts[index] + number_completed
+        self._version = self._version + 1
+        return self._counts[index]
+
+    ##  Return a participant's total over all chores.
+    #
+    def total(self, name) :
+        width = len(self._chores)
+        row = self._people[name]
+        return sum(self._counts[row * width:(row + 1) * width])
+
+    ##  Return every participant's total.
+    #
+    #   @return a dictionary of participant name -> total
+    #
+    def row_totals(self) :
+        width = len(self._chores)
+        return {name: sum(self._counts[row * width:(row + 1) * width])
+                for name, row in self._people.items()}
+
+    ##  Return the number of times each chore has been done by anyone.
+    #
+    #   @return a dictionary of chore name -> total
+    #
+    def column_totals(self) :
+        width = len(self._chores)
+        return {chore: sum(self._counts[column::width]) if width else 0
+                for chore, column in self._chores.items()}
+
+    ##  Rank the participants by their totals.
+    #
+    #   @return a list of LeaderboardEntry, best first, equal totals share a
+    #           rank and chores are in name order
+    #
+    def leaderboard(self) :
+        totals = sorted(self.row_totals().items(), key=lambda item: (-item[1], item[0]))
+        entries = []
+        for position, (name, total) in enumerate(totals, 1) :
+            if entries and entries[-1].total == total :
+                position = entries[-1].rank
+            row = self[name]
+            entries.append(LeaderboardEntry(position, name, total,
+                                            {chore: row[chore] for chore in sorted(row)}))
+        return entries
+
+    ##  Add a participant with a row of zeros. Costs one row.
+    #
+    def add_participant(self, name) :
+        if name in self._people :
+            raise KeyError("{} is already a participant.".format(name))
+        self._people[name] = len(self._people)
+        self._counts.extend(array(TYPECODE, bytes(len(self._chores) * self._counts.itemsize)))
+        self._version = self._version + 1
+
+    ##  Remove a participant and their counts. The last row is moved into the
+    #   removed one, so this costs one row.
+    #
+    def remove_participant(self, name) :
+        try :
+            row = self._people.pop(name)
+        except KeyError :
+            raise KeyError("{} is not a participant.".format(name))
+        width = len(self._chores)
+        last = len(self._people)
+        if row != last :
+            moved = next(person for person, index in self._people.items() if index == last)
+            self._counts[row * width:(row + 1) * width] = self._counts[last * width:]
+            self._people[moved] = row
+        del self._counts[last * width:]
+        self._version = self._version + 1
+
+    ##  Add a chore with a column of zeros. The rows are copied once to make
+    #   room for the column.
+    #
+    def add_chore(self, chore) :
+        if chore in self._chores :
+            raise KeyError("{} is already a chore.".format(chore))
+        width = len(self._chores)
+        counts = array(TYPECODE)
+        zero = array(TYPECODE, [0])
+        for row in range(len(self._people)) :
+            counts.extend(self._counts[row * width:(row + 1) * width])
+            counts.extend(zero)
+        self._chores[chore] = width
+        self._counts = counts
+        self._version = self._version + 1
+
+    ##  Remove a chore and its counts. The rows are copied once without the
+    #   column.
+    #
+    def remove_chore(self, chore) :
+        try :
+            column = self._chores.pop(chore)
+        except KeyError :
+            raise KeyError("{} is not a chore.".format(chore))
+        width = len(self._chores) + 1
+        counts = array(TYPECODE)
+        for row in range(len(self._people)) :
+            start = row * width
+            counts.extend(self._counts[start:start + column])
+            counts.extend(self._counts[start + column + 1:start + width])
+        self._chores = {name: index - (index > column) for name, index in self._chores.items()}
+        self._counts = counts
+        self._version = self._version + 1
+
+    ##  Return a copy of the log as a dictionary of dictionaries.
+    #
+    def to_dict(self) :
+        return {name: dict(self[name]) for name in self._people}
+
+    # Mapping of participant name -> row.
+
+    def __getitem__(self, name) :
+        if name not in self._people :
+            raise KeyError(name)
+        return ChoreLogRow(self, name)
+
+    def __iter__(self) :
+        return iter(self._people)
+
+    def __len__(self) :
+        return len(self._people)
+
+    def __contains__(self, name) :
+        return name in self._people
+
+    def __repr__(self) :
+        return "ChoreLog({!r})".format(self.to_dict())
+
+
+## One participant's counts, read and written through to the ChoreLog.
+#
+class ChoreLogRow(Mapping) :
+
+    __slots__ = ("_log", "_name")
+
+    def __init__(self, the_log, the_name) :
+        self._log = the_log
+        self._name = the_name
+
+    def __getitem__(self, chore) :
+        if chore not in self._log._chores :
+            raise KeyError(chore)
+        return self._log.get_count(self._name, chore)
+
+    def __setitem__(self, chore, count) :
+        if chore not in self._log._chores :
+            raise KeyError(chore)
+        self._log.set_count(self._name, chore, count)
+
+    def __iter__(self) :
+        return iter(self._log._chores)
+
+    def __len__(self) :
+        return len(self._log._chores)
+
+    def __contains__(self, chore) :
+        return chore in self._log._chores
+
+    def __repr__(self) :
+        return repr(dict(self))
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import sys
+
+    print("Test 1: A new log is all zeros")
+    log = ChoreLog(["fred", "walt", "jane"], ["wash up", "dusting"])
+    print("\tVALID: ", log.to_dict())
+
+    print("\nTest 2: Update and read like a dictionary")
+    log.add("fred", "wash up", 3)
+    log["walt"]["dusting"] = 5
+    print("\tVALID (expect 3, 5): ", log["fred"]["wash up"], log["walt"]["dusting"])
+
+    print("\nTest 3: Row and column totals")
+    log.add("jane", "wash up", 2)
+    print("\tROWS: ", log.row_totals())
+    print("\tCOLUMNS: ", log.column_totals())
+
+    print("\nTest 4: Leaderboard")
+    log.add("jane", "dusting", 1)
+    for entry in log.leaderboard() :
+        print("\t", entry)
+
+    print("\nTest 5: A chore that does not exist")
+    try:
+        log.add("fred", "hoover", 1)
+    except KeyError as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 6: Add and remove participants and chores")
+    log.add_participant("mary")
+    log.add_chore("hoover")
+    log.add("mary", "hoover", 4)
+    log.remove_participant("fred")
+    log.remove_chore("wash up")
+    print("\tVALID: ", log.to_dict())
+
+    print("\nTest 7: Every write changes the version")
+    version = log.version
+    log["walt"]["hoover"] = 2
+    print("\tVALID (expect True): ", log.version > version)
+
+    print("\nTest 8: Size of 5 x 5 counts")
+    log = ChoreLog(["a", "b", "c", "d", "e"], ["1", "2", "3", "4", "5"])
+    nested = log.to_dict()
+    print("\tARRAY: ", sys.getsizeof(log._counts), "bytes")
+    print("\tDICTS: ", sys.getsizeof(nested) + sum(sys.getsizeof(row) for row in nested.values()),
+          "bytes")
+
+
+if __name__ == "__main__":
+    main()
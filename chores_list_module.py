@@ -1,3 +1,6 @@
+import sys
+
+
 class ChoresList() :
     
     MINIMUM_NUMBER_OF_CHORES = 2
@@ -6,7 +9,21 @@ class ChoresList() :
     def __init__(self, the_chores) :
         self.chores = the_chores
 
+    ## Create a list of chores without validating it, for chores that have
+    #  already been validated, such as those read from the database.
+    #
+    # @param the_chores an iterable of Chore objects
+    #
+    @classmethod
+    def trusted(cls, the_chores) :
+        chores = cls.__new__(cls)
+        chores._chores = set(the_chores)
+        chores._by_name = {chore.chore_name: chore for chore in chores._chores}
+        return chores
+
     ## Return the chores attribute.
+    # Use add() and remove() to change the chores, so that the name index
+    # stays in step with the set.
     #          
     @property
     def chores(self):
@@ -14,41 +31,100 @@ class ChoresList() :
 
 
     ## Sets the chores attribute.
-    # The chores attribute is a set of Chore objects.
+    # The chores attribute is a set of Chore objects, indexed by name.
     #
     #  @param chores - the chores        
     @chores.setter
     def chores(self, the_chores) :
         try :
             self.valid_chores(the_chores)
-            self._chores = the_chores
+            self._chores = set(the_chores)   # a copy, so add() and remove() leave the caller's set alone
+            self._by_name = {chore.chore_name: chore for chore in self._chores}
 
         except ValueError as err :
             raise
 
     def __str__(self):
-        length = len(self.chores)
-        i = 1
-        chore_string = ""
-        for chore in self.chores :
-            chore_string = chore_string + str(chore)
-            if i < length :
-                chore_string = chore_string + ", "
-            i = i + 1
-            
-        return chore_string
+        return ", ".join(str(chore) for chore in self.chores)
+
+    def __len__(self):
+        return len(self._chores)
+
+    def __iter__(self):
+        return iter(self._chores)
+
+    ## A chore name or a Chore is in the list if a chore with that name is.
+    #
+    def __contains__(self, chore):
+        if isinstance(chore, Chore) :
+            chore = chore.chore_name
+        return chore in self._by_name
 
     ## Check whether a chore name exists in the set of chores.
     #
     # @param chore_name
     # @return True if the chore name exists in the set, False if it does not.
     def chore_exists(self, chore_name) :
-        found = False
-        for chore in self.chores :
-            if chore_name == chore.chore_name :
-                found = True
-                
-        return found
+        return chore_name in self._by_name
+
+
+    ## Return the chore with a name.
+    #
+    # @param chore_name
+    # @param default returned if there is no such chore
+    # @return a Chore, or default.
+    def get(self, chore_name, default=None) :
+        return self._by_name.get(chore_name, default)
+
+
+    ## Add a chore. Only the new chore is validated.
+    #
+    # @param chore a Chore whose name is not in the list
+    # @return the chore, raise an exception if it cannot be added.
+    def add(self, chore) :
+        self.bulk_add([chore])
+        return chore
+
+
+    ## Add several chores at once. Only the new chores are validated, and none
+    # is added unless all of them can be.
+    #
+    # @param the_chores an iterable of Chore objects
+    # @return True, raise an exception if they cannot be added.
+    def bulk_add(self, the_chores) :
+        new_chores = {}
+        for chore in the_chores :
+            if not isinstance(chore, Chore) :
+                raise TypeError("The ChoreList does not contain objects which are Chores.")
+            if chore.chore_name in self._by_name or chore.chore_name in new_chores :
+                raise ValueError("\t\tChore: {} already exists in the set".format(chore.chore_name))
+            new_chores[chore.chore_name] = chore
+
+        if len(self._chores) + len(new_chores) > ChoresList.MAXIMUM_NUMBER_OF_CHORES :
+            raise ValueError(("\n\t\tThe number of chores must be less than {}.")
+                .format(ChoresList.MAXIMUM_NUMBER_OF_CHORES + 1))
+
+        self._chores.update(new_chores.values())
+        self._by_name.update(new_chores)
+        return True
+
+
+    ## Remove a chore.
+    #
+    # @param chore_name
+    # @return the removed Chore, raise ValueError if there is no such chore or
+    #         the list would be too short.
+    def remove(self, chore_name) :
+        chore = self._by_name.get(chore_name)
+        if chore is None :
+            raise ValueError("Chore: {} is not in the set".format(chore_name))
+        if len(self._chores) - 1 < ChoresList.MINIMUM_NUMBER_OF_CHORES :
+            raise ValueError(("\n\t\tThe number of chores must be more than {}.")
+                .format(ChoresList.MINIMUM_NUMBER_OF_CHORES - 1))
+
+        del self._by_name[chore_name]
+        self._chores.discard(chore)
+        return chore
 
 
     ## Check the set of chores.
@@ -93,24 +169,21 @@ class ChoresList() :
 
 
     ## Check whether a chore name exists in a set of chores.
+    # Chores hash and compare by name, so the check is one set lookup.
     #
     # @param chore_name the name of the chore
-    # @param the_chores the set of chores
-    # @return True if the set does not contain a chore with the name chore_name
+    # @param the_chores the set of chores, or a ChoresList
+    # @return False if the set does not contain a chore with the name chore_name
     #         and raise exception if it does.
     #
     @staticmethod    
     def is_unique(chore_name, the_chores) :
-        if not isinstance(the_chores, set) :
+        if isinstance(the_chores, ChoresList) :
+            found = the_chores.chore_exists(chore_name)
+        elif isinstance(the_chores, set) :
+            found = Chore.name_key(chore_name) in the_chores
+        else :
             raise TypeError("The ChoreList is not a set.")
-        
-        found = False
-        
-        for chore in the_chores :
-            if not isinstance(chore, Chore) :
-                raise TypeError("The ChoreList does not contain objects which are Chores.")
-            if chore_name == chore.chore_name :
-                found = True
 
         if found :
             raise ValueError("\t\tChore: {} already exists in the set".format(chore_name))
@@ -118,8 +191,18 @@ class ChoresList() :
         return found
 
         
+## A chore and the number of times a week it should be done.
+#
+# Chores have no instance dictionary, only the two slots, and their names are
+# interned, so thousands of households with a "wash up" chore share one
+# string. Use Chore.trusted() for chores read back from the database, which
+# were validated when they were saved, and Chore.shared() to share one Chore
+# per name and frequency.
+#
 class Chore():
 
+    __slots__ = ("_chore_name", "_frequency")
+
     ## Constants used for validation
     MINIMUM_NAME_LENGTH = 3     # Used to validate team member's name, household name and chore name
     MAXIMUM_NAME_LENGTH = 20
@@ -127,10 +210,50 @@ class Chore():
     MINIMUM_CHORE_FREQUENCY = 1
     MAXIMUM_CHORE_FREQUENCY = 20
 
+    # (chore name, frequency) -> Chore, see shared()
+    _shared = {}
+
     def __init__(self, the_chore_name, the_frequency) :
         self.chore_name = the_chore_name
         self.frequency = the_frequency
 
+
+    ## Create a chore without validating it, for chores that have already
+    #  been validated, such as those read from the database.
+    #
+    #  @param the_chore_name the name of the chore
+    #  @param the_frequency the number of times a week
+    #  @return a Chore
+    #
+    @classmethod
+    def trusted(cls, the_chore_name, the_frequency) :
+        chore = cls.__new__(cls)
+        chore._chore_name = sys.intern(the_chore_name)
+        chore._frequency = the_frequency
+        return chore
+
+
+    ## Return the one Chore shared by every caller with this name and
+    #  frequency, creating it the first time. The chore is validated once.
+    #  Shared chores must not be changed.
+    #
+    #  @param the_chore_name the name of the chore
+    #  @param the_frequency the number of times a week
+    #  @param validate False to skip validation, as for trusted()
+    #  @return a Chore
+    #
+    @classmethod
+    def shared(cls, the_chore_name, the_frequency, validate=True) :
+        key = (the_chore_name, the_frequency)
+        chore = cls._shared.get(key)
+        if chore is None :
+            if validate :
+                chore = cls(the_chore_name, the_frequency)
+            else :
+                chore = cls.trusted(the_chore_name, the_frequency)
+            chore = cls._shared.setdefault(key, chore)
+        return chore
+
     ## Return the chore name.
     #          
     @property
@@ -144,7 +267,7 @@ class Chore():
     def chore_name(self, the_chore_name) :
         try :
             self.is_valid_chore_name(the_chore_name)
-            self._chore_name = the_chore_name
+            self._chore_name = sys.intern(the_chore_name)
         except ValueError as err :
             raise 
 
@@ -166,11 +289,21 @@ class Chore():
             raise 
 
 
+    ## Return an object equal to any Chore with the given name, for looking a
+    #  chore up in a set by name. It has no frequency and is not validated.
+    #
+    @classmethod
+    def name_key(cls, chore_name) :
+        key = cls.__new__(cls)
+        key._chore_name = chore_name
+        return key
+
+
     def __eq__(self, otherChore):
         if isinstance(otherChore, Chore) :
             return (self.chore_name == otherChore.chore_name)
         else:
-            raise TypeError("Argument must be a Chore object.")
+            return NotImplemented
 
 
     def __hash__(self):
@@ -276,5 +409,38 @@ def main() :
     except Exception as err:
         print("\tERROR: ", err)    
 
+    print("\nTest 5: Look up, add and remove chores by name")
+    try:
+        cl1 = ChoresList(set([Chore("wash up", 4), Chore("dusting", 1)]))
+        cl1.add(Chore("empty bin", 2))
+        cl1.remove("dusting")
+        print("\n\tVALID: ", cl1.get("empty bin"), cl1.chore_exists("dusting"), len(cl1))
+        cl1.bulk_add([Chore("hoover", 1), Chore("wash up", 3)])
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 6: is_unique on a set and comparing a Chore with a string")
+    try:
+        chores = set([Chore("wash up", 4), Chore("dusting", 1)])
+        print("\n\tVALID: ", ChoresList.is_unique("hoover", chores), Chore("wash up", 4) == "wash up")
+        ChoresList.is_unique("dusting", chores)
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 7: Trusted and shared chores")
+    try:
+        c1 = Chore.trusted("wash" + " up", 4)
+        c2 = Chore.shared("wash up", 4)
+        print("\n\tVALID: ", c1, c1.chore_name is c2.chore_name, c2 is Chore.shared("wash up", 4))
+        c1.nickname = "dishes"
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 8: Adding to a chore list leaves the caller's set unchanged")
+    the_chores = {Chore("wash up", 4), Chore("dusting", 1)}
+    cl1 = ChoresList(the_chores)
+    cl1.bulk_add([Chore("hoover", 1)])
+    print("\n\tVALID (expect 2, 3): ", len(the_chores), len(cl1))
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
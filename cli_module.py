@@ -0,0 +1,437 @@
+##
+#  Non-interactive command line for Chore Chart.
+#
+#  Each menu action is a subcommand, so Chore Chart can be driven from
+#  scripts and cron without answering prompts:
+#
+#      python chore_chart.py create House1 -p fred -p walt -c "wash up:3" -c dusting:1
+#      python chore_chart.py add House1 -p jane
+#      python chore_chart.py log House1 --log "fred:wash up:2" --log walt:dusting:1
+#      python chore_chart.py view House1 --json
+#      python chore_chart.py view --search use --limit 50
+#      python chore_chart.py leaderboard House1 --limit 3
+#      python chore_chart.py leaderboard House1 --week 12
+#      python chore_chart.py leaderboard --month 1
+#      python chore_chart.py history House1 --participant fred
+#      python chore_chart.py schedule House1
+#      python chore_chart.py schedule --json
+#      python chore_chart.py remove House1 --participant jane
+#      python chore_chart.py remove House1 --household
+#      python chore_chart.py wipe --yes
+#      python chore_chart.py import households.jsonl
+#      python chore_chart.py export backup.csv.gz
+#
+#  With --json the result is printed as one JSON object. Errors are printed
+#  to stderr, or as {"error": message} with --json, and set the exit status.
+#  With --profile the SQL the command ran is summarized on stderr, and
+#  statements slower than --slow-ms are logged there with their query plan:
+#
+#      python chore_chart.py --profile --slow-ms 5 leaderboard House1
+
+import argparse
+import contextlib
+import datetime
+import json
+import sqlite3
+import sys
+
+from chores_list_module import Chore
+from leaderboard_module import leaderboard_string
+from storage_module import ChoreStore
+import export_module
+import import_module
+import listing_module
+import profile_module
+import rollups_module
+import scheduler_module
+import totals_module
+
+## Exit statuses.
+EXIT_OK = 0
+EXIT_ERROR = 1          # invalid data, a missing household or rejected import rows
+EXIT_USAGE = 2          # bad command line, as reported by argparse
+
+
+##  Split a "name:frequency" chore argument.
+#
+#   @param text the argument
+#   @return a Chore
+#
+def parse_chore(text) :
+    name, separator, frequency = text.rpartition(":")
+    if not separator :
+        raise argparse.ArgumentTypeError("chores are given as name:frequency, not {}".format(text))
+    try :
+        return Chore(name, int(frequency))
+    except (TypeError, ValueError) as err :
+        raise argparse.ArgumentTypeError(str(err).strip())
+
+
+##  Split a "person:chore:count" log argument.
+#
+#   @param text the argument
+#   @return a tuple (person_name, chore_name, number_completed)
+#
+def parse_log(text) :
+    rest, separator, count = text.rpartition(":")
+    person_name, separator_2, chore_name = rest.partition(":")
+    if not separator or not separator_2 :
+        raise argparse.ArgumentTypeError("logs are given as person:chore:count, not {}".format(text))
+    try :
+        return (person_name, chore_name, int(count))
+    except ValueError :
+        raise argparse.ArgumentTypeError("the count in {} is not an integer".format(text))
+
+
+##  Attribute the statements run inside the block to an action, if the
+#   store is profiled.
+#
+#   @param store a ChoreStore
+#   @param action the name of the action
+#
+def profiled(store, action) :
+    if store.profiler is None :
+        return contextlib.nullcontext()
+    return store.profiler.action(action)
+
+
+##  Build the argument parser.
+#
+#   @return an argparse.ArgumentParser
+#
+def build_parser() :
+    parser = argparse.ArgumentParser(prog="chore_chart.py",
+                                     description="Keep track of household chores.")
+    parser.add_argument("--database", help="the database file (default: chore_chart.db)")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    parser.add_argument("--profile", action="store_true",
+                        help="print the time, rows and calls of each SQL statement to stderr")
+    parser.add_argument("--slow-ms", type=float, default=profile_module.DEFAULT_SLOW_MS,
+                        help="with --profile, log statements slower than this with their plan "
+                             "(default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    command = commands.add_parser("create", help="create a household")
+    command.add_argument("household")
+    command.add_argument("-p", "--participant", action="append", default=[], required=True)
+    command.add_argument("-c", "--chore", action="append", default=[], type=parse_chore,
+                         required=True, help="name:frequency")
+
+    command = commands.add_parser("add", help="add participants or chores to a household")
+    command.add_argument("household")
+    command.add_argument("-p", "--participant", action="append", default=[])
+    command.add_argument("-c", "--chore", action="append", default=[], type=parse_chore,
+                         help="name:frequency")
+
+    command = commands.add_parser("remove", help="remove participants or chores of a "
+                                                  "household, or the household")
+    command.add_argument("household")
+    command.add_argument("--participant", action="append", default=[])
+    command.add_argument("--chore", action="append", default=[])
+    command.add_argument("--household", dest="whole_household", action="store_true",
+                         help="remove the household with everything in it")
+
+    command = commands.add_parser("log", help="log chores done, in one transaction")
+    command.add_argument("household")
+    command.add_argument("-l", "--log", action="append", type=parse_log, required=True,
+                         help="person:chore:count")
+
+    command = commands.add_parser("view", help="show a household, or list the households "
+                                                "a page at a time")
+    command.add_argument("household", nargs="?")
+    command.add_argument("--limit", type=int, default=listing_module.PAGE_SIZE,
+                         help="households per page")
+    command.add_argument("--after", metavar="NAME", help="list the households after this one")
+    command.add_argument("--prefix", help="only households whose names start with this")
+    command.add_argument("--search", metavar="TEXT",
+                         help="only households whose names contain this, in any case")
+
+    command = commands.add_parser("schedule",
+                                  help="make this week's rota for a household, or for every "
+                                       "household")
+    command.add_argument("household", nargs="?")
+    command.add_argument("--history-weight", type=float, default=1,
+                         help="how much chores done before count, 0 to ignore them (default: 1)")
+
+    command = commands.add_parser("leaderboard",
+                                  help="show the leaderboard of a household, or across "
+                                       "all households")
+    command.add_argument("household", nargs="?")
+    command.add_argument("--limit", type=int)
+    window = command.add_mutually_exclusive_group()
+    window.add_argument("--week", type=int, metavar="N", help="the last N weeks, this one included")
+    window.add_argument("--month", type=int, metavar="N",
+                        help="the last N months, this one included")
+    window.add_argument("--from", dest="first_day", metavar="YYYY-MM-DD",
+                        help="from this day, widened to whole weeks")
+    command.add_argument("--to", dest="last_day", metavar="YYYY-MM-DD",
+                         help="to this day, default today")
+
+    command = commands.add_parser("history", help="show the chores logged in a household")
+    command.add_argument("household")
+    command.add_argument("--participant")
+    command.add_argument("--limit", type=int, default=20)
+
+    command = commands.add_parser("wipe", help="remove every household")
+    command.add_argument("--yes", action="store_true", help="confirm the wipe")
+
+    command = commands.add_parser("import", help="import households from CSV or JSONL")
+    command.add_argument("file")
+    command.add_argument("--format", choices=["csv", "jsonl"])
+    command.add_argument("--report", help="write the error report to this file")
+
+    command = commands.add_parser("export", help="export every household to CSV or JSONL")
+    command.add_argument("file")
+    command.add_argument("--format", choices=["csv", "jsonl"])
+    command.add_argument("--gzip", action="store_true", default=None)
+
+    return parser
+
+
+def _require_household(store, house_name) :
+    if not store.household_exists(house_name) :
+        raise LookupError("Household {} does not exist.".format(house_name))
+
+
+##  Create a household.
+#
+#   @return the result and its text form
+#
+def create(store, args) :
+    if store.household_exists(args.household) :
+        raise ValueError("Household {} already exists.".format(args.household))
+    record = import_module.HouseholdRecord(None, args.household, args.participant,
+                                           [(chore.chore_name, chore.frequency) for chore in args.chore])
+    import_module.validate_record(record)
+
+    store.add_to_household(args.household, args.participant, args.chore)
+    return ({"household": args.household}, "Household {} created.".format(args.household))
+
+
+##  Add participants and chores to an existing household.
+#
+def add(store, args) :
+    store.validate_addition(args.household, args.participant, args.chore)
+    store.add_to_household(args.household, args.participant, args.chore)
+    return ({"household": args.household, "participants": args.participant,
+             "chores": [chore.chore_name for chore in args.chore]},
+            "Household {} updated.".format(args.household))
+
+
+##  Remove participants and chores of a household, or the household.
+#
+def remove(store, args) :
+    if args.whole_household :
+        store.remove_household(args.household)
+        return ({"household": args.household, "removed": True},
+                "Household {} has been removed.".format(args.household))
+
+    if not args.participant and not args.chore :
+        raise ValueError("Nothing to remove: give --participant, --chore or --household.")
+    _require_household(store, args.household)
+    with store.transaction() :
+        for person_name in args.participant :
+            store.remove_participant(args.household, person_name)
+        for chore_name in args.chore :
+            store.remove_chore(args.household, chore_name)
+
+    removed = args.participant + args.chore
+    return ({"household": args.household, "participants": args.participant,
+             "chores": args.chore},
+            "\n".join("{} has been removed from the household.".format(name) for name in removed))
+
+
+##  Log chores done. Every entry is applied in one transaction, or none is.
+#
+def log(store, args) :
+    _require_household(store, args.household)
+    scores = store.log_scores(args.household, args.log)
+
+    result = {"household": args.household,
+              "scores": [{"participant": person_name, "chore": chore_name, "score": score}
+                         for (person_name, chore_name, count), score in zip(args.log, scores)]}
+    text = "\n".join("{} has now done {} {} times.".format(person_name, chore_name, score)
+                     for (person_name, chore_name, count), score in zip(args.log, scores))
+    return (result, text)
+
+
+##  Show a household, or list a page of households when none is given.
+#
+def view(store, args) :
+    if args.household is None :
+        page = store.list_households(args.after, args.limit, args.prefix, args.search)
+        lines = list(page.names)
+        if page.next is not None :
+            lines.append("(more: --after {})".format(page.next))
+        return ({"households": page.names, "next": page.next}, "\n".join(lines))
+
+    _require_household(store, args.household)
+    participants = store.participant_names(args.household)
+    chores = store.chores(args.household)
+
+    result = {"household": args.household, "participants": participants,
+              "chores": [{"name": chore_name, "frequency": chore_freq}
+                         for chore_name, chore_freq in chores]}
+    lines = ["Household: " + args.household, "", "Participants:"]
+    lines.extend("\t {}. {}".format(i, name) for i, name in enumerate(participants, 1))
+    lines.extend(["", "Weekly Chores:"])
+    lines.extend("\t {}. {} ({})".format(i, chore_name, chore_freq)
+                 for i, (chore_name, chore_freq) in enumerate(chores, 1))
+    return (result, "\n".join(lines))
+
+
+##  Return the window chosen by the leaderboard options.
+#
+#   @return a tuple (period, start, end), or None for all time
+#
+def _window(args) :
+    if args.last_day is not None and args.first_day is None :
+        raise ValueError("--to needs --from.")
+    if args.week is not None :
+        return ("week",) + rollups_module.recent_window("week", args.week)
+    if args.month is not None :
+        return ("month",) + rollups_module.recent_window("month", args.month)
+    if args.first_day is not None :
+        last_day = args.last_day or datetime.datetime.now(datetime.timezone.utc).date()
+        return ("week",) + rollups_module.range_window(args.first_day, last_day)
+    return None
+
+
+##  Show the leaderboard of a household, or the top participants across all
+#   households, for all time or a window.
+#
+def leaderboard(store, args) :
+    if args.limit is not None and args.limit < 1 :
+        raise ValueError("Leaderboard limit must be a positive integer.")
+    window = _window(args)
+    result = {"household": args.household}
+    if window is not None :
+        result.update(zip(("period", "start", "end"), window))
+
+    if args.household is None :
+        limit = args.limit or 10
+        if window is None :
+            ranks = [totals_module.ParticipantRank(house_name, person_name, total, None)
+                     for house_name, person_name, total in store.top_participants(limit)]
+        else :
+            ranks = store.window_top_participants(window[0], window[1], window[2], limit)
+        result["leaderboard"] = [rank._asdict() for rank in ranks]
+        return (result, "\n".join("{}. {} ({}): {}".format(rank.rank or i, rank.person_name,
+                                                           rank.house_name, rank.total)
+                                  for i, rank in enumerate(ranks, 1)))
+
+    _require_household(store, args.household)
+    if window is None :
+        entries = store.leaderboard(args.household, args.limit)
+    else :
+        entries = store.window_leaderboard(args.household, window[0], window[1], window[2],
+                                           args.limit)
+    result["leaderboard"] = [entry._asdict() for entry in entries]
+    return (result, leaderboard_string(entries))
+
+
+##  Show the most recent chore events of a household.
+#
+def history(store, args) :
+    _require_household(store, args.household)
+    events = store.history(args.household, args.participant, args.limit)
+    return ({"household": args.household, "events": [event._asdict() for event in events]},
+            "\n".join("{}  {} did {} x{}".format(event.logged_at, event.person_name,
+                                                 event.chore_name, event.count)
+                      for event in events))
+
+
+##  Make this week's rota for a household, or for every household.
+#
+def schedule(store, args) :
+    if args.household is None :
+        rotas = store.rotas(args.history_weight)
+    else :
+        _require_household(store, args.household)
+        rotas = [store.rota(args.household, args.history_weight)]
+    return ({"rotas": [rota._asdict() for rota in rotas]},
+            "\n\n".join(scheduler_module.rota_string(rota) for rota in rotas))
+
+
+##  Remove every household. Needs --yes.
+#
+def wipe(store, args) :
+    if not args.yes :
+        raise ValueError("Wiping removes all data; confirm with --yes.")
+    store.wipe()
+    return ({"wiped": True}, "Data has been wiped.")
+
+
+##  Import households from a file.
+#
+def import_households(store, args) :
+    result = import_module.import_file(store, args.file, args.format)
+    if args.report :
+        with open(args.report, "w", encoding="utf-8") as outfile :
+            outfile.write(import_module.error_report_string(result.errors) + "\n")
+
+    text = ("Imported {} households ({} score rows) in {:.2f}s, {} rejected."
+            .format(result.households, result.score_rows, result.seconds, len(result.errors)))
+    if result.errors and not args.report :
+        text = text + "\n" + import_module.error_report_string(result.errors)
+    return ({"households": result.households, "score_rows": result.score_rows,
+             "seconds": result.seconds,
+             "errors": [error._asdict() for error in result.errors]},
+            text)
+
+
+##  Export every household to a file.
+#
+def export_households(store, args) :
+    count = export_module.export_file(store, args.file, args.format, args.gzip)
+    return ({"households": count, "file": args.file},
+            "Exported {} households to {}.".format(count, args.file))
+
+
+COMMANDS = {"create": create, "add": add, "remove": remove, "log": log, "view": view,
+            "leaderboard": leaderboard, "history": history, "schedule": schedule, "wipe": wipe,
+            "import": import_households, "export": export_households}
+
+
+##  Run one command.
+#
+#   @param argv the arguments, without the program name
+#   @param store the ChoreStore to use when --database is not given
+#   @return the exit status
+#
+def main(argv=None, store=None) :
+    args = build_parser().parse_args(argv)
+
+    if args.database is not None or store is None :
+        store = ChoreStore(args.database or ChoreStore.DEFAULT_FILE)
+    if args.profile :
+        store.profiler = profile_module.Profiler(args.slow_ms, sys.stderr)
+
+    status = EXIT_OK
+    try :
+        with profiled(store, args.command) :
+            result, text = COMMANDS[args.command](store, args)
+        if args.command == "import" and result["errors"] :
+            status = EXIT_ERROR
+    except (ValueError, TypeError, LookupError, OSError, sqlite3.Error) as err :
+        message = str(err).strip()
+        if args.json :
+            print(json.dumps({"error": message}))
+        else :
+            print("error: " + message, file=sys.stderr)
+        return EXIT_ERROR
+    finally :
+        store.close()
+        if store.profiler is not None :
+            print(store.profiler.summary(), file=sys.stderr)
+
+    if args.json :
+        print(json.dumps(result))
+    elif text :
+        print(text)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+##
+#  Append-only chore event log for Chore Chart.
+#
+#  Each time chores are logged a row (household, participant, chore, count,
+#  logged_at) is appended to ChoreEvents; rows are never updated. The
+#  per-chore scores in ScoreLog are a materialized view of the events: the
+#  view is up to date with every event up to the event_id stored in
+#  EventCheckpoint, and catch_up() applies the events after it with one
+#  grouped UPDATE, so its cost depends only on the number of new events.
+#  replay() rebuilds the view from the first event.
+#
+#  The functions that write must be called inside a write transaction.
+
+from collections import namedtuple
+
+## One logged entry.
+#  logged_at   UTC time as text, YYYY-MM-DD HH:MM:SS.SSS
+#
+ChoreEvent = namedtuple("ChoreEvent", ["event_id", "house_name", "person_name", "chore_name",
+                                       "count", "logged_at"])
+
+## Name of the checkpoint row of the ScoreLog view.
+CHECKPOINT = "ScoreLog"
+
+_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+# Only appended when the household has the participant and chore.
+_APPEND_SQL = ("INSERT INTO ChoreEvents (house_name, person_name, chore_name, count, logged_at) "
+               "SELECT house_name, person_name, chore_name, ?4, COALESCE(?5, " + _NOW + ") "
+               "FROM ScoreLog WHERE house_name=?1 AND person_name=?2 AND chore_name=?3 "
+               "RETURNING event_id")
+_APPEND_MANY_SQL = _APPEND_SQL[:_APPEND_SQL.index(" RETURNING")]
+_CHECKPOINT_SQL = "SELECT event_id FROM EventCheckpoint WHERE name=?"
+_SET_CHECKPOINT_SQL = "UPDATE EventCheckpoint SET event_id=? WHERE name=?"
+_LAST_EVENT_SQL = "SELECT COALESCE(MAX(event_id), 0) FROM ChoreEvents"
+_APPLY_ONE_SQL = ("UPDATE ScoreLog SET chore_score = chore_score + ? "
+                  "WHERE house_name=? AND person_name=? AND chore_name=? "
+                  "RETURNING chore_score")
+_APPLY_RANGE_SQL = """
+    UPDATE ScoreLog SET chore_score = chore_score + e.delta
+    FROM (SELECT house_name, person_name, chore_name, SUM(count) AS delta
+          FROM ChoreEvents
+          WHERE event_id > ? AND event_id <= ?
+          GROUP BY house_name, person_name, chore_name) AS e
+    WHERE ScoreLog.house_name = e.house_name
+      AND ScoreLog.person_name = e.person_name
+      AND ScoreLog.chore_name = e.chore_name
+"""
+_RESET_SQL = "UPDATE ScoreLog SET chore_score = 0 WHERE chore_score <> 0"
+_HISTORY_SQL = ("SELECT event_id, house_name, person_name, chore_name, count, logged_at "
+                "FROM ChoreEvents WHERE house_name=?1 AND (?2 IS NULL OR person_name=?2) "
+                "ORDER BY event_id DESC LIMIT ?3")
+
+
+##  Return the event_id the ScoreLog view is up to date with.
+#
+#   @param conn an open sqlite3 connection
+#
+def checkpoint(conn) :
+    return conn.execute(_CHECKPOINT_SQL, (CHECKPOINT,)).fetchone()[0]
+
+
+##  Append an event.
+#
+#   @param conn an open sqlite3 connection in a write transaction
+#   @param house_name the name of the household
+#   @param person_name the name of the participant
+#   @param chore_name the name of the chore
+#   @param count the number of times the chore was done
+#   @param logged_at the time as text, None for now
+#   @return the event_id, or None if the household has no such participant
+#           or chore and nothing was appended
+#
+def append_event(conn, house_name, person_name, chore_name, count, logged_at=None) :
+    row = conn.execute(_APPEND_SQL, (house_name, person_name, chore_name,
+                                     count, logged_at)).fetchone()
+    return None if row is None else row[0]
+
+
+##  Append several events with one executemany().
+#
+#   @param events an iterable of (house_name, person_name, chore_name, count)
+#          or (house_name, person_name, chore_name, count, logged_at)
+#
+def append_events(conn, events) :
+    conn.executemany(_APPEND_MANY_SQL, (tuple(event) + (None,) * (5 - len(event))
+                                        for event in events))
+
+
+##  Append an event and apply it to the ScoreLog view.
+#
+#   @return the new score, or None if the household has no such participant
+#           or chore
+#
+def log_event(conn, house_name, person_name, chore_name, count, logged_at=None) :
+    event_id = append_event(conn, house_name, person_name, chore_name, count, logged_at)
+    if event_id is None :
+        return None
+
+    if checkpoint(conn) == event_id - 1 :
+        # The view is up to date apart from this event.
+        score = conn.execute(_APPLY_ONE_SQL, (count, house_name, person_name,
+                                              chore_name)).fetchone()[0]
+        conn.execute(_SET_CHECKPOINT_SQL, (event_id, CHECKPOINT))
+        return score
+
+    catch_up(conn)
+    return conn.execute("SELECT chore_score FROM ScoreLog "
+                        "WHERE house_name=? AND person_name=? AND chore_name=?",
+                        (house_name, person_name, chore_name)).fetchone()[0]
+
+
+##  Apply the events after the checkpoint to the ScoreLog view.
+#
+#   @param conn an open sqlite3 connection in a write transaction
+#   @param until apply events up to and including this event_id, None for all
+#   @return the new checkpoint
+#
+def catch_up(conn, until=None) :
+    start = checkpoint(conn)
+    end = conn.execute(_LAST_EVENT_SQL).fetchone()[0] if until is None else until
+    if end <= start :
+        return start
+
+    conn.execute(_APPLY_RANGE_SQL, (start, end))
+    conn.execute(_SET_CHECKPOINT_SQL, (end, CHECKPOINT))
+    return end
+
+
+##  Rebuild the ScoreLog view from the first event.
+#
+#   @param conn an open sqlite3 connection in a write transaction
+#   @return the new checkpoint
+#
+def replay(conn) :
+    conn.execute(_RESET_SQL)
+    conn.execute(_SET_CHECKPOINT_SQL, (0, CHECKPOINT))
+    return catch_up(conn)
+
+
+##  Return the most recent events of a household.
+#
+#   @param conn an open sqlite3 connection
+#   @param house_name the name of the household
+#   @param person_name only return this participant's events, None for all
+#   @param limit the largest number of events returned
+#   @return a list of ChoreEvent, newest first
+#
+def history(conn, house_name, person_name=None, limit=100) :
+    return [ChoreEvent(*row) for row in conn.execute(_HISTORY_SQL,
+                                                     (house_name, person_name, limit))]
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import sqlite3
+    import schema_module
+
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    schema_module.migrate(conn)
+    conn.executemany("INSERT INTO ScoreLog (house_name, person_num, person_name, chore_name) "
+                     "VALUES ('House1', 1, 'fred', ?)", [("wash up",), ("dusting",)])
+
+    print("Test 1: Log an event")
+    conn.execute("BEGIN")
+    print("\tSCORE (expect 3): ", log_event(conn, "House1", "fred", "wash up", 3))
+    print("\tCHECKPOINT (expect 1): ", checkpoint(conn))
+
+    print("\nTest 2: Log a chore that does not exist")
+    print("\tSCORE (expect None): ", log_event(conn, "House1", "fred", "hoover", 1))
+
+    print("\nTest 3: Catch up with appended events")
+    append_events(conn, [("House1", "fred", "wash up", 2), ("House1", "fred", "dusting", 1),
+                         ("House1", "fred", "wash up", 1, "2019-04-01 10:00:00.000")])
+    print("\tCHECKPOINT (expect 4): ", catch_up(conn))
+    print("\tSCORES (expect 6, 1): ", conn.execute("SELECT chore_score FROM ScoreLog "
+                                                  "ORDER BY chore_name DESC").fetchall())
+
+    print("\nTest 4: Replay from the first event")
+    conn.execute("UPDATE ScoreLog SET chore_score = 99")
+    replay(conn)
+    print("\tSCORES (expect 6, 1): ", conn.execute("SELECT chore_score FROM ScoreLog "
+                                                  "ORDER BY chore_name DESC").fetchall())
+    conn.commit()
+
+    print("\nTest 5: History")
+    for event in history(conn, "House1", limit=2) :
+        print("\t", event)
+
+
+if __name__ == "__main__":
+    main()
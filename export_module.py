@@ -0,0 +1,179 @@
+##
+#  Streaming export of the whole database to JSONL or CSV.
+#
+#  Households are read with one cursor per table, each ordered by household
+#  and fetched in chunks with fetchmany(), and merged one household at a time,
+#  so memory use does not depend on the size of the database. All cursors run
+#  in one read transaction and see the same snapshot.
+#
+#  JSONL: one household per line, in the format read by import_module plus
+#  the scores
+#      {"household": "House1", "participants": ["fred", "walt"],
+#       "chores": [{"name": "wash up", "frequency": 3}, ...],
+#       "scores": {"fred": {"wash up": 2, ...}, ...}}
+#
+#  CSV: the columns household,type,name,frequency,participant,score with one
+#  row per participant, chore and score (type "score", name is the chore).
+#
+#  Usage: python export_module.py file [--format csv|jsonl] [--gzip]
+#                                      [--database file]
+
+import argparse
+import csv
+import gzip
+import json
+import sys
+
+## Number of rows fetched from a cursor at a time.
+CHUNK_SIZE = 1000
+
+## gzip compression level, trading size for speed.
+COMPRESS_LEVEL = 6
+
+CSV_COLUMNS = ["household", "type", "name", "frequency", "participant", "score"]
+
+_PARTICIPANTS_SQL = ("SELECT house_name, person_name FROM HouseData "
+                     "ORDER BY house_name, person_num, person_name")
+_CHORES_SQL = ("SELECT house_name, chore_name, chore_freq FROM ChoreData "
+               "ORDER BY house_name, chore_num, chore_name")
+_SCORES_SQL = ("SELECT house_name, person_name, chore_name, chore_score FROM ScoreLog "
+               "ORDER BY house_name, person_name, chore_name")
+
+
+##  Iterate over the rows of a query, fetching them in chunks.
+#
+#   @param cursor a cursor that has executed a query
+#   @param chunk_size the number of rows fetched at a time
+#   @return a generator of rows
+#
+def iter_rows(cursor, chunk_size=CHUNK_SIZE) :
+    while True :
+        rows = cursor.fetchmany(chunk_size)
+        if not rows :
+            return
+        for row in rows :
+            yield row
+
+
+class _HouseCursor() :
+    # Yields the rows of one household at a time from a cursor ordered by
+    # house_name.
+
+    def __init__(self, cursor, chunk_size) :
+        self._rows = iter_rows(cursor, chunk_size)
+        self._next = next(self._rows, None)
+
+    def peek_house(self) :
+        return None if self._next is None else self._next[0]
+
+    def take(self, house_name) :
+        rows = []
+        while self._next is not None and self._next[0] < house_name :
+            self._next = next(self._rows, None)
+        while self._next is not None and self._next[0] == house_name :
+            rows.append(self._next)
+            self._next = next(self._rows, None)
+        return rows
+
+
+##  Iterate over every household in the database.
+#
+#   @param conn an open sqlite3 connection, ideally in a read transaction
+#   @param chunk_size the number of rows fetched from each cursor at a time
+#   @return a generator of dictionaries in the JSONL export format
+#
+def iter_households(conn, chunk_size=CHUNK_SIZE) :
+    participants = _HouseCursor(conn.execute(_PARTICIPANTS_SQL), chunk_size)
+    chores = _HouseCursor(conn.execute(_CHORES_SQL), chunk_size)
+    scores = _HouseCursor(conn.execute(_SCORES_SQL), chunk_size)
+
+    while participants.peek_house() is not None :
+        house_name = participants.peek_house()
+        household = {"household": house_name,
+                     "participants": [row[1] for row in participants.take(house_name)],
+                     "chores": [{"name": row[1], "frequency": row[2]}
+                                for row in chores.take(house_name)],
+                     "scores": {}}
+        for row in scores.take(house_name) :
+            household["scores"].setdefault(row[1], {})[row[2]] = row[3]
+        yield household
+
+
+##  Convert a household to CSV rows.
+#
+#   @param household a dictionary in the JSONL export format
+#   @return a generator of lists in the order of CSV_COLUMNS
+#
+def csv_rows(household) :
+    house_name = household["household"]
+    for person_name in household["participants"] :
+        yield [house_name, "participant", person_name, "", "", ""]
+    for chore in household["chores"] :
+        yield [house_name, "chore", chore["name"], chore["frequency"], "", ""]
+    for person_name, chores in household["scores"].items() :
+        for chore_name, score in chores.items() :
+            yield [house_name, "score", chore_name, "", person_name, score]
+
+
+##  Write every household to a file.
+#
+#   @param store a ChoreStore
+#   @param path the file to write
+#   @param file_format "csv" or "jsonl", None to use the file extension
+#   @param compress gzip the output; None to compress if path ends in .gz
+#   @return the number of households written
+#
+def export_file(store, path, file_format=None, compress=None, chunk_size=CHUNK_SIZE) :
+    name = path.lower()
+    if compress is None :
+        compress = name.endswith(".gz")
+    if name.endswith(".gz") :
+        name = name[:-3]
+    if file_format is None :
+        file_format = "csv" if name.endswith(".csv") else "jsonl"
+    if file_format not in ("csv", "jsonl") :
+        raise ValueError("Unknown export format: {}".format(file_format))
+
+    if compress :
+        outfile = gzip.open(path, "wt", compresslevel=COMPRESS_LEVEL, encoding="utf-8", newline="")
+    else :
+        outfile = open(path, "w", encoding="utf-8", newline="")
+
+    count = 0
+    with outfile, store.snapshot() as conn :
+        if file_format == "csv" :
+            writer = csv.writer(outfile)
+            writer.writerow(CSV_COLUMNS)
+            for household in iter_households(conn, chunk_size) :
+                writer.writerows(csv_rows(household))
+                count = count + 1
+        else :
+            for household in iter_households(conn, chunk_size) :
+                outfile.write(json.dumps(household))
+                outfile.write("\n")
+                count = count + 1
+
+    return count
+
+
+## Export the database from the command line.
+#
+def main(argv=None):
+    from storage_module import ChoreStore
+
+    parser = argparse.ArgumentParser(description="Export Chore Chart households.")
+    parser.add_argument("file")
+    parser.add_argument("--format", choices=["csv", "jsonl"])
+    parser.add_argument("--gzip", action="store_true", default=None)
+    parser.add_argument("--database", default=ChoreStore.DEFAULT_FILE)
+    args = parser.parse_args(argv)
+
+    store = ChoreStore(args.database)
+    count = export_file(store, args.file, args.format, args.gzip)
+    store.close()
+    print("Exported {} households to {}.".format(count, args.file))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
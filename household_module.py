@@ -1,5 +1,7 @@
 from participants_list_module import Participants
 from chores_list_module import ChoresList, Chore
+from chore_log_module import ChoreLog
+import render_module
 
 class Household() :
 
@@ -22,13 +24,47 @@ class Household() :
     # @param the_participants a Participants object containing
     #        a set of the participants' names
     # @param the_chores a ChoresList object containing a set of chores
+    # @param the_event_sink called as the_event_sink(household_name, name,
+    #        chore, number_completed) for every update of the chore log, for
+    #        example ChoreStore.increment_score to append it to the event log.
+    #        If it returns the new count, the chore log is set to it.
+    #        None to keep the log in memory only.
     #
-    def __init__(self, the_household_name, the_participants, the_chores) :
+    def __init__(self, the_household_name, the_participants, the_chores, the_event_sink=None) :
+        self._version = 0
         self.household_name = the_household_name
         self.participants = the_participants
         self.chores = the_chores
+        self.event_sink = the_event_sink
         self.chore_log = {}   # This will still call the setter for the chore log
 
+
+    ## Create a household from data that has already been validated, such as
+    #  a household read from the database, without validating it again.
+    #
+    # @param the_household_name the household name
+    # @param the_participant_names the participants' names, in row order
+    # @param the_chores Chore objects, in column order
+    # @param the_scores an iterable of (participant name, chore name, count)
+    # @param the_event_sink see the constructor
+    # @return a Household
+    #
+    @classmethod
+    def trusted(cls, the_household_name, the_participant_names, the_chores, the_scores=(),
+                the_event_sink=None) :
+        the_participant_names = list(the_participant_names)
+        the_chores = list(the_chores)
+        household = cls.__new__(cls)
+        household._version = 1
+        household._household_name = the_household_name
+        household._participants = Participants.trusted(the_participant_names)
+        household._chores = ChoresList.trusted(the_chores)
+        household.event_sink = the_event_sink
+        household._chore_log = Household.initialise_log(the_participant_names, the_chores)
+        for name, chore, count in the_scores :
+            household._chore_log.set_count(name, chore, count)
+        return household
+
        
     ## Return the household_name.
     #          
@@ -49,6 +85,15 @@ class Household() :
  
     def __str__(self):
         return self.household_name                           
+
+    ## Return a number that changes whenever the participants, the chores or
+    #  the chore log change, used to tell whether a cached rendering is
+    #  still valid.
+    #
+    @property
+    def version(self):
+        return self._version
+
     ## Return the participant names.
     # Note: The participants attribute is a Participants object.
     #       Use the Participants class to create this object.
@@ -63,6 +108,7 @@ class Household() :
     @participants.setter
     def participants(self, the_participants) :
         self._participants = Participants(the_participants)
+        self._version = self._version + 1
  
         
     ## Return the chores.
@@ -78,6 +124,7 @@ class Household() :
     def chores(self, the_chores) :
         try :
             self._chores = ChoresList(the_chores)
+            self._version = self._version + 1
         except (ValueError, TypeError) as err :
             raise
 
@@ -88,7 +135,8 @@ class Household() :
         return self._chore_log
 
 
-    ## Setter for the dictionary containing the log of tasks done.
+    ## Setter for the log of tasks done, a ChoreLog which can be read as a
+    #  dictionary.
     #  key : partcipant's name,
     #  value :  dictionary containing the chore name and the number of times completed.
     #  @param the_chore_log an empty dictionary       
@@ -96,18 +144,82 @@ class Household() :
     def chore_log(self, the_chore_log) :
         self._chore_log = Household.initialise_log(self.participants.participants, \
                                                   self.chores.chores)
+        self._version = self._version + 1
 
 
+    ## Add participants. Only the new names are validated, and each gets a
+    #  row of zeros in the chore log; the rest of the log is unchanged.
+    #  @param names an iterable of participant names
+    #
+    def add_participants(self, names) :
+        names = list(names)
+        self._participants.bulk_add(names)
+        for name in names :
+            self._chore_log.add_participant(name)
+        self._version = self._version + 1
+
+
+    ## Add a participant, see add_participants.
+    #  @param name the participant's name
+    #
+    def add_participant(self, name) :
+        self.add_participants([name])
+
+
+    ## Remove a participant and their row of the chore log.
+    #  @param name the participant's name
+    #
+    def remove_participant(self, name) :
+        self._participants.remove(name)
+        self._chore_log.remove_participant(name)
+        self._version = self._version + 1
+
+
+    ## Add chores. Only the new chores are validated, and each gets a column
+    #  of zeros in the chore log.
+    #  @param the_chores an iterable of Chore objects
+    #
+    def add_chores(self, the_chores) :
+        the_chores = list(the_chores)
+        self._chores.bulk_add(the_chores)
+        for chore in the_chores :
+            self._chore_log.add_chore(chore.chore_name)
+        self._version = self._version + 1
+
+
+    ## Add a chore, see add_chores.
+    #  @param chore a Chore
+    #
+    def add_chore(self, chore) :
+        self.add_chores([chore])
+
+
+    ## Remove a chore and its column of the chore log.
+    #  @param chore_name the name of the chore
+    #
+    def remove_chore(self, chore_name) :
+        self._chores.remove(chore_name)
+        self._chore_log.remove_chore(chore_name)
+        self._version = self._version + 1
+
+
+    ## Check that participants and chores can be added to this household,
+    #  without adding them. Costs O(new names + new chores).
+    #  @param participant_names an iterable of new participant names
+    #  @param the_chores an iterable of new Chore objects
+    #  @return True if they can be added, raise ValueError if not.
+    #
+    def validate_addition(self, participant_names, the_chores) :
+        return Household.check_addition(self.household_name, self._participants, self._chores,
+                                        participant_names, the_chores)
 
-    
 
     ## Generate a string representation of the chore log.
     #
+    #  @param output_format "text", "table" or "json", see render_module
     #  @return a string containting the information in the chore log
-    def chore_log_string(self) :
-        chore_log_string = "TO BE COMPLETED"
-            
-        return chore_log_string
+    def chore_log_string(self, output_format="text") :
+        return render_module.render_chore_log(self, output_format)
 
 
     ## Update the chore log.
@@ -119,8 +231,38 @@ class Household() :
     # 
     # {"fred" : {"chore1": 0, "chore2": 0}, walt : {"chore1": 0, "chore2": 0}}
     #
+    # The update is passed to the event sink first, so the log is unchanged
+    # if the sink raises an exception. If the sink returns the new count,
+    # such as the score ChoreStore.increment_score read back from the
+    # database, that count is kept, so the log does not drift from it.
+    #
+    #   @return the new number of times the chore has been done.
+    #
     def update_log(self, name, chore, number_completed ) :
-        return
+        if name not in self.chore_log :
+            raise ValueError("{} is not a participant of household {}."
+                             .format(name, self.household_name))
+        if chore not in self.chore_log[name] :
+            raise ValueError("{} is not a chore of household {}."
+                             .format(chore, self.household_name))
+        if not isinstance(number_completed, int) or isinstance(number_completed, bool) :
+            raise TypeError("The number of chores done must be an integer.")
+        if number_completed < Household.MINIMUM_CHORES_DONE \
+            or number_completed > Household.MAXIMUM_CHORES_DONE :
+            raise ValueError(("The number of chores done must be greater or equal to " +
+                              "{} and less than or equal to {}.")
+                .format(Household.MINIMUM_CHORES_DONE, Household.MAXIMUM_CHORES_DONE))
+
+        count = None
+        if self.event_sink is not None :
+            count = self.event_sink(self.household_name, name, chore, number_completed)
+
+        if count is None :
+            count = self.chore_log.add(name, chore, number_completed)
+        else :
+            self.chore_log.set_count(name, chore, count)
+        self._version = self._version + 1
+        return count
         
     ## Check the name contains only characters from the alphabet and check that it is the right length.
     # 
@@ -146,20 +288,65 @@ class Household() :
             return True
 
 
+    ## Check that participants and chores can be added to an existing
+    #  household with the rules used by the interactive prompts: each new
+    #  name is valid and not there already, and the household stays within
+    #  Participants.MAXIMUM_HOUSEHOLD_SIZE and
+    #  ChoresList.MAXIMUM_NUMBER_OF_CHORES.
+    #
+    # @param house_name the household name, for the error messages
+    # @param participants the current participant names, anything with len()
+    #        and in, such as a set or a Participants object
+    # @param chore_names the current chore names, likewise
+    # @param participant_names an iterable of new participant names
+    # @param the_chores an iterable of new Chore objects
+    # @return True if they can be added, raise ValueError if not.
+    #
+    @staticmethod
+    def check_addition(house_name, participants, chore_names, participant_names, the_chores) :
+        participant_names = list(participant_names)
+        the_chores = list(the_chores)
+        if not participant_names and not the_chores :
+            raise ValueError("Nothing to add: give participants or chores.")
+
+        new_names = set()
+        for person_name in participant_names :
+            Participants.is_valid_name_indiv(person_name)
+            if person_name in participants or person_name in new_names :
+                raise ValueError("Household {} already has a participant called {}."
+                                 .format(house_name, person_name))
+            new_names.add(person_name)
+        if len(participants) + len(new_names) > Participants.MAXIMUM_HOUSEHOLD_SIZE :
+            raise ValueError("A household can have at most {} participants."
+                             .format(Participants.MAXIMUM_HOUSEHOLD_SIZE))
+
+        new_chore_names = set()
+        for chore in the_chores :
+            if not isinstance(chore, Chore) :
+                raise TypeError("The chores to add must be Chore objects.")
+            if chore.chore_name in chore_names or chore.chore_name in new_chore_names :
+                raise ValueError("Chore: {} already exists in the set".format(chore.chore_name))
+            new_chore_names.add(chore.chore_name)
+        if len(chore_names) + len(new_chore_names) > ChoresList.MAXIMUM_NUMBER_OF_CHORES :
+            raise ValueError("A household can have at most {} chores."
+                             .format(ChoresList.MAXIMUM_NUMBER_OF_CHORES))
+
+        return True
+
+
     @staticmethod
     def initialise_log(the_participants, the_chores) :
  
-        # Create a dictionary where the keys are the participant names
-        # and the values are another dictionary containing all the chore names
-        # as keys and the number of times completed as values.
+        # Create a ChoreLog, a participant x chore matrix of counts that reads
+        # like a dictionary where the keys are the participant names and the
+        # values are another dictionary containing all the chore names as
+        # keys and the number of times completed as values.
         #
         # Example:
         # 
         # {"fred" : {"chore1": 0, "chore2": 0}, walt : {"chore1": 0, "chore2": 0}}
-        
-        household_log = {}
 
-        return household_log
+        return ChoreLog(the_participants, [chore.chore_name for chore in the_chores])
             
 
 ## main method
@@ -215,10 +402,40 @@ def main():
                       {Chore("wash up", 4), Chore("vacuum stairs", 2), Chore("dusting",1),
                        Chore("empty bin", 2)})
         h.update_log("personA", "wash up", 49)
+        print("\n\tVALID: ", h.chore_log["personA"]["wash up"])
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 7: Update the log with an event sink")
+    try:
+        events = []
+        h = Household("House1", {"personA","personB"},
+                      {Chore("wash up", 4), Chore("dusting",1)},
+                      lambda *event: events.append(event))
+        h.update_log("personB", "dusting", 2)
+        print("\n\tVALID: ", events)
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 8: Update the log for a chore that does not exist")
+    try:
+        h.update_log("personB", "hoover", 2)
         print("\n\tVALID: ", h)
     except Exception as err:
         print("\tERROR: ", err)
 
+    print("\nTest 9: Add and remove participants and chores, keeping the log")
+    try:
+        h.add_participants(["personC", "personD"])
+        h.add_chore(Chore("hoover", 1))
+        h.update_log("personC", "hoover", 2)
+        h.remove_participant("personA")
+        h.remove_chore("wash up")
+        print("\n\tVALID: ", h.chore_log.to_dict())
+        h.remove_chore("dusting")
+    except Exception as err:
+        print("\tERROR: ", err)
+
 
 if __name__ == "__main__":
     main()
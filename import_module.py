@@ -0,0 +1,388 @@
+##
+#  Bulk import of households from CSV or JSONL files.
+#
+#  Households are read one at a time from the file, validated with the same
+#  rules as the interactive prompts, and inserted with executemany() in
+#  transactions of many households each. A household that fails validation is
+#  recorded in the error report and skipped; the rest of the file is imported.
+#
+#  JSONL: one household per line
+#      {"household": "House1", "participants": ["fred", "walt"],
+#       "chores": [{"name": "wash up", "frequency": 3}, ...]}
+#
+#  CSV: a header row "household,type,name,frequency", then one row per
+#  participant (type "participant") or chore (type "chore"). The rows of a
+#  household must be next to each other. Files written by export_module can
+#  be imported; their scores are not.
+#
+#  Usage: python import_module.py file [--format csv|jsonl] [--database file]
+#                                      [--report file]
+#         python import_module.py --test
+
+import argparse
+import csv
+import gzip
+import json
+import sqlite3
+import sys
+import time
+from collections import namedtuple
+from operator import itemgetter
+
+from household_module import Household
+from participants_list_module import Participants
+from chores_list_module import ChoresList, Chore
+
+## A household read from the file.
+#  line      the line number the household starts on
+#
+HouseholdRecord = namedtuple("HouseholdRecord", ["line", "house_name", "participants", "chores"])
+
+## A household that was not imported.
+#
+RecordError = namedtuple("RecordError", ["line", "house_name", "message"])
+
+## The outcome of an import.
+#  households     the number of households imported
+#  score_rows     the number of ScoreLog rows inserted
+#  errors         a list of RecordError
+#  seconds        the time taken
+#
+ImportResult = namedtuple("ImportResult", ["households", "score_rows", "errors", "seconds"])
+
+## Number of households inserted per transaction.
+BATCH_SIZE = 5000
+
+_INSERT_PARTICIPANT_SQL = "INSERT INTO HouseData (house_name, person_num, person_name) VALUES (?, ?, ?)"
+_INSERT_CHORE_SQL = ("INSERT INTO ChoreData (house_name, chore_num, chore_name, chore_freq) "
+                     "VALUES (?, ?, ?, ?)")
+# The scores of the households inserted after the given house_id, one for
+# every participant and chore, in primary key order. CROSS JOIN keeps
+# Households first, so only the new households are read.
+_INSERT_SCORES_SQL = ("INSERT INTO ScoreLog (house_name, person_num, person_name, chore_name) "
+                      "SELECT p.house_name, p.person_num, p.person_name, c.chore_name "
+                      "FROM Households AS h "
+                      "CROSS JOIN HouseData AS p ON p.house_name = h.house_name "
+                      "CROSS JOIN ChoreData AS c ON c.house_name = h.house_name "
+                      "WHERE h.house_id > ? "
+                      "ORDER BY p.house_name, p.person_name, c.chore_name")
+_LAST_HOUSE_ID_SQL = "SELECT COALESCE(MAX(house_id), 0) FROM Households"
+_INSERT_PERSON_TOTAL_SQL = "INSERT INTO ScoreTotals (house_name, person_name, total) VALUES (?, ?, 0)"
+_INSERT_HOUSE_TOTAL_SQL = "INSERT INTO HouseTotals (house_name, total) VALUES (?, 0)"
+_INSERT_HOUSEHOLD_SQL = "INSERT INTO Households (house_name) VALUES (?)"
+_TRIGGERS_SQL = ("SELECT name, sql FROM sqlite_master WHERE type='trigger' "
+                 "AND tbl_name IN ('HouseData', 'ChoreData', 'ScoreLog') ORDER BY name")
+
+
+##  Read households from a JSONL file.
+#
+#   @param lines an iterable of lines
+#   @return a generator of HouseholdRecord, or of RecordError for lines that
+#           cannot be parsed
+#
+def read_jsonl(lines) :
+    for line_number, line in enumerate(lines, 1) :
+        if not line.strip() :
+            continue
+        try :
+            item = json.loads(line)
+            chores = []
+            for chore in item.get("chores", []) :
+                chores.append((chore["name"], chore["frequency"]))
+            yield HouseholdRecord(line_number, item["household"],
+                                  list(item.get("participants", [])), chores)
+        except (ValueError, KeyError, TypeError, AttributeError) as err :
+            yield RecordError(line_number, None, "Cannot read line: {}".format(err))
+
+
+##  Read households from a CSV file.
+#
+#   @param lines an iterable of lines
+#   @return a generator of HouseholdRecord, or of RecordError for rows that
+#           cannot be parsed
+#
+def read_csv(lines) :
+    reader = csv.DictReader(lines)
+    current = None
+
+    for row in reader :
+        line_number = reader.line_num
+        house_name = row.get("household")
+        kind = (row.get("type") or "").strip().lower()
+
+        if kind == "score" :
+            # Score rows written by export_module; imported households start at zero.
+            continue
+
+        if house_name is None or kind not in ("participant", "chore") :
+            yield RecordError(line_number, house_name,
+                              "Rows need a household and a type of participant or chore.")
+            continue
+
+        if current is None or current.house_name != house_name :
+            if current is not None :
+                yield current
+            current = HouseholdRecord(line_number, house_name, [], [])
+
+        if kind == "participant" :
+            current.participants.append(row.get("name"))
+        else :
+            current.chores.append((row.get("name"), row.get("frequency")))
+
+    if current is not None :
+        yield current
+
+
+##  Validate a household with the rules used by the interactive prompts.
+#
+#   @param record a HouseholdRecord
+#   @return a list of (chore_name, frequency) if the household is valid,
+#           raise ValueError or TypeError if it is not.
+#
+def validate_record(record) :
+    Household.is_valid_name(record.house_name)
+
+    names = set(record.participants)
+    if len(names) != len(record.participants) :
+        raise ValueError("Household {} lists a participant twice.".format(record.house_name))
+    Participants.valid_participants(names)
+
+    chores = []
+    chore_names = set()
+    for chore_name, frequency in record.chores :
+        Chore.is_valid_chore_name(chore_name)
+        Chore.is_valid_frequency(frequency)
+        if chore_name in chore_names :
+            raise ValueError("Chore: {} already exists in the set".format(chore_name))
+        chore_names.add(chore_name)
+        chores.append((chore_name, int(frequency)))
+    ChoresList.is_valid_length(chore_names)
+
+    return chores
+
+
+##  Import households into a store.
+#
+#   @param store a ChoreStore
+#   @param records an iterable of HouseholdRecord and RecordError, as returned
+#          by read_csv or read_jsonl
+#   @param batch_size the number of households inserted per transaction
+#   @return an ImportResult
+#
+def import_records(store, records, batch_size=BATCH_SIZE) :
+    started = time.perf_counter()
+    errors = []
+    seen = set()
+    households = 0
+    score_rows = 0
+
+    participants_rows = []
+    chore_rows = []
+    batch_names = []
+
+    def write_batch() :
+        # The totals and Households triggers are dropped for the batch and
+        # recreated before it commits: every imported score is zero and every
+        # household is new, so their rows are inserted directly instead of
+        # being upserted once per row.
+        #
+        # Every parent row is in the batch too, so the parents are checked
+        # here once instead of by SQLite for every row, and foreign keys are
+        # turned off for the batch. The scores are made from the batch's
+        # participants and chores by a join, so their parents exist. Foreign
+        # keys can only be turned off outside a transaction, so with group
+        # commit, or inside a caller's transaction, SQLite still checks them.
+        #
+        # Returns the number of ScoreLog rows inserted.
+        check_parents(batch_names, participants_rows, chore_rows)
+        conn = store.connection()
+        unchecked = not store.group_commit and not conn.in_transaction
+        if unchecked :
+            conn.execute("PRAGMA foreign_keys=OFF")
+        try :
+            return insert_batch()
+        finally :
+            if unchecked :
+                conn.execute("PRAGMA foreign_keys=ON")
+
+    def insert_batch() :
+        with store.transaction() as conn :
+            last_house_id = conn.execute(_LAST_HOUSE_ID_SQL).fetchone()[0]
+            triggers = conn.execute(_TRIGGERS_SQL).fetchall()
+            for name, sql in triggers :
+                conn.execute("DROP TRIGGER {}".format(name))
+
+            # Households first: the other tables refer to it.
+            conn.executemany(_INSERT_HOUSEHOLD_SQL, [(house_name,) for house_name in batch_names])
+            conn.executemany(_INSERT_PARTICIPANT_SQL, participants_rows)
+            conn.executemany(_INSERT_CHORE_SQL, chore_rows)
+            inserted = conn.execute(_INSERT_SCORES_SQL, (last_house_id,)).rowcount
+            conn.executemany(_INSERT_PERSON_TOTAL_SQL,
+                             [(house_name, person_name) for house_name, person_num, person_name
+                              in participants_rows])
+            conn.executemany(_INSERT_HOUSE_TOTAL_SQL,
+                             [(house_name,) for house_name in batch_names])
+
+            for name, sql in triggers :
+                conn.execute(sql)
+        return inserted
+
+    for record in records :
+        if isinstance(record, RecordError) :
+            errors.append(record)
+            continue
+
+        try :
+            chores = validate_record(record)
+            if record.house_name in seen or store.household_exists(record.house_name) :
+                raise ValueError("Household {} already exists.".format(record.house_name))
+        except (ValueError, TypeError) as err :
+            errors.append(RecordError(record.line, record.house_name, str(err).strip()))
+            continue
+
+        house_name = record.house_name
+        seen.add(house_name)
+        batch_names.append(house_name)
+        for person_num, person_name in enumerate(record.participants, 1) :
+            participants_rows.append((house_name, person_num, person_name))
+        for chore_num, (chore_name, frequency) in enumerate(chores, 1) :
+            chore_rows.append((house_name, chore_num, chore_name, frequency))
+
+        if len(batch_names) >= batch_size :
+            score_rows = score_rows + write_batch()
+            households = households + len(batch_names)
+            participants_rows, chore_rows, batch_names = [], [], []
+
+    if batch_names :
+        score_rows = score_rows + write_batch()
+        households = households + len(batch_names)
+
+    return ImportResult(households, score_rows, errors, time.perf_counter() - started)
+
+
+##  Check that every participant and chore of a batch has its household in
+#   the batch.
+#
+#   @exception sqlite3.IntegrityError raised if a household is missing
+#
+def check_parents(house_names, participants_rows, chore_rows) :
+    # Sets built with itemgetter, so the check stays cheap next to the inserts.
+    house_names = set(house_names)
+    if not (set(map(itemgetter(0), participants_rows)) <= house_names
+            and set(map(itemgetter(0), chore_rows)) <= house_names) :
+        raise sqlite3.IntegrityError("An imported participant or chore has no household in its batch.")
+
+
+##  Import a CSV or JSONL file, optionally gzip-compressed, into a store.
+#
+#   @param store a ChoreStore
+#   @param path the file to import
+#   @param file_format "csv" or "jsonl", None to use the file extension
+#   @return an ImportResult
+#
+def import_file(store, path, file_format=None, batch_size=BATCH_SIZE) :
+    name = path.lower()
+    if name.endswith(".gz") :
+        name = name[:-3]
+    if file_format is None :
+        file_format = "csv" if name.endswith(".csv") else "jsonl"
+    if file_format not in ("csv", "jsonl") :
+        raise ValueError("Unknown import format: {}".format(file_format))
+
+    if path.lower().endswith(".gz") :
+        infile = gzip.open(path, "rt", newline="", encoding="utf-8")
+    else :
+        infile = open(path, newline="", encoding="utf-8")
+
+    with infile :
+        reader = read_csv if file_format == "csv" else read_jsonl
+        return import_records(store, reader(infile), batch_size)
+
+
+##  Generate a string representation of the error report.
+#
+#   @param errors a list of RecordError
+#   @return a string with one line per rejected household
+#
+def error_report_string(errors) :
+    return "\n".join("line {}: {}: {}".format(error.line, error.house_name, error.message)
+                     for error in errors)
+
+
+## Some simple tests, run with --test.
+#
+def run_tests():
+    import os
+    import tempfile
+    import export_module
+    import schema_module
+    from storage_module import ChoreStore
+
+    directory = tempfile.mkdtemp()
+    store = ChoreStore(os.path.join(directory, "import.db"))
+
+    print("Test 1: Import into a new database")
+    lines = ['{"household": "House1", "participants": ["fred", "walt"], '
+             '"chores": [{"name": "wash up", "frequency": 3}, {"name": "dusting", "frequency": 1}]}',
+             '{"household": "House2", "participants": ["jane", "mary"], '
+             '"chores": [{"name": "hoover", "frequency": 2}, {"name": "empty bin", "frequency": 1}]}',
+             '{"household": "House1", "participants": ["fred", "walt"], '
+             '"chores": [{"name": "wash up", "frequency": 3}, {"name": "dusting", "frequency": 1}]}']
+    result = import_records(store, read_jsonl(lines), batch_size=1)
+    with store.reading() as conn :
+        version = schema_module.schema_version(conn)
+    print("\tVALID (expect 2 households, 8 score rows, schema {}): ".format(schema_module.SCHEMA_VERSION),
+          result.households, result.score_rows, version)
+    print("\tREJECTED: ", error_report_string(result.errors))
+
+    print("\nTest 2: The imported households can be used")
+    store.increment_score("House1", "fred", "wash up", 2)
+    print("\tVALID: ", store.household_data("House1"))
+
+    print("\nTest 3: Export and import again")
+    path = os.path.join(directory, "households.csv")
+    export_module.export_file(store, path)
+    copy = ChoreStore(os.path.join(directory, "copy.db"))
+    result = import_file(copy, path)
+    print("\tVALID (expect 2, no errors): ", result.households, result.errors)
+    print("\tVALID: ", copy.household_data("House2"))
+    copy.close()
+    store.close()
+
+
+## Import a file from the command line.
+#
+def main(argv=None):
+    from storage_module import ChoreStore
+
+    parser = argparse.ArgumentParser(description="Import households into Chore Chart.")
+    parser.add_argument("file", nargs="?")
+    parser.add_argument("--format", choices=["csv", "jsonl"])
+    parser.add_argument("--database", default=ChoreStore.DEFAULT_FILE)
+    parser.add_argument("--report", help="write the error report to this file")
+    parser.add_argument("--test", action="store_true", help="run the simple tests")
+    args = parser.parse_args(argv)
+
+    if args.test :
+        run_tests()
+        return 0
+    if args.file is None :
+        parser.error("the file to import is required")
+
+    store = ChoreStore(args.database)
+    result = import_file(store, args.file, args.format)
+    store.close()
+
+    print("Imported {} households ({} score rows) in {:.2f}s, {} rejected."
+          .format(result.households, result.score_rows, result.seconds, len(result.errors)))
+    if args.report :
+        with open(args.report, "w", encoding="utf-8") as outfile :
+            outfile.write(error_report_string(result.errors) + "\n")
+    elif result.errors :
+        print(error_report_string(result.errors))
+
+    return 1 if result.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
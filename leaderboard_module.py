@@ -0,0 +1,103 @@
+##
+#  Leaderboard engine for Chore Chart.
+#
+#  A leaderboard is computed with a single query: the participants' totals,
+#  kept in ScoreTotals by triggers on ScoreLog, are ranked with a window
+#  function and joined back to the per-chore rows, so the cost does not grow
+#  with the number of queries issued per participant.
+
+import sqlite3
+from collections import namedtuple
+
+## One line of the leaderboard.
+#  rank        position of the participant, equal totals share a rank
+#  person_name the participant's name
+#  total       the sum of the participant's chore scores
+#  chores      a dictionary of chore name -> score, in chore name order
+#
+LeaderboardEntry = namedtuple("LeaderboardEntry", ["rank", "person_name", "total", "chores"])
+
+_LEADERBOARD_SQL = """
+    WITH ranked AS (
+        SELECT person_name, total, RANK() OVER (ORDER BY total DESC) AS position
+        FROM ScoreTotals
+        WHERE house_name = :house)
+    SELECT r.position, r.person_name, r.total, s.chore_name, s.chore_score
+    FROM ranked AS r
+    JOIN ScoreLog AS s
+      ON s.house_name = :house AND s.person_name = r.person_name
+    WHERE :limit IS NULL OR r.position <= :limit
+    ORDER BY r.position, r.person_name, s.chore_name
+"""
+
+
+##  Compute the leaderboard of a household.
+#
+#   @param conn an open sqlite3 connection
+#   @param house_name the name of the household
+#   @param limit only return participants ranked limit or better. Participants
+#          tied at the last position are all included. None returns everyone.
+#   @return a list of LeaderboardEntry, best first
+#   @exception ValueError raised if limit is not a positive integer
+#
+def get_leaderboard(conn, house_name, limit=None) :
+    if limit is not None and (not isinstance(limit, int) or limit < 1) :
+        raise ValueError("Leaderboard limit must be a positive integer.")
+
+    entries = []
+    current = None
+    for position, person_name, total, chore_name, chore_score in \
+            conn.execute(_LEADERBOARD_SQL, {"house": house_name, "limit": limit}) :
+        if current is None or current.person_name != person_name :
+            current = LeaderboardEntry(position, person_name, total, {})
+            entries.append(current)
+        current.chores[chore_name] = chore_score
+
+    return entries
+
+
+##  Generate a string representation of a leaderboard.
+#
+#   @param entries a list of LeaderboardEntry
+#   @return a string with one line per participant followed by their chores
+#
+def leaderboard_string(entries) :
+    lines = []
+    for entry in entries :
+        lines.append("{}. {}: {}".format(entry.rank, entry.person_name, entry.total))
+        for chore_name, chore_score in entry.chores.items() :
+            lines.append("\t" + chore_name + "    (" + str(chore_score) + ")")
+
+    return "\n".join(lines)
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import schema_module
+
+    conn = sqlite3.connect(":memory:")
+    schema_module.migrate(conn)
+    conn.executemany("INSERT INTO ScoreLog (house_name, person_num, person_name, chore_name, chore_score) "
+                     "VALUES (?, ?, ?, ?, ?)",
+                     [("House1", 1, "fred", "wash up", 4), ("House1", 1, "fred", "dusting", 1),
+                      ("House1", 2, "walt", "wash up", 2), ("House1", 2, "walt", "dusting", 3),
+                      ("House1", 3, "jane", "wash up", 0), ("House1", 3, "jane", "dusting", 2)])
+
+    print("Test 1: Full leaderboard, fred and walt tied")
+    print(leaderboard_string(get_leaderboard(conn, "House1")))
+
+    print("\nTest 2: Top 1 includes both tied participants")
+    print(leaderboard_string(get_leaderboard(conn, "House1", limit=1)))
+
+    print("\nTest 3: Invalid limit")
+    try:
+        get_leaderboard(conn, "House1", limit=0)
+    except ValueError as err:
+        print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
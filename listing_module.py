@@ -0,0 +1,126 @@
+##
+#  Listing and searching the households of Chore Chart a page at a time.
+#
+#  Pages are keyed on the last name of the previous page rather than on an
+#  offset, so every page is a range of the Households name index however far
+#  into the list it is. A prefix narrows the range. A substring of three or
+#  more characters is looked up in the HouseholdSearch trigram index; a
+#  shorter one is checked against each name in order until the page is full.
+#  Prefixes are case-sensitive, substrings are not.
+
+from collections import namedtuple
+
+## Number of households on a page by default.
+PAGE_SIZE = 20
+
+## One page of household names.
+#  next   the value of after for the following page, None on the last page
+#
+HouseholdPage = namedtuple("HouseholdPage", ["names", "next"])
+
+# The shortest substring the trigram index can match.
+_TRIGRAM = 3
+
+
+def _prefix_end(prefix) :
+    # The smallest string greater than every string starting with prefix.
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+##  Return a page of household names, in name order.
+#
+#   @param conn an open sqlite3 connection
+#   @param after return names after this one, None to start at the first
+#   @param limit the largest number of names returned
+#   @param prefix only return names starting with this, None for all
+#   @param contains only return names containing this, ignoring case, None
+#          for all
+#   @return a HouseholdPage
+#
+def list_households(conn, after=None, limit=PAGE_SIZE, prefix=None, contains=None) :
+    if not isinstance(limit, int) or limit < 1 :
+        raise ValueError("The page size must be a positive integer.")
+
+    conditions = []
+    parameters = []
+    if prefix and (after is None or after < prefix) :
+        conditions.append("h.house_name >= ?")
+        parameters.append(prefix)
+    elif after is not None :
+        conditions.append("h.house_name > ?")
+        parameters.append(after)
+    if prefix :
+        conditions.append("h.house_name < ?")
+        parameters.append(_prefix_end(prefix))
+
+    source = "Households AS h"
+    if contains and len(contains) >= _TRIGRAM :
+        source = "HouseholdSearch JOIN Households AS h ON h.house_id = HouseholdSearch.rowid"
+        conditions.append("HouseholdSearch MATCH ?")
+        parameters.append('"' + contains.replace('"', '""') + '"')
+    elif contains :
+        conditions.append("instr(lower(h.house_name), ?) > 0")
+        parameters.append(contains.lower())
+
+    sql = "SELECT h.house_name FROM " + source
+    if conditions :
+        sql = sql + " WHERE " + " AND ".join(conditions)
+    sql = sql + " ORDER BY h.house_name LIMIT ?"
+    parameters.append(limit + 1)
+
+    names = [row[0] for row in conn.execute(sql, parameters)]
+    if len(names) > limit :
+        return HouseholdPage(names[:limit], names[limit - 1])
+    return HouseholdPage(names, None)
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import sqlite3
+    import time
+    import schema_module
+
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    schema_module.migrate(conn)
+    conn.execute("BEGIN")
+    conn.executemany("INSERT INTO HouseData (house_name, person_num, person_name) VALUES (?, 1, 'fred')",
+                     [("House{:05d}".format(i),) for i in range(50000)]
+                     + [("Flat{:05d}".format(i),) for i in range(50000)])
+    conn.commit()
+
+    print("Test 1: First and second pages")
+    page = list_households(conn, limit=3)
+    print("\tVALID: ", page)
+    print("\tVALID: ", list_households(conn, page.next, 3))
+
+    print("\nTest 2: Prefix")
+    print("\tVALID: ", list_households(conn, prefix="House4999", limit=5))
+
+    print("\nTest 3: Substring, ignoring case")
+    print("\tVALID: ", list_households(conn, contains="USE123", limit=5))
+    print("\tVALID: ", list_households(conn, contains="t4", limit=3))
+
+    print("\nTest 4: Timing over 100000 households")
+    started = time.perf_counter()
+    for i in range(100) :
+        list_households(conn, "House{:05d}".format(i * 400), 20)
+        list_households(conn, prefix="Flat{:03d}".format(i), limit=20)
+        list_households(conn, contains="{:04d}".format(i * 7), limit=20)
+    print("\t300 pages in {:.3f}s".format(time.perf_counter() - started))
+
+    print("\nTest 5: Removing the last participant removes the household")
+    conn.execute("DELETE FROM HouseData WHERE house_name = 'House00001'")
+    print("\tVALID: ", list_households(conn, prefix="House0000", limit=3))
+
+    print("\nTest 6: Invalid page size")
+    try:
+        list_households(conn, limit=0)
+    except ValueError as err:
+        print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
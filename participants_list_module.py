@@ -13,6 +13,16 @@ class Participants():
     def __init__(self, the_participants) :
         self.participants = the_participants
 
+    ## Create a set of participants without validating it, for names that
+    #  have already been validated, such as those read from the database.
+    #  @param the_participants an iterable of names
+    #
+    @classmethod
+    def trusted(cls, the_participants) :
+        participants = cls.__new__(cls)
+        participants._participants = set(the_participants)
+        return participants
+
     ## Return the participants' list.
     #          
     @property
@@ -29,22 +39,65 @@ class Participants():
     def participants(self, the_participants) :
         try :
             self.valid_participants(the_participants)
-            self._participants = the_participants
+            self._participants = set(the_participants)   # a copy, so add() and remove() leave the caller's set alone
         except (ValueError,TypeError) as err :
             raise
 
 
     def __str__(self):
-        participant_length = len(self.participants)
-        i = 1
-        participant_string = ""
-        for participant in self.participants :
-            participant_string = participant_string + str(participant)
-            if i < participant_length :
-                participant_string = participant_string + ", "
-            i = i + 1
-            
-        return participant_string
+        return ", ".join(str(participant) for participant in self.participants)
+
+    def __len__(self):
+        return len(self._participants)
+
+    def __iter__(self):
+        return iter(self._participants)
+
+    def __contains__(self, name):
+        return name in self._participants
+
+
+    ## Add a participant. Only the new name is validated.
+    #  @param name the participant's name
+    #  @exception ValueError raised if the name is invalid or already in the
+    #             set, or the set is full
+    def add(self, name) :
+        self.bulk_add([name])
+
+
+    ## Add several participants at once. Only the new names are validated, and
+    #  none is added unless all of them can be.
+    #  @param names an iterable of names
+    #  @exception ValueError raised if a name is invalid or repeated, or the
+    #             set would be too long
+    def bulk_add(self, names) :
+        names = list(names)
+        new_names = set()
+        for name in names :
+            Participants.is_valid_name_indiv(name)
+            if name in self._participants or name in new_names :
+                raise ValueError("\n\t\tThere is already a participant called {}.".format(name))
+            new_names.add(name)
+
+        if len(self._participants) + len(new_names) > Participants.MAXIMUM_HOUSEHOLD_SIZE :
+            raise ValueError(("\n\t\tThe number of participants in the household must be" +
+                " less than {}.").format(Participants.MAXIMUM_HOUSEHOLD_SIZE + 1))
+
+        self._participants.update(new_names)
+
+
+    ## Remove a participant.
+    #  @param name the participant's name
+    #  @exception ValueError raised if there is no such participant, or the
+    #             set would be too short
+    def remove(self, name) :
+        if name not in self._participants :
+            raise ValueError("{} is not a participant.".format(name))
+        if len(self._participants) - 1 < Participants.MINIMUM_HOUSEHOLD_SIZE :
+            raise ValueError(("\n\t\tThe number of participants in the household must be" +
+                " more than {}.").format(Participants.MINIMUM_HOUSEHOLD_SIZE - 1))
+
+        self._participants.discard(name)
 
 
     ## Check the set of participants.
@@ -186,5 +239,16 @@ def main():
     except Exception as err:
         print("\tERROR: ", err)  
 
+    print("\nTest 7: Add and remove participants")
+    try:
+        p0 = Participants(set(["personA","personB"]))
+        p0.bulk_add(["personC", "personD"])
+        p0.remove("personA")
+        p0.add("personE")
+        print("\n\tVALID: ", sorted(p0))
+        p0.bulk_add(["personF", "personG"])
+    except Exception as err:
+        print("\tERROR: ", err)
+
 if __name__ == "__main__":
     main()    
\ No newline at end of file
@@ -0,0 +1,371 @@
+##
+#  Opt-in profiling of the SQL run by Chore Chart.
+#
+#  A ChoreStore with a Profiler opens its connections as ProfiledConnection,
+#  which times every statement run through execute() and executemany() and
+#  counts the rows fetched from it and the rows it changed. The figures are
+#  grouped by the action that ran the statement, set with Profiler.action(),
+#  so a menu action such as "leaderboard" shows every query it costs.
+#
+#  A statement is slow if executing it, up to its first row, takes slow_ms
+#  or longer; with slow_ms=0 every statement is. Slow statements are kept
+#  with their EXPLAIN QUERY PLAN and the function that ran them, and written
+#  to slow_log as they happen.
+#
+#  profiler = Profiler(slow_ms=20, slow_log=sys.stderr)
+#  store = ChoreStore("chore_chart.db", profiler=profiler)
+#  with profiler.action("leaderboard") :
+#      store.leaderboard("House1")
+#  print(profiler.summary())
+
+import contextlib
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+
+## Statements taking this long, in milliseconds, are slow by default.
+DEFAULT_SLOW_MS = 20
+
+## The action of statements run outside Profiler.action().
+NO_ACTION = "other"
+
+## The actions of the statements a ChoreStore runs when it opens a
+#  connection, and when it brings the schema up to date on the first one,
+#  so they are not counted against the action that happened to open it.
+CONNECT = "connect"
+MIGRATE = "migrate"
+
+## Totals for one statement in one action.
+#  calls     the number of times it was run
+#  seconds   the time spent executing it and fetching its rows
+#  rows      the number of rows fetched
+#  changes   the number of rows inserted, updated or deleted
+#
+StatementStats = namedtuple("StatementStats", ["action", "sql", "calls", "seconds", "rows", "changes"])
+
+## A statement that took at least the slow query threshold.
+#  plan      its EXPLAIN QUERY PLAN, one line per step, or None if there is none
+#  caller    the function that ran it, as "module.function:line"
+#
+SlowQuery = namedtuple("SlowQuery", ["action", "sql", "parameters", "ms", "plan", "caller"])
+
+# Indexes into the lists kept in Profiler._statements.
+_CALLS, _SECONDS, _ROWS, _CHANGES = range(4)
+
+
+class Profiler() :
+
+    ## Constructor.
+    #
+    #  @param slow_ms the slow query threshold in milliseconds, None to keep
+    #         no slow query log
+    #  @param slow_log a file that slow queries are written to as they
+    #         happen, None to only keep them
+    #
+    def __init__(self, slow_ms=DEFAULT_SLOW_MS, slow_log=None) :
+        if slow_ms is not None and slow_ms < 0 :
+            raise ValueError("The slow query threshold must not be negative.")
+
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._statements = {}     # (action, sql) -> [calls, seconds, rows, changes]
+        self._runs = {}           # action -> number of times it was started
+        self._slow = []
+
+    ##  Attribute the statements run by the calling thread inside the block
+    #   to an action. Actions can be nested; the innermost one is used.
+    #
+    @contextlib.contextmanager
+    def action(self, name) :
+        stack = self._stack()
+        stack.append(name)
+        with self._lock :
+            self._runs[name] = self._runs.get(name, 0) + 1
+        try :
+            yield self
+        finally :
+            stack.pop()
+
+    def _stack(self) :
+        stack = getattr(self._local, "stack", None)
+        if stack is None :
+            stack = self._local.stack = []
+        return stack
+
+    ## The action of the calling thread.
+    #
+    @property
+    def current_action(self) :
+        stack = self._stack()
+        return stack[-1] if stack else NO_ACTION
+
+    def _record(self, key, seconds, rows=0, changes=0, calls=0) :
+        with self._lock :
+            stats = self._statements.get(key)
+            if stats is None :
+                stats = self._statements[key] = [0, 0.0, 0, 0]
+            stats[_CALLS] = stats[_CALLS] + calls
+            stats[_SECONDS] = stats[_SECONDS] + seconds
+            stats[_ROWS] = stats[_ROWS] + rows
+            stats[_CHANGES] = stats[_CHANGES] + changes
+
+    def _check_slow(self, conn, key, parameters, seconds) :
+        if self.slow_ms is None or seconds * 1000 < self.slow_ms :
+            return
+        slow = SlowQuery(key[0], key[1], parameters, seconds * 1000,
+                         query_plan(conn, key[1], parameters), _caller())
+        with self._lock :
+            self._slow.append(slow)
+        if self.slow_log is not None :
+            print(slow_query_string(slow), file=self.slow_log)
+
+    ##  Return the totals of every statement, most time first.
+    #
+    #   @return a list of StatementStats
+    #
+    def statements(self) :
+        with self._lock :
+            stats = [StatementStats(action, sql, *values)
+                     for (action, sql), values in self._statements.items()]
+        return sorted(stats, key=lambda s : s.seconds, reverse=True)
+
+    ##  Return the totals of each action.
+    #
+    #   @return a dictionary of action -> {"runs", "queries", "seconds", "rows",
+    #           "changes"}, in order of first use
+    #
+    def actions(self) :
+        totals = {}
+        with self._lock :
+            for action, runs in self._runs.items() :
+                totals[action] = {"runs": runs, "queries": 0, "seconds": 0.0, "rows": 0, "changes": 0}
+            for (action, sql), values in self._statements.items() :
+                total = totals.setdefault(action, {"runs": 0, "queries": 0, "seconds": 0.0,
+                                                   "rows": 0, "changes": 0})
+                total["queries"] = total["queries"] + values[_CALLS]
+                total["seconds"] = total["seconds"] + values[_SECONDS]
+                total["rows"] = total["rows"] + values[_ROWS]
+                total["changes"] = total["changes"] + values[_CHANGES]
+        return totals
+
+    ##  Return the slow queries, in the order they were run.
+    #
+    def slow_queries(self) :
+        with self._lock :
+            return list(self._slow)
+
+    ##  Forget everything recorded so far.
+    #
+    def reset(self) :
+        with self._lock :
+            self._statements.clear()
+            self._runs.clear()
+            del self._slow[:]
+
+    ##  Return a report of the actions and the statements that took the most
+    #   time.
+    #
+    #   @param top the number of statements listed
+    #
+    def summary(self, top=10) :
+        lines = ["{:<14} {:>6} {:>8} {:>8} {:>8} {:>10}".format(
+            "action", "runs", "queries", "rows", "changes", "ms")]
+        for action, total in self.actions().items() :
+            lines.append("{:<14} {:>6} {:>8} {:>8} {:>8} {:>10.2f}".format(
+                action, total["runs"], total["queries"], total["rows"], total["changes"],
+                total["seconds"] * 1000))
+
+        lines.append("")
+        lines.append("{:<14} {:>6} {:>10} {:>8}  {}".format("action", "calls", "ms", "rows", "statement"))
+        for stats in self.statements()[:top] :
+            lines.append("{:<14} {:>6} {:>10.2f} {:>8}  {}".format(
+                stats.action, stats.calls, stats.seconds * 1000, stats.rows, _one_line(stats.sql)))
+
+        slow = self.slow_queries()
+        if slow :
+            lines.append("")
+            lines.append("{} slow quer{} of {} ms or more".format(
+                len(slow), "y" if len(slow) == 1 else "ies", self.slow_ms))
+        return "\n".join(lines)
+
+
+class ProfiledCursor(sqlite3.Cursor) :
+
+    def _start(self, sql) :
+        self._profiler = self.connection.profiler
+        self._key = (self._profiler.current_action, sql)
+
+    def _fetched(self, started, rows) :
+        self._profiler._record(self._key, time.perf_counter() - started, rows=rows)
+
+    def execute(self, sql, parameters=()) :
+        self._start(sql)
+        started = time.perf_counter()
+        try :
+            super().execute(sql, parameters)
+        finally :
+            seconds = time.perf_counter() - started
+            self._profiler._record(self._key, seconds, changes=max(self.rowcount, 0), calls=1)
+        self._profiler._check_slow(self.connection, self._key, parameters, seconds)
+        return self
+
+    def executemany(self, sql, seq_of_parameters) :
+        self._start(sql)
+        if not isinstance(seq_of_parameters, (list, tuple)) :
+            seq_of_parameters = list(seq_of_parameters)
+        started = time.perf_counter()
+        try :
+            super().executemany(sql, seq_of_parameters)
+        finally :
+            seconds = time.perf_counter() - started
+            self._profiler._record(self._key, seconds, changes=max(self.rowcount, 0), calls=1)
+        self._profiler._check_slow(self.connection, self._key,
+                                   seq_of_parameters[0] if seq_of_parameters else (), seconds)
+        return self
+
+    def __next__(self) :
+        started = time.perf_counter()
+        try :
+            row = super().__next__()
+        except StopIteration :
+            self._fetched(started, 0)
+            raise
+        self._fetched(started, 1)
+        return row
+
+    def fetchone(self) :
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None) :
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self) :
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+
+## A connection that profiles the statements run through execute() and
+#  executemany(). Set its profiler attribute after connecting:
+#
+#  conn = sqlite3.connect(path, factory=ProfiledConnection)
+#  conn.profiler = profiler
+#
+class ProfiledConnection(sqlite3.Connection) :
+
+    profiler = None
+
+    def execute(self, sql, parameters=()) :
+        if self.profiler is None :
+            return super().execute(sql, parameters)
+        return self.cursor(ProfiledCursor).execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters) :
+        if self.profiler is None :
+            return super().executemany(sql, seq_of_parameters)
+        return self.cursor(ProfiledCursor).executemany(sql, seq_of_parameters)
+
+
+##  Return the EXPLAIN QUERY PLAN of a statement, one line per step,
+#   indented under its parent step.
+#
+#   @param conn an open sqlite3 connection
+#   @param sql the statement
+#   @param parameters its parameters
+#   @return a list of strings, None if the statement has no plan
+#
+def query_plan(conn, sql, parameters=()) :
+    try :
+        rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+    except sqlite3.Error :
+        return None
+    if not rows :
+        return None
+
+    depths = {0: -1}
+    lines = []
+    for step, parent, unused, detail in rows :
+        depths[step] = depths.get(parent, -1) + 1
+        lines.append("  " * depths[step] + detail)
+    return lines
+
+
+##  Return a slow query as text, with its plan.
+#
+def slow_query_string(slow) :
+    lines = ["slow query: {:.2f} ms in {} from {}: {}".format(slow.ms, slow.action, slow.caller,
+                                                             _one_line(slow.sql))]
+    for line in slow.plan or [] :
+        lines.append("    " + line)
+    return "\n".join(lines)
+
+
+def _caller() :
+    # The first frame outside this module is the one that ran the statement.
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get("__name__") == __name__ :
+        frame = frame.f_back
+    if frame is None :
+        return None
+    return "{}.{}:{}".format(frame.f_globals.get("__name__"), frame.f_code.co_name, frame.f_lineno)
+
+
+def _one_line(sql) :
+    return " ".join(sql.split())
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import os
+    import tempfile
+    from chores_list_module import Chore
+    from storage_module import ChoreStore
+
+    directory = tempfile.mkdtemp()
+    profiler = Profiler(slow_ms=0)
+    store = ChoreStore(os.path.join(directory, "profile.db"), profiler=profiler)
+
+    print("Test 1: Statements are grouped by action")
+    with profiler.action("create") :
+        store.add_to_household("House1", ["fred", "walt"], [Chore("wash up", 3), Chore("dusting", 1)])
+    with profiler.action("log") :
+        store.increment_score("House1", "fred", "wash up", 2)
+    with profiler.action("leaderboard") :
+        store.leaderboard("House1")
+    actions = profiler.actions()
+    print("\tVALID: ", {action: (total["runs"], total["queries"]) for action, total in actions.items()})
+    print("\tROWS (expect 4, one per participant and chore): ", actions["leaderboard"]["rows"])
+    print("\tVALID (expect 1 migration, not in create): ", actions[MIGRATE]["runs"],
+          actions[MIGRATE]["queries"] > actions["create"]["queries"])
+
+    print("\nTest 2: Slow queries have a plan")
+    slow = [query for query in profiler.slow_queries() if query.action == "leaderboard"]
+    print("\tVALID: ", slow[0].plan if slow else slow)
+
+    print("\nTest 3: Summary")
+    print(profiler.summary(top=5))
+
+    print("\nTest 4: Invalid threshold")
+    try:
+        Profiler(slow_ms=-1)
+    except ValueError as err:
+        print("\tERROR: ", err)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+##
+#  Registry of the households in a ChoreStore.
+#
+#  The household names are read from the database once, on first use, and
+#  then kept in a set that is updated by the registry's own writes, so
+#  checking whether a household exists is a set lookup. Households are
+#  hydrated from the database the first time they are asked for and kept in
+#  a least recently used cache of Household objects, so repeated actions on
+#  the same household do not read its participants and chores again. Adding
+#  or removing participants and chores changes a household in memory in
+#  place, after the database, so it is not read again either.
+#
+#  The registry is only coherent with writes made through it: a program that
+#  writes through the registry must not also write through the store.
+
+import threading
+from collections import OrderedDict
+
+from chores_list_module import Chore
+from household_module import Household
+import listing_module
+
+
+class HouseholdRegistry() :
+
+    ## Number of households kept in memory by default.
+    DEFAULT_CAPACITY = 128
+
+    ## Constructor. Nothing is read until the registry is first used.
+    #
+    #  @param store a ChoreStore
+    #  @param capacity the largest number of Household objects kept in memory
+    #
+    def __init__(self, store, capacity=DEFAULT_CAPACITY) :
+        if not isinstance(capacity, int) or capacity < 1 :
+            raise ValueError("The registry capacity must be a positive integer.")
+
+        self.store = store
+        self.capacity = capacity
+        self._lock = threading.RLock()
+        self._names = None            # set of household names, None until loaded
+        self._sorted_names = None     # sorted list of _names, None until needed
+        self._households = OrderedDict()    # name -> Household, least recent first
+        self._hits = 0
+        self._misses = 0
+
+    def _load_names(self) :
+        if self._names is None :
+            self._names = set(self.store.household_names())
+            self._sorted_names = None
+        return self._names
+
+    def _reload(self) :
+        self._names = None
+        self._households.clear()
+
+    ##  Return the names of all households, in name order.
+    #
+    def names(self) :
+        with self._lock :
+            if self._sorted_names is None :
+                self._sorted_names = sorted(self._load_names())
+            return list(self._sorted_names)
+
+    ##  Return a page of household names, optionally matching a prefix or a
+    #   substring, without loading every name. See
+    #   listing_module.list_households.
+    #
+    def page(self, after=None, limit=listing_module.PAGE_SIZE, prefix=None, contains=None) :
+        return self.store.list_households(after, limit, prefix, contains)
+
+    ##  Check whether a household exists.
+    #
+    #   @param house_name the household name
+    #   @return True or False
+    #
+    def exists(self, house_name) :
+        with self._lock :
+            return house_name in self._load_names()
+
+    def __contains__(self, house_name) :
+        return self.exists(house_name)
+
+    def __len__(self) :
+        with self._lock :
+            return len(self._load_names())
+
+    ##  Return a household, reading it from the database if it is not in
+    #   memory. Its chore log updates are written to the store.
+    #
+    #   @param house_name the household name
+    #   @return a Household, or None if there is no such household
+    #
+    def get(self, house_name) :
+        with self._lock :
+            if house_name not in self._load_names() :
+                return None
+
+            household = self._households.get(house_name)
+            if household is not None :
+                self._households.move_to_end(house_name)
+                self._hits = self._hits + 1
+                return household
+            self._misses = self._misses + 1
+
+            data = self.store.household_data(house_name)
+            if data is None :
+                self._names.discard(house_name)
+                self._sorted_names = None
+                return None
+
+            participant_names, chores, scores = data
+            household = Household.trusted(house_name, participant_names,
+                                          [Chore.trusted(name, frequency)
+                                           for name, frequency in chores],
+                                          scores, self.store.increment_score)
+            self._households[house_name] = household
+            if len(self._households) > self.capacity :
+                self._households.popitem(last=False)
+            return household
+
+    ##  Add participants and chores to a household, creating it if needed.
+    #   See ChoreStore.add_to_household.
+    #
+    def add_to_household(self, house_name, participant_names, chores) :
+        participant_names = list(participant_names)
+        chores = list(chores)
+        with self._lock :
+            self.store.add_to_household(house_name, participant_names, chores)
+
+            def add(household) :
+                household.add_participants(participant_names)
+                household.add_chores(chores)
+            self._changed(house_name, add)
+            if self._names is not None and house_name not in self._names :
+                self._names.add(house_name)
+                self._sorted_names = None
+
+    def _changed(self, house_name, change) :
+        # Apply a change already written to the database to the household in
+        # memory. If the household does not accept it, for example names
+        # the database ignored as already there, it is read again when next
+        # needed.
+        household = self._households.get(house_name)
+        if household is not None :
+            try :
+                change(household)
+            except (ValueError, TypeError, KeyError) :
+                self._households.pop(house_name, None)
+
+    ##  Add to the number of times a participant has done a chore, and to the
+    #   household in memory if it is there.
+    #
+    #   @return the new score, as stored in the database
+    #
+    def increment_score(self, house_name, person_name, chore_name, number_completed) :
+        with self._lock :
+            household = self._households.get(house_name)
+            if household is not None :
+                return household.update_log(person_name, chore_name, number_completed)
+            return self.store.increment_score(house_name, person_name, chore_name,
+                                              number_completed)
+
+    ##  Remove a participant of a household. See ChoreStore.remove_participant.
+    #
+    def remove_participant(self, house_name, person_name) :
+        with self._lock :
+            self.store.remove_participant(house_name, person_name)
+            self._changed(house_name, lambda household : household.remove_participant(person_name))
+
+    ##  Remove a chore of a household. See ChoreStore.remove_chore.
+    #
+    def remove_chore(self, house_name, chore_name) :
+        with self._lock :
+            self.store.remove_chore(house_name, chore_name)
+            self._changed(house_name, lambda household : household.remove_chore(chore_name))
+
+    ##  Remove a household. See ChoreStore.remove_household.
+    #
+    def remove_household(self, house_name) :
+        with self._lock :
+            self.store.remove_household(house_name)
+            self._households.pop(house_name, None)
+            if self._names is not None :
+                self._names.discard(house_name)
+                self._sorted_names = None
+
+    ##  Remove every household.
+    #
+    def wipe(self) :
+        with self._lock :
+            self.store.wipe()
+            self._names = set()
+            self._sorted_names = None
+            self._households.clear()
+
+    ##  Forget households held in memory, so they are read again the next
+    #   time they are needed.
+    #
+    #   @param house_name the household to forget, None to forget them all and
+    #          read the household names again
+    #
+    def invalidate(self, house_name=None) :
+        with self._lock :
+            if house_name is None :
+                self._reload()
+            else :
+                self._households.pop(house_name, None)
+
+    ##  Return the number of households found in memory and read from the
+    #   database, and the number held in memory.
+    #
+    def cache_info(self) :
+        with self._lock :
+            return {"hits": self._hits, "misses": self._misses,
+                    "households": len(self._households), "capacity": self.capacity}
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import os
+    import tempfile
+    from storage_module import ChoreStore
+
+    directory = tempfile.mkdtemp()
+    store = ChoreStore(os.path.join(directory, "registry.db"))
+    registry = HouseholdRegistry(store, capacity=2)
+    for house_name in ("House1", "House2", "House3") :
+        registry.add_to_household(house_name, ["fred", "walt"],
+                                  [Chore("wash up", 3), Chore("dusting", 1)])
+
+    print("Test 1: Names and lookups")
+    print("\tVALID: ", registry.names(), registry.exists("House2"), "House9" in registry)
+
+    print("\nTest 2: Hydrate a household")
+    h = registry.get("House1")
+    print("\tVALID: ", h, h.chore_log.participants, h.chore_log.chores)
+
+    print("\nTest 3: Log chores through the registry, in memory and in the database")
+    print("\tSCORE (expect 4): ", registry.increment_score("House1", "fred", "wash up", 4))
+    print("\tDATABASE (expect 4): ", store.get_score("House1", "fred", "wash up"))
+
+    print("\nTest 4: The least recently used household is dropped")
+    registry.get("House2")
+    registry.get("House1")
+    registry.get("House3")
+    print("\tVALID: ", list(registry._households), registry.cache_info())
+
+    print("\nTest 5: Pages and search")
+    page = registry.page(limit=2)
+    print("\tVALID: ", page, registry.page(page.next, 2), registry.page(contains="se2"))
+
+    print("\nTest 6: Remove participants and chores, down to the minimum")
+    registry.add_to_household("House4", ["mary", "jane", "anne"],
+                              [Chore("hoover", 1), Chore("dusting", 1), Chore("wash up", 2)])
+    h = registry.get("House4")
+    misses = registry.cache_info()["misses"]
+    registry.remove_participant("House4", "mary")
+    registry.remove_chore("House4", "hoover")
+    registry.add_to_household("House4", ["lucy"], [Chore("empty bin", 1)])
+    registry.increment_score("House4", "lucy", "empty bin", 2)
+    print("\tVALID: ", registry.get("House4").chore_log)
+    print("\tIN PLACE (expect True True): ", registry.get("House4") is h,
+          registry.cache_info()["misses"] == misses)
+    print("\tDATABASE: ", store.household_data("House4"))
+    try:
+        registry.remove_participant("House1", "walt")
+    except ValueError as err:
+        print("\tERROR: ", err)
+    try:
+        registry.remove_chore("House1", "dusting")
+    except ValueError as err:
+        print("\tERROR: ", err)
+    registry.remove_household("House4")
+    print("\tVALID: ", registry.names(), registry.get("House4"), registry.get("House1").chore_log)
+
+    print("\nTest 7: Wipe")
+    registry.wipe()
+    print("\tVALID: ", registry.names(), len(registry))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+##
+#  Rendering of households, chore logs and leaderboards as plain text,
+#  aligned tables or JSON.
+#
+#  The render_* functions memoize their output per household, keyed on the
+#  household's version, which Household changes whenever update_log() is
+#  called or the participants or chores change, and on its chore log's
+#  version, which changes on every write to the log, including writes made
+#  straight to the log such as log["fred"]["wash up"] = 2. Rendering a household that
+#  has not changed since it was last rendered in the same format is a
+#  dictionary lookup. The cache holds households weakly, so it never keeps a
+#  household alive.
+#
+#  The format_* functions do the work and can be used on their own, for
+#  example on a leaderboard read from the database.
+
+import json
+import threading
+import weakref
+
+from leaderboard_module import leaderboard_string
+
+FORMATS = ("text", "table", "json")
+
+_cache = weakref.WeakKeyDictionary()    # household -> {(kind, format): (versions, output)}
+_lock = threading.Lock()
+_hits = 0
+_misses = 0
+
+
+def _check_format(output_format) :
+    if output_format not in FORMATS :
+        raise ValueError("The output format must be one of {}.".format(", ".join(FORMATS)))
+
+
+##  Lay out rows as a table with a header line. Numbers are right aligned.
+#
+#   @param headers a list of column headings
+#   @param rows a list of lists, one value per column
+#   @return a string
+#
+def table_string(headers, rows) :
+    cells = [[str(value) for value in row] for row in rows]
+    widths = [max([len(heading)] + [len(row[i]) for row in cells])
+              for i, heading in enumerate(headers)]
+    right = [bool(rows) and all(isinstance(row[i], int) for row in rows)
+             for i in range(len(headers))]
+
+    def line(values) :
+        return "  ".join(value.rjust(width) if align else value.ljust(width)
+                         for value, width, align in zip(values, widths, right)).rstrip()
+
+    lines = [line(headers), "  ".join("-" * width for width in widths)]
+    lines.extend(line(row) for row in cells)
+    return "\n".join(lines)
+
+
+##  Format a chore log.
+#
+#   @param log a ChoreLog
+#   @param output_format "text", "table" or "json"
+#   @return a string
+#
+def format_chore_log(log, output_format="text") :
+    _check_format(output_format)
+    if output_format == "json" :
+        return json.dumps(log.to_dict())
+
+    chores = log.chores
+    if output_format == "table" :
+        totals = log.row_totals()
+        return table_string(["participant"] + chores + ["total"],
+                            [[name] + [log[name][chore] for chore in chores] + [totals[name]]
+                             for name in log])
+
+    return "\n".join("{}: {}".format(name, ", ".join("{} {}".format(chore, log[name][chore])
+                                                     for chore in chores))
+                     for name in log)
+
+
+##  Format a household's participants and chores.
+#
+#   @param house_name the name of the household
+#   @param participants a list of participant names
+#   @param chores a list of (chore_name, frequency)
+#   @param output_format "text", "table" or "json"
+#   @return a string
+#
+def format_household(house_name, participants, chores, output_format="text") :
+    _check_format(output_format)
+    if output_format == "json" :
+        return json.dumps({"household": house_name, "participants": list(participants),
+                           "chores": [{"name": name, "frequency": frequency}
+                                      for name, frequency in chores]})
+
+    if output_format == "table" :
+        return "Household: {}\n\n{}\n\n{}".format(
+            house_name,
+            table_string(["#", "participant"],
+                         [[i, name] for i, name in enumerate(participants, 1)]),
+            table_string(["#", "chore", "times per week"],
+                         [[i, name, frequency] for i, (name, frequency) in enumerate(chores, 1)]))
+
+    return "Household: {}\nParticipants: {}\nWeekly Chores: {}".format(
+        house_name, ", ".join(participants),
+        ", ".join("{} ({})".format(name, frequency) for name, frequency in chores))
+
+
+##  Format a leaderboard.
+#
+#   @param entries a list of LeaderboardEntry
+#   @param output_format "text", "table" or "json"
+#   @return a string
+#
+def format_leaderboard(entries, output_format="text") :
+    _check_format(output_format)
+    if output_format == "json" :
+        return json.dumps([entry._asdict() for entry in entries])
+    if output_format == "table" :
+        chores = sorted(set(chore for entry in entries for chore in entry.chores))
+        return table_string(["rank", "participant", "total"] + chores,
+                            [[entry.rank, entry.person_name, entry.total]
+                             + [entry.chores.get(chore, 0) for chore in chores]
+                             for entry in entries])
+    return leaderboard_string(entries)
+
+
+def _memoized(household, kind, output_format, build) :
+    global _hits, _misses
+    _check_format(output_format)
+    key = (kind, output_format)
+    version = (household.version, household.chore_log.version)
+
+    with _lock :
+        outputs = _cache.get(household)
+        if outputs is not None and key in outputs and outputs[key][0] == version :
+            _hits = _hits + 1
+            return outputs[key][1]
+        _misses = _misses + 1
+
+    output = build()
+    with _lock :
+        _cache.setdefault(household, {})[key] = (version, output)
+    return output
+
+
+##  Render a household's chore log, memoized.
+#
+#   @param household a Household
+#   @param output_format "text", "table" or "json"
+#   @return a string
+#
+def render_chore_log(household, output_format="text") :
+    return _memoized(household, "chore_log", output_format,
+                     lambda : format_chore_log(household.chore_log, output_format))
+
+
+##  Render a household's participants and chores, memoized.
+#
+def render_household(household, output_format="text") :
+    def build() :
+        frequencies = {chore.chore_name: chore.frequency for chore in household.chores.chores}
+        log = household.chore_log
+        return format_household(household.household_name, log.participants,
+                                [(name, frequencies[name]) for name in log.chores],
+                                output_format)
+
+    return _memoized(household, "household", output_format, build)
+
+
+##  Render a household's leaderboard from its chore log, memoized.
+#
+def render_leaderboard(household, output_format="text") :
+    return _memoized(household, "leaderboard", output_format,
+                     lambda : format_leaderboard(household.chore_log.leaderboard(), output_format))
+
+
+##  Return the number of cache hits and misses, and the number of
+#   households cached.
+#
+def cache_info() :
+    with _lock :
+        return {"hits": _hits, "misses": _misses, "households": len(_cache)}
+
+
+##  Empty the cache.
+#
+def clear_cache() :
+    with _lock :
+        _cache.clear()
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import time
+    from household_module import Household
+    from chores_list_module import Chore
+
+    h = Household("House1", {"fred", "walt"}, {Chore("wash up", 3), Chore("dusting", 1)})
+    h.update_log("fred", "wash up", 3)
+    h.update_log("walt", "dusting", 1)
+
+    for output_format in FORMATS :
+        print("Test: chore log as " + output_format)
+        print(render_chore_log(h, output_format))
+        print()
+    print("Test: household as table")
+    print(render_household(h, "table"))
+    print("\nTest: leaderboard as table")
+    print(render_leaderboard(h, "table"))
+
+    print("\nTest: rendering again is cached")
+    started = time.perf_counter()
+    for i in range(100000):
+        render_leaderboard(h, "table")
+    print("\t100000 renders in {:.3f}s".format(time.perf_counter() - started), cache_info())
+
+    print("\nTest: update_log invalidates the cache")
+    h.update_log("walt", "dusting", 5)
+    print(render_leaderboard(h))
+
+    print("\nTest: writing to the chore log invalidates the cache")
+    h.chore_log["fred"]["dusting"] = 7
+    print(render_leaderboard(h))
+
+    print("\nTest: invalid format")
+    try:
+        render_chore_log(h, "html")
+    except ValueError as err:
+        print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+##
+#  Time-windowed leaderboards for Chore Chart.
+#
+#  The chore events are summed per participant and chore into weekly
+#  (Monday to Sunday) and monthly buckets in ScoreRollups by triggers on
+#  ChoreEvents (see schema_module), so a leaderboard for "this week" or "the
+#  last 12 weeks" reads one rollup row per participant, chore and period and
+#  never the events themselves. Dates are UTC, as logged_at is.
+#
+#  A window is a period ("week" or "month") and the first days of the first
+#  period in it and of the first period after it, as YYYY-MM-DD.
+
+import datetime
+import sqlite3
+
+from leaderboard_module import LeaderboardEntry
+from totals_module import ParticipantRank
+
+PERIODS = ("week", "month")
+
+# Every participant and chore of the household is listed, with zero for
+# those with no events in the window.
+_WINDOW_LEADERBOARD_SQL = """
+    WITH sums AS (
+        SELECT person_name, chore_name, SUM(total) AS score
+        FROM ScoreRollups
+        WHERE house_name = :house AND period = :period
+          AND period_start >= :start AND period_start < :end
+        GROUP BY person_name, chore_name),
+    cells AS (
+        SELECT p.person_name, c.chore_name, COALESCE(s.score, 0) AS score
+        FROM HouseData AS p
+        JOIN ChoreData AS c ON c.house_name = p.house_name
+        LEFT JOIN sums AS s ON s.person_name = p.person_name AND s.chore_name = c.chore_name
+        WHERE p.house_name = :house),
+    ranked AS (
+        SELECT person_name, total, RANK() OVER (ORDER BY total DESC) AS position
+        FROM (SELECT person_name, SUM(score) AS total FROM cells GROUP BY person_name))
+    SELECT r.position, r.person_name, r.total, c.chore_name, c.score
+    FROM ranked AS r
+    JOIN cells AS c ON c.person_name = r.person_name
+    WHERE :limit IS NULL OR r.position <= :limit
+    ORDER BY r.position, r.person_name, c.chore_name
+"""
+
+_WINDOW_TOP_SQL = """
+    SELECT house_name, person_name, total, RANK() OVER (ORDER BY total DESC) AS position
+    FROM (SELECT house_name, person_name, SUM(total) AS total
+          FROM ScoreRollups
+          WHERE period = :period AND period_start >= :start AND period_start < :end
+          GROUP BY house_name, person_name)
+    ORDER BY position, house_name, person_name
+    LIMIT :limit
+"""
+
+
+##  Return the first day of the week (Monday) containing a day.
+#
+#   @param day a datetime.date
+#   @return a datetime.date
+#
+def week_start(day) :
+    return day - datetime.timedelta(days=day.weekday())
+
+
+##  Return the first day of the month containing a day.
+#
+def month_start(day) :
+    return day.replace(day=1)
+
+
+def _add_months(day, months) :
+    month = day.year * 12 + day.month - 1 + months
+    return datetime.date(month // 12, month % 12 + 1, 1)
+
+
+##  Return the window covering the last few weeks or months, up to and
+#   including the current one.
+#
+#   @param period "week" or "month"
+#   @param count the number of periods, 1 for the current period only
+#   @param today the current date, None for today's UTC date
+#   @return a tuple (start, end) of YYYY-MM-DD strings
+#
+def recent_window(period, count=1, today=None) :
+    if period not in PERIODS :
+        raise ValueError("The period must be one of {}.".format(", ".join(PERIODS)))
+    if not isinstance(count, int) or count < 1 :
+        raise ValueError("The number of periods must be a positive integer.")
+    if today is None :
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+
+    if period == "week" :
+        end = week_start(today) + datetime.timedelta(weeks=1)
+        start = end - datetime.timedelta(weeks=count)
+    else :
+        end = _add_months(month_start(today), 1)
+        start = _add_months(end, -count)
+    return (start.isoformat(), end.isoformat())
+
+
+##  Return the window of whole weeks covering a range of days.
+#
+#   @param first_day the first day, a datetime.date or YYYY-MM-DD
+#   @param last_day the last day, included
+#   @return a tuple (start, end) of YYYY-MM-DD strings. The range is widened
+#           to start on a Monday and end on a Sunday.
+#
+def range_window(first_day, last_day) :
+    if isinstance(first_day, str) :
+        first_day = datetime.date.fromisoformat(first_day)
+    if isinstance(last_day, str) :
+        last_day = datetime.date.fromisoformat(last_day)
+    if last_day < first_day :
+        raise ValueError("The range ends before it starts.")
+
+    start = week_start(first_day)
+    end = week_start(last_day) + datetime.timedelta(weeks=1)
+    return (start.isoformat(), end.isoformat())
+
+
+##  Compute the leaderboard of a household over a window.
+#
+#   @param conn an open sqlite3 connection
+#   @param house_name the name of the household
+#   @param period "week" or "month"
+#   @param start the first day of the window, YYYY-MM-DD
+#   @param end the first day after the window, YYYY-MM-DD
+#   @param limit only return participants ranked limit or better, None for
+#          everyone
+#   @return a list of LeaderboardEntry, best first
+#
+def window_leaderboard(conn, house_name, period, start, end, limit=None) :
+    if period not in PERIODS :
+        raise ValueError("The period must be one of {}.".format(", ".join(PERIODS)))
+    if limit is not None and (not isinstance(limit, int) or limit < 1) :
+        raise ValueError("Leaderboard limit must be a positive integer.")
+
+    entries = []
+    current = None
+    for position, person_name, total, chore_name, chore_score in \
+            conn.execute(_WINDOW_LEADERBOARD_SQL, {"house": house_name, "period": period,
+                                                   "start": start, "end": end, "limit": limit}) :
+        if current is None or current.person_name != person_name :
+            current = LeaderboardEntry(position, person_name, total, {})
+            entries.append(current)
+        current.chores[chore_name] = chore_score
+
+    return entries
+
+
+##  Return the participants with the highest totals over a window across
+#   all households.
+#
+#   @param conn an open sqlite3 connection
+#   @param period "week" or "month"
+#   @param start the first day of the window, YYYY-MM-DD
+#   @param end the first day after the window, YYYY-MM-DD
+#   @param limit the number of participants to return
+#   @return a list of ParticipantRank, best first. Participants with no
+#           chores logged in the window are left out.
+#
+def window_top_participants(conn, period, start, end, limit) :
+    if period not in PERIODS :
+        raise ValueError("The period must be one of {}.".format(", ".join(PERIODS)))
+    if not isinstance(limit, int) or limit < 1 :
+        raise ValueError("Leaderboard limit must be a positive integer.")
+    return [ParticipantRank(*row) for row in
+            conn.execute(_WINDOW_TOP_SQL, {"period": period, "start": start,
+                                           "end": end, "limit": limit})]
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import schema_module
+    import events_module
+    from leaderboard_module import leaderboard_string
+
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    schema_module.migrate(conn)
+    conn.executemany("INSERT INTO HouseData (house_name, person_num, person_name) VALUES (?, ?, ?)",
+                     [("House1", 1, "fred"), ("House1", 2, "walt")])
+    conn.executemany("INSERT INTO ChoreData (house_name, chore_num, chore_name, chore_freq) "
+                     "VALUES (?, ?, ?, ?)", [("House1", 1, "wash up", 3), ("House1", 2, "dusting", 1)])
+    conn.execute("INSERT INTO ScoreLog (house_name, person_num, person_name, chore_name) "
+                 "SELECT p.house_name, p.person_num, p.person_name, c.chore_name "
+                 "FROM HouseData AS p JOIN ChoreData AS c ON c.house_name = p.house_name")
+    conn.execute("BEGIN")
+    events_module.append_events(conn, [
+        ("House1", "fred", "wash up", 5, "2019-03-27 09:00:00.000"),    # Wednesday, week of 03-25
+        ("House1", "walt", "dusting", 2, "2019-04-01 09:00:00.000"),    # Monday, week of 04-01
+        ("House1", "walt", "wash up", 1, "2019-04-07 23:59:00.000"),    # Sunday, week of 04-01
+    ])
+    events_module.catch_up(conn)
+    conn.commit()
+
+    print("Test 1: Week of 2019-04-01, walt first")
+    start, end = recent_window("week", 1, datetime.date(2019, 4, 3))
+    print("\tWINDOW: ", start, end)
+    print(leaderboard_string(window_leaderboard(conn, "House1", "week", start, end)))
+
+    print("\nTest 2: Last 2 weeks, fred first")
+    start, end = recent_window("week", 2, datetime.date(2019, 4, 3))
+    print(leaderboard_string(window_leaderboard(conn, "House1", "week", start, end)))
+
+    print("\nTest 3: March 2019 by month")
+    start, end = recent_window("month", 1, datetime.date(2019, 3, 15))
+    print("\tWINDOW: ", start, end)
+    print(leaderboard_string(window_leaderboard(conn, "House1", "month", start, end, 1)))
+
+    print("\nTest 4: Range 2019-04-02 to 2019-04-02 widens to the whole week")
+    print("\tWINDOW: ", range_window("2019-04-02", "2019-04-02"))
+
+    print("\nTest 5: Top participants across households in April")
+    start, end = recent_window("month", 1, datetime.date(2019, 4, 30))
+    print("\t", window_top_participants(conn, "month", start, end, 5))
+
+    print("\nTest 6: Invalid period")
+    try:
+        recent_window("year")
+    except ValueError as err:
+        print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
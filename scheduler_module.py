@@ -0,0 +1,218 @@
+##
+#  Weekly chore rotas.
+#
+#  A rota gives each chore to as many participants as its frequency, the
+#  number of times a week it is done. Every time a chore is done counts one
+#  towards a participant's score, so a fair rota is one that evens out the
+#  participants' scores: each chore is given to the participant with the
+#  lowest score so far, counting the chores already given to them this
+#  week. Ties go to whoever has been given that chore least this week, then
+#  whoever has done it least before, then the first participant added.
+#
+#  Each chore keeps a heap of the participants ordered that way. A
+#  participant's scores only go up, so a heap entry is never more than their
+#  real position: entries are brought up to date when they reach the top,
+#  rather than in every heap each time a chore is given out. A week of T
+#  chores done by N participants costs O((T x chores + N x chores) log N).
+#
+#  The chores of a week are given out in rounds, one of each chore per round,
+#  so that the same participant is not given every turn of one chore.
+
+import heapq
+import itertools
+from collections import namedtuple
+
+## A week's rota for a household.
+#  assignments  a list of (chore name, list of participant names), one name
+#               for each time the chore is to be done, in chore order
+#  load         a dictionary of participant name -> number of chores this week
+#  imbalance    the highest score minus the lowest score, counting history
+#               (times history_weight) and this week's rota
+#
+Rota = namedtuple("Rota", ["house_name", "assignments", "load", "imbalance"])
+
+# Every household, with its participants, chores and scores, in name order.
+_PARTICIPANTS_SQL = ("SELECT house_name, person_name FROM HouseData "
+                     "ORDER BY house_name, person_num, person_name")
+_CHORES_SQL = ("SELECT house_name, chore_name, chore_freq FROM ChoreData "
+               "ORDER BY house_name, chore_num, chore_name")
+_SCORES_SQL = ("SELECT house_name, person_name, chore_name, chore_score FROM ScoreLog "
+               "ORDER BY house_name")
+
+
+##  Make a week's rota.
+#
+#   @param house_name the household name
+#   @param participant_names the participants' names, in the order they were added
+#   @param chores an iterable of (chore name, frequency)
+#   @param scores an iterable of (participant name, chore name, count) of the
+#          chores done before, such as the household's ScoreLog rows
+#   @param history_weight how much the chores done before count against a
+#          participant, 0 to only balance this week
+#   @return a Rota
+#   @exception ValueError raised if there are no participants or the weight
+#              is negative
+#
+def weekly_rota(house_name, participant_names, chores, scores=(), history_weight=1) :
+    participant_names = list(participant_names)
+    chores = list(chores)
+    if not participant_names :
+        raise ValueError("Household {} has no participants to give chores to.".format(house_name))
+    if history_weight < 0 :
+        raise ValueError("The history weight must not be negative.")
+
+    index = {name: i for i, name in enumerate(participant_names)}
+    chore_index = {name: c for c, (name, frequency) in enumerate(chores)}
+    done = [[0] * len(participant_names) for chore in chores]
+    score = [0] * len(participant_names)
+    for person_name, chore_name, count in scores :
+        i = index.get(person_name)
+        if i is None :
+            continue
+        score[i] = score[i] + history_weight * count
+        c = chore_index.get(chore_name)
+        if c is not None :
+            done[c][i] = done[c][i] + count
+
+    # this_week[c][i]: how many times participant i is given chore c.
+    this_week = [[0] * len(participant_names) for chore in chores]
+    heaps = []
+    for c in range(len(chores)) :
+        heap = [(score[i], 0, done[c][i], i) for i in range(len(participant_names))]
+        heapq.heapify(heap)
+        heaps.append(heap)
+
+    given = [[] for chore in chores]
+    for turn in range(max([frequency for name, frequency in chores], default=0)) :
+        for c, (chore_name, frequency) in enumerate(chores) :
+            if turn >= frequency :
+                continue
+            heap = heaps[c]
+            while True :
+                entry = heapq.heappop(heap)
+                i = entry[3]
+                if entry[0] == score[i] and entry[1] == this_week[c][i] :
+                    break
+                heapq.heappush(heap, (score[i], this_week[c][i], entry[2], i))
+
+            given[c].append(participant_names[i])
+            score[i] = score[i] + 1
+            this_week[c][i] = this_week[c][i] + 1
+            heapq.heappush(heap, (score[i], this_week[c][i], entry[2], i))
+
+    load = {name: 0 for name in participant_names}
+    for names in given :
+        for name in names :
+            load[name] = load[name] + 1
+    return Rota(house_name, [(name, names) for (name, frequency), names in zip(chores, given)],
+                load, max(score) - min(score))
+
+
+##  Make a week's rota for a Household, from its chore log.
+#
+#   @param household a Household
+#   @param history_weight see weekly_rota
+#   @return a Rota
+#
+def household_rota(household, history_weight=1) :
+    log = household.chore_log
+    chores = [(name, household.chores.get(name).frequency) for name in log.chores]
+    scores = [(person_name, chore_name, log.get_count(person_name, chore_name))
+              for person_name in log.participants for chore_name in log.chores]
+    return weekly_rota(household.household_name, log.participants, chores, scores, history_weight)
+
+
+def _by_household(rows) :
+    # (house_name, [rest of each row]) for rows ordered by house_name.
+    for house_name, group in itertools.groupby(rows, key=lambda row : row[0]) :
+        yield house_name, [row[1:] for row in group]
+
+
+def _rows_of(groups, pending, house_name) :
+    # The rows of groups for house_name, skipping households before it.
+    # pending holds the group read past house_name, if any.
+    while pending[0] is not None and pending[0][0] < house_name :
+        pending[0] = next(groups, None)
+    if pending[0] is not None and pending[0][0] == house_name :
+        rows = pending[0][1]
+        pending[0] = next(groups, None)
+        return rows
+    return []
+
+
+##  Make a week's rota for every household, reading each table once in
+#   household order.
+#
+#   @param conn an open sqlite3 connection, in a read transaction for a
+#          consistent snapshot
+#   @param history_weight see weekly_rota
+#   @return a generator of Rota, in household name order
+#
+def household_rotas(conn, history_weight=1) :
+    chore_groups = _by_household(conn.execute(_CHORES_SQL))
+    score_groups = _by_household(conn.execute(_SCORES_SQL))
+    pending_chores = [next(chore_groups, None)]
+    pending_scores = [next(score_groups, None)]
+
+    for house_name, participants in _by_household(conn.execute(_PARTICIPANTS_SQL)) :
+        yield weekly_rota(house_name, [row[0] for row in participants],
+                          _rows_of(chore_groups, pending_chores, house_name),
+                          _rows_of(score_groups, pending_scores, house_name),
+                          history_weight)
+
+
+##  Return a rota as text, one chore per line.
+#
+def rota_string(rota) :
+    lines = ["Rota for {}:".format(rota.house_name)]
+    for chore_name, names in rota.assignments :
+        lines.append("\t{}: {}".format(chore_name, ", ".join(names)))
+    lines.append("\tChores each: " + ", ".join("{} {}".format(name, count)
+                                               for name, count in rota.load.items()))
+    return "\n".join(lines)
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import time
+
+    print("Test 1: A new household shares the chores evenly")
+    rota = weekly_rota("House1", ["fred", "walt", "jane"],
+                       [("wash up", 3), ("dusting", 2), ("hoover", 1)])
+    print(rota_string(rota))
+    print("\tIMBALANCE (expect 0): ", rota.imbalance)
+
+    print("\nTest 2: Whoever has done the least is given more")
+    rota = weekly_rota("House1", ["fred", "walt", "jane"],
+                       [("wash up", 3), ("dusting", 2), ("hoover", 1)],
+                       [("fred", "wash up", 4), ("walt", "dusting", 1)])
+    print(rota_string(rota))
+    print("\tLOAD (expect fred 0): ", rota.load)
+
+    print("\nTest 3: Ignoring history")
+    rota = weekly_rota("House1", ["fred", "walt", "jane"], [("wash up", 3)],
+                       [("fred", "wash up", 4)], history_weight=0)
+    print("\tVALID: ", rota.assignments)
+
+    print("\nTest 4: A household with no participants")
+    try:
+        weekly_rota("House1", [], [("wash up", 3)])
+    except ValueError as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 5: 500 participants, 50 chores done up to 20 times a week")
+    participant_names = ["person{}".format(i) for i in range(500)]
+    chores = [("chore {}".format(c), c % 20 + 1) for c in range(50)]
+    scores = [(name, chore, (i * 7 + c) % 11) for i, name in enumerate(participant_names)
+              for c, (chore, frequency) in enumerate(chores)]
+    started = time.perf_counter()
+    rota = weekly_rota("Big House", participant_names, chores, scores)
+    print("\t{} chores in {:.1f} ms, imbalance {}".format(
+        sum(rota.load.values()), (time.perf_counter() - started) * 1000, rota.imbalance))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,622 @@
+##
+#  Database schema for Chore Chart and the migrations that bring an existing
+#  chore_chart.db file up to date.
+#
+#  The schema version is stored in the file itself using PRAGMA user_version.
+#  A file created by an older version of the application (user_version 0,
+#  tables without keys) is upgraded in place the first time it is opened.
+
+import sqlite3
+
+## The version of the schema created by this module.
+SCHEMA_VERSION = 7
+
+
+## Version 1: composite keys and indexes.
+#
+#  The tables are keyed on (house_name, person_name, chore_name) and stored
+#  WITHOUT ROWID, so every lookup used by the application is a search of the
+#  primary key and a scan of one household is a range of the table itself.
+#
+_V1_TABLES = [
+    ("HouseData",
+     "CREATE TABLE {} (house_name TEXT NOT NULL, person_num INTEGER, "
+     "person_name TEXT NOT NULL, "
+     "PRIMARY KEY (house_name, person_name)) WITHOUT ROWID",
+     "SELECT house_name, MIN(person_num), person_name FROM HouseData "
+     "WHERE house_name IS NOT NULL AND person_name IS NOT NULL "
+     "GROUP BY house_name, person_name"),
+    ("ChoreData",
+     "CREATE TABLE {} (house_name TEXT NOT NULL, chore_num INTEGER, "
+     "chore_name TEXT NOT NULL, chore_freq INTEGER, "
+     "PRIMARY KEY (house_name, chore_name)) WITHOUT ROWID",
+     "SELECT house_name, MIN(chore_num), chore_name, MAX(chore_freq) FROM ChoreData "
+     "WHERE house_name IS NOT NULL AND chore_name IS NOT NULL "
+     "GROUP BY house_name, chore_name"),
+    ("ScoreLog",
+     "CREATE TABLE {} (house_name TEXT NOT NULL, person_num INTEGER, "
+     "person_name TEXT NOT NULL, chore_name TEXT NOT NULL, "
+     "chore_score INTEGER NOT NULL DEFAULT 0, "
+     "PRIMARY KEY (house_name, person_name, chore_name)) WITHOUT ROWID",
+     "SELECT house_name, MIN(person_num), person_name, chore_name, "
+     "MAX(COALESCE(chore_score, 0)) FROM ScoreLog "
+     "WHERE house_name IS NOT NULL AND person_name IS NOT NULL "
+     "AND chore_name IS NOT NULL "
+     "GROUP BY house_name, person_name, chore_name"),
+]
+
+_V1_INDEXES = [
+    # Listing a household in the order the members and chores were entered.
+    "CREATE INDEX IF NOT EXISTS HouseData_house_num ON HouseData (house_name, person_num)",
+    "CREATE INDEX IF NOT EXISTS ChoreData_house_num ON ChoreData (house_name, chore_num, chore_freq)",
+    # Per-chore columns of a household (house_name, chore_name, person_name, chore_score).
+    "CREATE INDEX IF NOT EXISTS ScoreLog_house_chore ON ScoreLog (house_name, chore_name, chore_score)",
+    # Removing a participant or chore by name.
+    "CREATE INDEX IF NOT EXISTS HouseData_person ON HouseData (person_name)",
+    "CREATE INDEX IF NOT EXISTS ChoreData_chore ON ChoreData (chore_name)",
+    "CREATE INDEX IF NOT EXISTS ScoreLog_person ON ScoreLog (person_name)",
+    "CREATE INDEX IF NOT EXISTS ScoreLog_chore ON ScoreLog (chore_name)",
+]
+
+_V1_MISSING_SCORES_SQL = ("INSERT OR IGNORE INTO ScoreLog "
+                          "(house_name, person_num, person_name, chore_name) "
+                          "SELECT p.house_name, p.person_num, p.person_name, c.chore_name "
+                          "FROM HouseData AS p JOIN ChoreData AS c USING (house_name)")
+
+
+def _migrate_to_v1(conn) :
+    existing = table_names(conn)
+
+    for table, create, copy in _V1_TABLES :
+        if table in existing :
+            # Rebuild the legacy table: duplicate rows left behind by adding the
+            # same person or chore twice are merged, keeping the highest score.
+            conn.execute(create.format(table + "_v1"))
+            conn.execute("INSERT INTO {}_v1 {}".format(table, copy))
+            conn.execute("DROP TABLE {}".format(table))
+            conn.execute("ALTER TABLE {}_v1 RENAME TO {}".format(table, table))
+        else :
+            conn.execute(create.format(table))
+
+    for index in _V1_INDEXES :
+        conn.execute(index)
+
+    # The original "Add to Household" only logged the new participants'
+    # new chores, so give every participant a row for every chore of their
+    # household. The totals are computed from ScoreLog in version 2.
+    conn.execute(_V1_MISSING_SCORES_SQL)
+
+
+## Version 2: materialized score totals.
+#
+#  ScoreTotals holds the sum of ScoreLog.chore_score for every
+#  (house_name, person_name) and HouseTotals the sum for every household.
+#  Both are kept up to date by triggers on ScoreLog, so they change in the
+#  same transaction as the scores they summarise.
+#
+_V2_STATEMENTS = [
+    "CREATE TABLE IF NOT EXISTS ScoreTotals (house_name TEXT NOT NULL, "
+    "person_name TEXT NOT NULL, total INTEGER NOT NULL DEFAULT 0, "
+    "PRIMARY KEY (house_name, person_name)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS HouseTotals (house_name TEXT NOT NULL PRIMARY KEY, "
+    "total INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS ScoreTotals_total ON ScoreTotals (total DESC)",
+    "CREATE INDEX IF NOT EXISTS ScoreTotals_house_total ON ScoreTotals (house_name, total DESC)",
+    "CREATE INDEX IF NOT EXISTS HouseTotals_total ON HouseTotals (total DESC)",
+
+    """CREATE TRIGGER IF NOT EXISTS ScoreLog_totals_insert AFTER INSERT ON ScoreLog
+    BEGIN
+        INSERT INTO ScoreTotals (house_name, person_name, total)
+            VALUES (NEW.house_name, NEW.person_name, NEW.chore_score)
+            ON CONFLICT (house_name, person_name) DO UPDATE SET total = total + excluded.total;
+        INSERT INTO HouseTotals (house_name, total)
+            VALUES (NEW.house_name, NEW.chore_score)
+            ON CONFLICT (house_name) DO UPDATE SET total = total + excluded.total;
+    END""",
+
+    """CREATE TRIGGER IF NOT EXISTS ScoreLog_totals_update AFTER UPDATE ON ScoreLog
+    BEGIN
+        UPDATE ScoreTotals SET total = total - OLD.chore_score
+            WHERE house_name = OLD.house_name AND person_name = OLD.person_name;
+        UPDATE HouseTotals SET total = total - OLD.chore_score
+            WHERE house_name = OLD.house_name;
+        INSERT INTO ScoreTotals (house_name, person_name, total)
+            VALUES (NEW.house_name, NEW.person_name, NEW.chore_score)
+            ON CONFLICT (house_name, person_name) DO UPDATE SET total = total + excluded.total;
+        INSERT INTO HouseTotals (house_name, total)
+            VALUES (NEW.house_name, NEW.chore_score)
+            ON CONFLICT (house_name) DO UPDATE SET total = total + excluded.total;
+    END""",
+
+    """CREATE TRIGGER IF NOT EXISTS ScoreLog_totals_delete AFTER DELETE ON ScoreLog
+    BEGIN
+        UPDATE ScoreTotals SET total = total - OLD.chore_score
+            WHERE house_name = OLD.house_name AND person_name = OLD.person_name;
+        UPDATE HouseTotals SET total = total - OLD.chore_score
+            WHERE house_name = OLD.house_name;
+        DELETE FROM ScoreTotals
+            WHERE house_name = OLD.house_name AND person_name = OLD.person_name
+            AND NOT EXISTS (SELECT 1 FROM ScoreLog
+                            WHERE house_name = OLD.house_name AND person_name = OLD.person_name);
+        DELETE FROM HouseTotals
+            WHERE house_name = OLD.house_name
+            AND NOT EXISTS (SELECT 1 FROM ScoreLog WHERE house_name = OLD.house_name);
+    END""",
+
+    "DELETE FROM ScoreTotals",
+    "DELETE FROM HouseTotals",
+    "INSERT INTO ScoreTotals (house_name, person_name, total) "
+    "SELECT house_name, person_name, SUM(chore_score) FROM ScoreLog "
+    "GROUP BY house_name, person_name",
+    "INSERT INTO HouseTotals (house_name, total) "
+    "SELECT house_name, SUM(chore_score) FROM ScoreLog GROUP BY house_name",
+]
+
+
+def _migrate_to_v2(conn) :
+    for statement in _V2_STATEMENTS :
+        conn.execute(statement)
+
+
+## Version 3: totals rows follow the participants.
+#
+#  A ScoreTotals row (and a HouseTotals row) is created when a participant is
+#  added to HouseData, so the ScoreLog triggers only have work to do when a
+#  score is not zero. New households no longer pay two upserts for every
+#  ScoreLog row they insert.
+#
+#  The secondary indexes on ScoreLog are dropped: removals by name find the
+#  households through HouseData and ChoreData and then use the primary key.
+#
+_V3_STATEMENTS = [
+    "DROP INDEX IF EXISTS ScoreLog_house_chore",
+    "DROP INDEX IF EXISTS ScoreLog_person",
+    "DROP INDEX IF EXISTS ScoreLog_chore",
+    "DROP TRIGGER IF EXISTS ScoreLog_totals_insert",
+    "DROP TRIGGER IF EXISTS ScoreLog_totals_delete",
+
+    """CREATE TRIGGER ScoreLog_totals_insert AFTER INSERT ON ScoreLog
+    WHEN NEW.chore_score <> 0
+    BEGIN
+        INSERT INTO ScoreTotals (house_name, person_name, total)
+            VALUES (NEW.house_name, NEW.person_name, NEW.chore_score)
+            ON CONFLICT (house_name, person_name) DO UPDATE SET total = total + excluded.total;
+        INSERT INTO HouseTotals (house_name, total)
+            VALUES (NEW.house_name, NEW.chore_score)
+            ON CONFLICT (house_name) DO UPDATE SET total = total + excluded.total;
+    END""",
+
+    """CREATE TRIGGER ScoreLog_totals_delete AFTER DELETE ON ScoreLog
+    BEGIN
+        UPDATE ScoreTotals SET total = total - OLD.chore_score
+            WHERE OLD.chore_score <> 0
+            AND house_name = OLD.house_name AND person_name = OLD.person_name;
+        UPDATE HouseTotals SET total = total - OLD.chore_score
+            WHERE OLD.chore_score <> 0 AND house_name = OLD.house_name;
+        DELETE FROM ScoreTotals
+            WHERE house_name = OLD.house_name AND person_name = OLD.person_name
+            AND NOT EXISTS (SELECT 1 FROM HouseData
+                            WHERE house_name = OLD.house_name AND person_name = OLD.person_name)
+            AND NOT EXISTS (SELECT 1 FROM ScoreLog
+                            WHERE house_name = OLD.house_name AND person_name = OLD.person_name);
+        DELETE FROM HouseTotals
+            WHERE house_name = OLD.house_name
+            AND NOT EXISTS (SELECT 1 FROM HouseData WHERE house_name = OLD.house_name)
+            AND NOT EXISTS (SELECT 1 FROM ScoreLog WHERE house_name = OLD.house_name);
+    END""",
+
+    """CREATE TRIGGER HouseData_totals_insert AFTER INSERT ON HouseData
+    BEGIN
+        INSERT OR IGNORE INTO ScoreTotals (house_name, person_name, total)
+            VALUES (NEW.house_name, NEW.person_name, 0);
+        INSERT OR IGNORE INTO HouseTotals (house_name, total)
+            VALUES (NEW.house_name, 0);
+    END""",
+
+    """CREATE TRIGGER HouseData_totals_delete AFTER DELETE ON HouseData
+    BEGIN
+        DELETE FROM ScoreTotals
+            WHERE house_name = OLD.house_name AND person_name = OLD.person_name
+            AND NOT EXISTS (SELECT 1 FROM ScoreLog
+                            WHERE house_name = OLD.house_name AND person_name = OLD.person_name);
+        DELETE FROM HouseTotals
+            WHERE house_name = OLD.house_name
+            AND NOT EXISTS (SELECT 1 FROM HouseData WHERE house_name = OLD.house_name)
+            AND NOT EXISTS (SELECT 1 FROM ScoreLog WHERE house_name = OLD.house_name);
+    END""",
+
+    "DELETE FROM ScoreTotals",
+    "DELETE FROM HouseTotals",
+    "INSERT INTO ScoreTotals (house_name, person_name, total) "
+    "SELECT house_name, person_name, SUM(score) FROM ("
+    "SELECT house_name, person_name, chore_score AS score FROM ScoreLog "
+    "UNION ALL SELECT house_name, person_name, 0 FROM HouseData) "
+    "GROUP BY house_name, person_name",
+    "INSERT INTO HouseTotals (house_name, total) "
+    "SELECT house_name, SUM(score) FROM ("
+    "SELECT house_name, chore_score AS score FROM ScoreLog "
+    "UNION ALL SELECT house_name, 0 FROM HouseData) "
+    "GROUP BY house_name",
+]
+
+
+def _migrate_to_v3(conn) :
+    for statement in _V3_STATEMENTS :
+        conn.execute(statement)
+
+
+## Version 4: the chore event log.
+#
+#  Every increment is appended to ChoreEvents with the time it was logged,
+#  and ScoreLog.chore_score becomes a view of the events materialized up to
+#  the event_id recorded in EventCheckpoint (see events_module). AUTOINCREMENT
+#  keeps event ids from being reused after the newest events are deleted, so
+#  an id at or below the checkpoint has always been applied.
+#
+#  Existing scores are carried over as one opening event per score, dated
+#  1970-01-01 because the time they were logged is not known.
+#
+_V4_STATEMENTS = [
+    "CREATE TABLE ChoreEvents (event_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+    "house_name TEXT NOT NULL, person_name TEXT NOT NULL, chore_name TEXT NOT NULL, "
+    "count INTEGER NOT NULL CHECK (count <> 0), "
+    "logged_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')))",
+    # History of a household or participant, and removals by name.
+    "CREATE INDEX ChoreEvents_house_person ON ChoreEvents (house_name, person_name)",
+    "CREATE TABLE EventCheckpoint (name TEXT PRIMARY KEY, event_id INTEGER NOT NULL) WITHOUT ROWID",
+
+    "INSERT INTO ChoreEvents (house_name, person_name, chore_name, count, logged_at) "
+    "SELECT house_name, person_name, chore_name, chore_score, '1970-01-01 00:00:00.000' "
+    "FROM ScoreLog WHERE chore_score <> 0 ORDER BY house_name, person_name, chore_name",
+    "INSERT INTO EventCheckpoint (name, event_id) "
+    "SELECT 'ScoreLog', COALESCE(MAX(event_id), 0) FROM ChoreEvents",
+]
+
+
+def _migrate_to_v4(conn) :
+    for statement in _V4_STATEMENTS :
+        conn.execute(statement)
+
+
+## Version 5: weekly and monthly rollups of the chore events.
+#
+#  ScoreRollups holds the sum of the events of each participant and chore
+#  per week (starting on Monday) and per calendar month, maintained by
+#  triggers on ChoreEvents, so a time-windowed leaderboard reads one row per
+#  participant, chore and period (see rollups_module). period_start is the
+#  first day of the period as YYYY-MM-DD.
+#
+_ROLLUP_WEEK = "date({}.logged_at, 'weekday 0', '-6 days')"
+_ROLLUP_MONTH = "date({}.logged_at, 'start of month')"
+
+_V5_STATEMENTS = [
+    "CREATE TABLE ScoreRollups (house_name TEXT NOT NULL, "
+    "period TEXT NOT NULL CHECK (period IN ('week', 'month')), period_start TEXT NOT NULL, "
+    "person_name TEXT NOT NULL, chore_name TEXT NOT NULL, total INTEGER NOT NULL, "
+    "PRIMARY KEY (house_name, period, period_start, person_name, chore_name)) WITHOUT ROWID",
+    # Leaderboards across all households.
+    "CREATE INDEX ScoreRollups_period ON ScoreRollups "
+    "(period, period_start, house_name, person_name, total)",
+
+    """CREATE TRIGGER ChoreEvents_rollups_insert AFTER INSERT ON ChoreEvents
+    BEGIN
+        INSERT INTO ScoreRollups (house_name, period, period_start, person_name, chore_name, total)
+            VALUES (NEW.house_name, 'week', """ + _ROLLUP_WEEK.format("NEW") + """,
+                    NEW.person_name, NEW.chore_name, NEW.count),
+                   (NEW.house_name, 'month', """ + _ROLLUP_MONTH.format("NEW") + """,
+                    NEW.person_name, NEW.chore_name, NEW.count)
+            ON CONFLICT (house_name, period, period_start, person_name, chore_name)
+            DO UPDATE SET total = total + excluded.total;
+    END""",
+
+    """CREATE TRIGGER ChoreEvents_rollups_delete AFTER DELETE ON ChoreEvents
+    BEGIN
+        UPDATE ScoreRollups SET total = total - OLD.count
+            WHERE house_name = OLD.house_name AND person_name = OLD.person_name
+            AND chore_name = OLD.chore_name
+            AND ((period = 'week' AND period_start = """ + _ROLLUP_WEEK.format("OLD") + """)
+              OR (period = 'month' AND period_start = """ + _ROLLUP_MONTH.format("OLD") + """));
+        DELETE FROM ScoreRollups
+            WHERE house_name = OLD.house_name AND person_name = OLD.person_name
+            AND chore_name = OLD.chore_name AND total = 0
+            AND ((period = 'week' AND period_start = """ + _ROLLUP_WEEK.format("OLD") + """)
+              OR (period = 'month' AND period_start = """ + _ROLLUP_MONTH.format("OLD") + """));
+    END""",
+
+    "INSERT INTO ScoreRollups (house_name, period, period_start, person_name, chore_name, total) "
+    "SELECT house_name, 'week', " + _ROLLUP_WEEK.format("e") + ", person_name, chore_name, "
+    "SUM(count) FROM ChoreEvents AS e GROUP BY 1, 2, 3, 4, 5",
+    "INSERT INTO ScoreRollups (house_name, period, period_start, person_name, chore_name, total) "
+    "SELECT house_name, 'month', " + _ROLLUP_MONTH.format("e") + ", person_name, chore_name, "
+    "SUM(count) FROM ChoreEvents AS e GROUP BY 1, 2, 3, 4, 5",
+]
+
+
+def _migrate_to_v5(conn) :
+    for statement in _V5_STATEMENTS :
+        conn.execute(statement)
+
+
+## Version 6: a table of households, searchable by substring.
+#
+#  Households has one row per household, kept by triggers on HouseData, so
+#  listing households a page at a time or by prefix is a range of its name
+#  index. HouseholdSearch is an FTS5 trigram index of the names, kept by
+#  triggers on Households, for case-insensitive substring search (see
+#  listing_module).
+#
+_V6_STATEMENTS = [
+    "CREATE TABLE Households (house_id INTEGER PRIMARY KEY, house_name TEXT NOT NULL UNIQUE)",
+    "CREATE VIRTUAL TABLE HouseholdSearch USING fts5(house_name, content='Households', "
+    "content_rowid='house_id', tokenize='trigram')",
+
+    """CREATE TRIGGER Households_search_insert AFTER INSERT ON Households
+    BEGIN
+        INSERT INTO HouseholdSearch (rowid, house_name) VALUES (NEW.house_id, NEW.house_name);
+    END""",
+
+    """CREATE TRIGGER Households_search_delete AFTER DELETE ON Households
+    BEGIN
+        INSERT INTO HouseholdSearch (HouseholdSearch, rowid, house_name)
+            VALUES ('delete', OLD.house_id, OLD.house_name);
+    END""",
+
+    """CREATE TRIGGER HouseData_households_insert AFTER INSERT ON HouseData
+    BEGIN
+        INSERT OR IGNORE INTO Households (house_name) VALUES (NEW.house_name);
+    END""",
+
+    """CREATE TRIGGER HouseData_households_delete AFTER DELETE ON HouseData
+    WHEN NOT EXISTS (SELECT 1 FROM HouseData WHERE house_name = OLD.house_name)
+    BEGIN
+        DELETE FROM Households WHERE house_name = OLD.house_name;
+    END""",
+
+    "INSERT INTO Households (house_name) SELECT DISTINCT house_name FROM HouseData "
+    "ORDER BY house_name",
+]
+
+
+def _migrate_to_v6(conn) :
+    for statement in _V6_STATEMENTS :
+        conn.execute(statement)
+
+
+## Version 7: foreign keys.
+#
+#  HouseData and ChoreData reference their household in Households, and
+#  ScoreLog and ChoreEvents reference their participant in HouseData and
+#  their chore in ChoreData, all ON DELETE CASCADE, so deleting a household,
+#  a participant or a chore deletes everything that depends on it in the
+#  same statement. Every child key is a prefix of a primary key or has an
+#  index, so a cascade is a range of an index. ChoreStore turns foreign keys
+#  on for its connections.
+#
+#  SQLite cannot add a foreign key to a table, so the four tables are
+#  rebuilt with their indexes and triggers. Scores and events of
+#  participants or chores that no longer exist are dropped, and the totals
+#  and rollups are recomputed.
+#
+_SCORE_PARENTS = ("EXISTS (SELECT 1 FROM HouseData AS p "
+                  "WHERE p.house_name = x.house_name AND p.person_name = x.person_name) "
+                  "AND EXISTS (SELECT 1 FROM ChoreData AS c "
+                  "WHERE c.house_name = x.house_name AND c.chore_name = x.chore_name)")
+_SCORE_KEYS = ("FOREIGN KEY (house_name, person_name) REFERENCES HouseData (house_name, person_name) "
+               "ON DELETE CASCADE, "
+               "FOREIGN KEY (house_name, chore_name) REFERENCES ChoreData (house_name, chore_name) "
+               "ON DELETE CASCADE")
+
+_V7_TABLES = [
+    ("HouseData",
+     "CREATE TABLE {} (house_name TEXT NOT NULL "
+     "REFERENCES Households (house_name) ON DELETE CASCADE, person_num INTEGER, "
+     "person_name TEXT NOT NULL, "
+     "PRIMARY KEY (house_name, person_name)) WITHOUT ROWID",
+     "SELECT house_name, person_num, person_name FROM HouseData"),
+    ("ChoreData",
+     "CREATE TABLE {} (house_name TEXT NOT NULL "
+     "REFERENCES Households (house_name) ON DELETE CASCADE, chore_num INTEGER, "
+     "chore_name TEXT NOT NULL, chore_freq INTEGER, "
+     "PRIMARY KEY (house_name, chore_name)) WITHOUT ROWID",
+     "SELECT house_name, chore_num, chore_name, chore_freq FROM ChoreData"),
+    ("ScoreLog",
+     "CREATE TABLE {} (house_name TEXT NOT NULL, person_num INTEGER, "
+     "person_name TEXT NOT NULL, chore_name TEXT NOT NULL, "
+     "chore_score INTEGER NOT NULL DEFAULT 0, "
+     "PRIMARY KEY (house_name, person_name, chore_name), " + _SCORE_KEYS + ") WITHOUT ROWID",
+     "SELECT house_name, person_num, person_name, chore_name, chore_score "
+     "FROM ScoreLog AS x WHERE " + _SCORE_PARENTS),
+    ("ChoreEvents",
+     "CREATE TABLE {} (event_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+     "house_name TEXT NOT NULL, person_name TEXT NOT NULL, chore_name TEXT NOT NULL, "
+     "count INTEGER NOT NULL CHECK (count <> 0), "
+     "logged_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')), "
+     + _SCORE_KEYS + ")",
+     "SELECT event_id, house_name, person_name, chore_name, count, logged_at "
+     "FROM ChoreEvents AS x WHERE " + _SCORE_PARENTS),
+]
+
+_V7_STATEMENTS = [
+    # Removals are by household now.
+    "DROP INDEX IF EXISTS HouseData_person",
+    "DROP INDEX IF EXISTS ChoreData_chore",
+    # Cascades from ChoreData.
+    "CREATE INDEX ScoreLog_house_chore ON ScoreLog (house_name, chore_name)",
+    "CREATE INDEX ChoreEvents_house_chore ON ChoreEvents (house_name, chore_name)",
+
+    "DELETE FROM ScoreTotals",
+    "DELETE FROM HouseTotals",
+    "INSERT INTO ScoreTotals (house_name, person_name, total) "
+    "SELECT house_name, person_name, SUM(score) FROM ("
+    "SELECT house_name, person_name, chore_score AS score FROM ScoreLog "
+    "UNION ALL SELECT house_name, person_name, 0 FROM HouseData) "
+    "GROUP BY house_name, person_name",
+    "INSERT INTO HouseTotals (house_name, total) "
+    "SELECT house_name, SUM(score) FROM ("
+    "SELECT house_name, chore_score AS score FROM ScoreLog "
+    "UNION ALL SELECT house_name, 0 FROM HouseData) "
+    "GROUP BY house_name",
+    "DELETE FROM ScoreRollups",
+] + _V5_STATEMENTS[-2:]
+
+
+def _rebuild_table(conn, table, create, copy) :
+    # The indexes and triggers are dropped with the table and made again.
+    saved = conn.execute("SELECT sql FROM sqlite_master WHERE tbl_name=? "
+                         "AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+                         (table,)).fetchall()
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name=?", (table,)).fetchone() \
+        if "sqlite_sequence" in table_names(conn) else None
+
+    conn.execute(create.format(table + "_v7"))
+    conn.execute("INSERT INTO {}_v7 {}".format(table, copy))
+    conn.execute("DROP TABLE {}".format(table))
+    # Triggers on other tables refer to the table by name while it is gone;
+    # the legacy rename does not check them.
+    conn.execute("PRAGMA legacy_alter_table=ON")
+    try :
+        conn.execute("ALTER TABLE {}_v7 RENAME TO {}".format(table, table))
+    finally :
+        conn.execute("PRAGMA legacy_alter_table=OFF")
+    for (sql,) in saved :
+        conn.execute(sql)
+    if sequence is not None :
+        # AUTOINCREMENT must not reuse the ids of events deleted earlier.
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name=?",
+                     (sequence[0], table))
+
+
+def _migrate_to_v7(conn) :
+    conn.execute("INSERT OR IGNORE INTO Households (house_name) "
+                 "SELECT DISTINCT house_name FROM ChoreData ORDER BY house_name")
+    for table, create, copy in _V7_TABLES :
+        _rebuild_table(conn, table, create, copy)
+    for statement in _V7_STATEMENTS :
+        conn.execute(statement)
+
+    if conn.execute("PRAGMA foreign_key_check").fetchone() is not None :
+        raise sqlite3.IntegrityError("Rows that break a foreign key remain after migrating.")
+
+
+## The migrations, indexed by the version they upgrade to.
+#
+MIGRATIONS = {
+    1: _migrate_to_v1,
+    2: _migrate_to_v2,
+    3: _migrate_to_v3,
+    4: _migrate_to_v4,
+    5: _migrate_to_v5,
+    6: _migrate_to_v6,
+    7: _migrate_to_v7,
+}
+
+
+##  Return the names of the tables in the database.
+#
+#   @param conn an open sqlite3 connection
+#   @return a set of table names
+#
+def table_names(conn) :
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    return {row[0] for row in rows}
+
+
+##  Return the schema version recorded in the database file.
+#
+#   @param conn an open sqlite3 connection
+#   @return the value of PRAGMA user_version
+#
+def schema_version(conn) :
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+##  Bring the database up to SCHEMA_VERSION.
+#   Each migration runs in its own transaction together with the update of
+#   user_version, so an interrupted upgrade leaves the file at the last
+#   completed version and is resumed the next time the file is opened.
+#
+#   @param conn an open sqlite3 connection
+#   @return the schema version after migrating
+#   @exception RuntimeError raised if the file was written by a newer version
+#
+def migrate(conn) :
+    version = schema_version(conn)
+    if version > SCHEMA_VERSION :
+        raise RuntimeError(("Database schema version {} is newer than the " +
+                            "supported version {}.").format(version, SCHEMA_VERSION))
+
+    if conn.in_transaction :
+        conn.commit()
+
+    # Tables are rebuilt with foreign keys off, as SQLite requires; the keys
+    # are checked by the migration that adds them.
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys=OFF")
+    try :
+        while version < SCHEMA_VERSION :
+            target = version + 1
+            conn.execute("BEGIN IMMEDIATE")
+            try :
+                MIGRATIONS[target](conn)
+                conn.execute("PRAGMA user_version = {}".format(target))
+                conn.commit()
+            except sqlite3.Error :
+                conn.rollback()
+                raise
+            version = target
+    finally :
+        conn.execute("PRAGMA foreign_keys={}".format("ON" if foreign_keys else "OFF"))
+
+    return version
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    print("Test 1: Migrate a database created by the original application")
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE HouseData (house_name TEXT, person_num INTEGER, person_name TEXT)")
+    conn.execute("CREATE TABLE ChoreData (house_name TEXT, chore_num INTEGER, chore_name TEXT, chore_freq INTEGER)")
+    conn.execute("CREATE TABLE ScoreLog (house_name TEXT, person_num INTEGER, person_name TEXT, chore_name TEXT, chore_score INTEGER DEFAULT 0)")
+    conn.executemany("INSERT INTO HouseData VALUES (?, ?, ?)",
+                     [("House1", 1, "fred"), ("House1", 2, "walt"), ("House1", 1, "fred")])
+    conn.execute("INSERT INTO ChoreData VALUES ('House1', 1, 'wash up', 3)")
+    conn.executemany("INSERT INTO ScoreLog VALUES (?, ?, ?, ?, ?)",
+                     [("House1", 1, "fred", "wash up", 3), ("House1", 1, "fred", "wash up", 3)])
+    conn.commit()
+    print("\tVERSION: ", migrate(conn))
+    print("\tHouseData: ", conn.execute("SELECT * FROM HouseData").fetchall())
+    print("\tScoreLog: ", conn.execute("SELECT * FROM ScoreLog").fetchall())
+
+    print("\nTest 2: Participants and chores added by the original application get scores")
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE HouseData (house_name TEXT, person_num INTEGER, person_name TEXT)")
+    conn.execute("CREATE TABLE ChoreData (house_name TEXT, chore_num INTEGER, chore_name TEXT, chore_freq INTEGER)")
+    conn.execute("CREATE TABLE ScoreLog (house_name TEXT, person_num INTEGER, person_name TEXT, chore_name TEXT, chore_score INTEGER DEFAULT 0)")
+    conn.executemany("INSERT INTO HouseData VALUES (?, ?, ?)",
+                     [("House1", 1, "fred"), ("House1", 2, "walt"), ("House1", 1, "jane")])
+    conn.executemany("INSERT INTO ChoreData VALUES (?, ?, ?, ?)",
+                     [("House1", 1, "wash up", 3), ("House1", 1, "hoover", 1)])
+    conn.executemany("INSERT INTO ScoreLog VALUES (?, ?, ?, ?, ?)",
+                     [("House1", 1, "fred", "wash up", 2), ("House1", 2, "walt", "wash up", 0),
+                      ("House1", 1, "jane", "hoover", 1)])
+    conn.commit()
+    migrate(conn)
+    print("\tROWS (expect 6): ", conn.execute("SELECT COUNT(*) FROM ScoreLog").fetchone()[0])
+    print("\tTOTALS (expect fred 2, jane 1, walt 0): ",
+          conn.execute("SELECT person_name, total FROM ScoreTotals ORDER BY person_name").fetchall())
+
+    print("\nTest 3: Migrating twice is a no-op")
+    print("\tVERSION: ", migrate(conn))
+
+    print("\nTest 4: A keyed lookup uses the primary key")
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT chore_score FROM ScoreLog "
+                        "WHERE house_name=? AND person_name=? AND chore_name=?",
+                        ("House1", "fred", "wash up")).fetchall()
+    print("\tPLAN: ", plan[0][3])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+##
+#  Score updates for Chore Chart.
+#
+#  Increments are appended to the ChoreEvents log and applied inside the
+#  database with UPDATE ... SET chore_score = chore_score + ? in the same
+#  transaction (see events_module), so concurrent writers sharing
+#  chore_chart.db never lose an increment.
+#  Each connection must belong to one thread; use one connection per thread
+#  or per process.
+
+import random
+import sqlite3
+import time
+
+from household_module import Household
+import events_module
+
+## Seconds a connection waits for a lock held by another writer
+#  (passed as the timeout argument of sqlite3.connect).
+BUSY_TIMEOUT = 5.0
+
+## Number of times a write is retried when the database stays locked
+#  after the busy timeout.
+MAX_RETRIES = 5
+
+## Delay before the first retry in seconds; doubled on each retry.
+RETRY_DELAY = 0.05
+
+
+##  Check whether an error was caused by another connection holding a lock.
+#
+#   @param err a sqlite3.OperationalError
+#   @return True or False
+#
+def is_busy_error(err) :
+    message = str(err)
+    return "locked" in message or "busy" in message
+
+
+##  Check the number of times a chore has been done is an integer within the
+#   limits of a single log entry.
+#
+#   @param number_completed the number to add on to the existing total
+#   @return True if valid, raise an exception if not.
+#
+def is_valid_number_completed(number_completed) :
+    if not isinstance(number_completed, int) or isinstance(number_completed, bool) :
+        raise TypeError("The number of chores done must be an integer.")
+
+    if number_completed < Household.MINIMUM_CHORES_DONE \
+        or number_completed > Household.MAXIMUM_CHORES_DONE :
+        raise ValueError(("The number of chores done must be greater or equal to " +
+                          "{} and less than or equal to {}.")
+            .format(Household.MINIMUM_CHORES_DONE, Household.MAXIMUM_CHORES_DONE))
+
+    return True
+
+
+##  Return the number of times a participant has done a chore.
+#
+#   @param conn an open sqlite3 connection
+#   @return the score, or None if the household has no such participant or chore
+#
+def get_score(conn, house_name, person_name, chore_name) :
+    row = conn.execute("SELECT chore_score FROM ScoreLog "
+                       "WHERE house_name=? AND person_name=? AND chore_name=?",
+                       (house_name, person_name, chore_name)).fetchone()
+    return None if row is None else row[0]
+
+
+##  Add to the number of times a participant has done a chore.
+#   The increment is appended to the event log and applied to ScoreLog by
+#   the database. If the connection
+#   has no transaction in progress the update is committed in its own
+#   transaction started by begin_immediate(); otherwise it joins the caller's
+#   transaction, which the caller commits.
+#
+#   @param conn an open sqlite3 connection used only by the calling thread
+#   @param house_name the name of the household
+#   @param person_name the name of the participant
+#   @param chore_name the name of the chore
+#   @param number_completed the number to add on to the existing total
+#   @param retries the number of times to retry a locked database
+#   @return the new score
+#   @exception LookupError raised if the household has no such participant or chore
+#   @exception sqlite3.OperationalError raised if the database stays locked
+#
+def increment_score(conn, house_name, person_name, chore_name, number_completed,
+                    retries=MAX_RETRIES) :
+    is_valid_number_completed(number_completed)
+
+    if conn.in_transaction :
+        return _apply_increment(conn, house_name, person_name, chore_name, number_completed)
+
+    begin_immediate(conn, retries)
+    try :
+        score = _apply_increment(conn, house_name, person_name, chore_name, number_completed)
+    except BaseException :
+        conn.rollback()
+        raise
+    conn.commit()
+    return score
+
+
+def _apply_increment(conn, house_name, person_name, chore_name, number_completed) :
+    score = events_module.log_event(conn, house_name, person_name, chore_name, number_completed)
+    if score is None :
+        raise LookupError(("{} has no chore {} in household {}.")
+                          .format(person_name, chore_name, house_name))
+    return score
+
+
+##  Start an IMMEDIATE transaction, which takes the write lock up front so
+#   that the statements in it never fail with a busy error. While another
+#   writer holds the lock past the busy timeout, retry with jittered
+#   exponential back-off.
+#
+#   @param conn an open sqlite3 connection with no transaction in progress
+#   @param retries the number of times to retry a locked database
+#   @exception sqlite3.OperationalError raised if the database stays locked
+#
+def begin_immediate(conn, retries=MAX_RETRIES) :
+    delay = RETRY_DELAY
+    attempt = 0
+    while True :
+        try :
+            conn.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as err :
+            if not is_busy_error(err) or attempt >= retries :
+                raise
+            attempt = attempt + 1
+            time.sleep(delay * (1 + random.random()))
+            delay = delay * 2
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import os
+    import tempfile
+    import threading
+    import schema_module
+
+    sqlite_file = os.path.join(tempfile.mkdtemp(), "scores_test.db")
+    conn = sqlite3.connect(sqlite_file, timeout=BUSY_TIMEOUT)
+    schema_module.migrate(conn)
+    conn.execute("INSERT INTO ScoreLog (house_name, person_num, person_name, chore_name) "
+                 "VALUES ('House1', 1, 'fred', 'wash up')")
+    conn.commit()
+
+    print("Test 1: Increment a score")
+    print("\tVALID: ", increment_score(conn, "House1", "fred", "wash up", 3))
+
+    print("\nTest 2: Increment a chore that does not exist")
+    try:
+        increment_score(conn, "House1", "fred", "dusting", 1)
+    except LookupError as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 3: Increment by an invalid number")
+    try:
+        increment_score(conn, "House1", "fred", "wash up", 0)
+    except ValueError as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 4: 8 threads each add 1, 50 times")
+    def worker():
+        thread_conn = sqlite3.connect(sqlite_file, timeout=BUSY_TIMEOUT)
+        for i in range(50):
+            increment_score(thread_conn, "House1", "fred", "wash up", 1)
+        thread_conn.close()
+
+    threads = [threading.Thread(target=worker) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print("\tSCORE (expect 403): ", get_score(conn, "House1", "fred", "wash up"))
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
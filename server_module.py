@@ -0,0 +1,486 @@
+##
+#  HTTP/JSON API for Chore Chart, built on asyncio and the standard library.
+#
+#  Endpoints (names in the path are URL-encoded):
+#      GET  /households[?limit=n][&after=name]   a page of households, with the
+#           [&prefix=text][&q=text]              after value of the next page;
+#                                                q is a substring, any case
+#      POST /households                          create a household
+#           {"household": "House1", "participants": ["fred", "walt"],
+#            "chores": [{"name": "wash up", "frequency": 3}, ...]}
+#      GET  /households/{house}                  participants and chores
+#      GET  /households/{house}/participants
+#      POST /households/{house}/participants     {"participants": ["jane"]}
+#      GET  /households/{house}/chores
+#      POST /households/{house}/chores           {"chores": [{"name": ..., "frequency": ...}]}
+#      POST /households/{house}/scores           log chores done, in one transaction
+#           {"logs": [{"participant": "fred", "chore": "wash up", "count": 2}, ...]}
+#      GET  /households/{house}/leaderboard[?limit=n]
+#           [&period=week|month&count=n] or [&from=YYYY-MM-DD&to=YYYY-MM-DD]
+#      GET  /leaderboard                         top participants of every
+#                                                household, same query
+#
+#  The event loop only parses requests and writes responses; every store
+#  call runs on a fixed-size thread pool. Connections are kept alive and
+#  pipelined requests are read ahead, run concurrently and answered in
+#  order. A request that writes waits for the earlier requests on its
+#  connection, and later requests wait for it, so a pipeline behaves as if
+#  it were sent one request at a time.
+#
+#  Usage: python server_module.py [--host host] [--port port] [--workers n]
+#                                 [--database file]
+
+import argparse
+import asyncio
+import datetime
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from chores_list_module import Chore
+from storage_module import ChoreStore
+import import_module
+import listing_module
+import rollups_module
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+
+## Number of threads running store calls.
+DEFAULT_WORKERS = 8
+
+## Seconds an idle keep-alive connection stays open.
+KEEP_ALIVE_TIMEOUT = 15
+
+## Requests read ahead on one connection before its responses are written.
+MAX_PIPELINE = 16
+
+## Limits on the size of a request.
+MAX_HEADERS = 100
+MAX_BODY = 1024 * 1024
+
+_READ_METHODS = ("GET", "HEAD")
+
+
+## An error answered with an HTTP status.
+#
+class HttpError(Exception) :
+
+    def __init__(self, status, message) :
+        Exception.__init__(self, message)
+        self.status = status
+
+
+##  Read one request from a connection.
+#
+#   @param reader an asyncio.StreamReader
+#   @return a dictionary with method, path, query, headers, body and
+#           keep_alive, or None at the end of the stream
+#   @exception HttpError raised if the request is malformed
+#
+async def read_request(reader) :
+    line = await reader.readline()
+    while line in (b"\r\n", b"\n") :
+        line = await reader.readline()
+    if not line :
+        return None
+
+    parts = line.decode("latin-1").split()
+    if len(parts) != 3 or not parts[2].startswith("HTTP/1.") :
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed request line.")
+    method, target, version = parts
+
+    headers = {}
+    while True :
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b"") :
+            break
+        if len(headers) >= MAX_HEADERS :
+            raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers.")
+        name, separator, value = line.decode("latin-1").partition(":")
+        if not separator :
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed header.")
+        headers[name.strip().lower()] = value.strip()
+
+    if "transfer-encoding" in headers :
+        raise HttpError(HTTPStatus.NOT_IMPLEMENTED, "Chunked requests are not supported.")
+    try :
+        length = int(headers.get("content-length", "0"))
+    except ValueError :
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Bad Content-Length.")
+    if length < 0 :
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Bad Content-Length.")
+    if length > MAX_BODY :
+        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "The request body is too large.")
+    body = await reader.readexactly(length) if length else b""
+
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.0" :
+        keep_alive = connection == "keep-alive"
+    else :
+        keep_alive = connection != "close"
+
+    url = urlsplit(target)
+    return {"method": method.upper(), "path": url.path, "query": parse_qs(url.query),
+            "headers": headers, "body": body, "keep_alive": keep_alive}
+
+
+##  Format a JSON response.
+#
+#   @param status an HTTPStatus
+#   @param payload an object that can be converted to JSON
+#   @param keep_alive whether the connection stays open
+#   @param head True to leave out the body, for HEAD requests
+#   @return the response as bytes
+#
+def format_response(status, payload, keep_alive, head=False) :
+    body = json.dumps(payload).encode("utf-8")
+    headers = ("HTTP/1.1 {} {}\r\n"
+               "Content-Type: application/json\r\n"
+               "Content-Length: {}\r\n"
+               "Connection: {}\r\n\r\n").format(status.value, status.phrase, len(body),
+                                                "keep-alive" if keep_alive else "close")
+    return headers.encode("latin-1") + (b"" if head else body)
+
+
+class ChoreServer() :
+
+    ## Constructor. Nothing is started until serve() is called.
+    #
+    #  @param store the ChoreStore requests are answered from
+    #  @param workers the number of threads running store calls
+    #
+    def __init__(self, store, workers=DEFAULT_WORKERS) :
+        self.store = store
+        self.workers = workers
+        self._executor = None
+
+    ##  Accept connections until cancelled.
+    #
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, started=None) :
+        self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                            thread_name_prefix="ChoreServer")
+        server = await asyncio.start_server(self._serve_connection, host, port)
+        if started is not None :
+            started(server)
+        try :
+            async with server :
+                await server.serve_forever()
+        finally :
+            self._executor.shutdown(wait=True)
+
+    async def _serve_connection(self, reader, writer) :
+        responses = asyncio.Queue(MAX_PIPELINE)
+        sender = asyncio.create_task(self._send_responses(responses, writer))
+        last_write = None       # the last writing request on this connection
+        since_write = []        # the requests after it
+
+        try :
+            while True :
+                try :
+                    request = await asyncio.wait_for(read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except HttpError as err :
+                    await responses.put((self._done(format_response(
+                        HTTPStatus(err.status), {"error": str(err)}, False)), False))
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError,
+                        asyncio.LimitOverrunError, ValueError, ConnectionError) :
+                    break
+                if request is None :
+                    break
+
+                if request["method"] in _READ_METHODS :
+                    waits = [last_write] if last_write is not None else []
+                    task = asyncio.create_task(self._respond(request, waits))
+                    since_write.append(task)
+                else :
+                    waits = since_write + ([last_write] if last_write is not None else [])
+                    task = asyncio.create_task(self._respond(request, waits))
+                    last_write, since_write = task, []
+
+                await responses.put((task, request["keep_alive"]))
+                if not request["keep_alive"] :
+                    break
+        finally :
+            await responses.put(None)
+            await sender
+
+    async def _send_responses(self, responses, writer) :
+        open_ = True
+        while True :
+            item = await responses.get()
+            if item is None :
+                break
+            task, keep_alive = item
+            response = await task
+            if not open_ :
+                continue
+            try :
+                writer.write(response)
+                await writer.drain()
+            except ConnectionError :
+                open_ = False
+            if not keep_alive :
+                open_ = False
+        writer.close()
+
+    def _done(self, response) :
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(response)
+        return future
+
+    async def _respond(self, request, waits) :
+        if waits :
+            await asyncio.wait(waits)
+        loop = asyncio.get_running_loop()
+        try :
+            status, payload = await loop.run_in_executor(self._executor, self.dispatch, request)
+        except RuntimeError as err :
+            # The executor was shut down while the request was waiting.
+            status, payload = HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(err)}
+        return format_response(status, payload, request["keep_alive"], request["method"] == "HEAD")
+
+    ##  Answer a request. Runs on a worker thread.
+    #
+    #   @param request a dictionary returned by read_request
+    #   @return a tuple (HTTPStatus, payload)
+    #
+    def dispatch(self, request) :
+        try :
+            segments = [unquote(segment) for segment in request["path"].strip("/").split("/")]
+            if segments == ["leaderboard"] and request["method"] in _READ_METHODS :
+                return self.get_top_participants(request)
+            if segments[0] != "households" :
+                raise HttpError(HTTPStatus.NOT_FOUND, "No such resource.")
+            return self._route(request, segments[1:])
+        except HttpError as err :
+            return (HTTPStatus(err.status), {"error": str(err)})
+        except LookupError as err :
+            return (HTTPStatus.NOT_FOUND, {"error": str(err).strip()})
+        except (ValueError, TypeError) as err :
+            return (HTTPStatus.BAD_REQUEST, {"error": str(err).strip()})
+        except Exception as err :
+            return (HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(err)})
+
+    def _route(self, request, segments) :
+        method = "GET" if request["method"] == "HEAD" else request["method"]
+
+        if not segments :
+            if method == "GET" :
+                return self.list_households(request)
+            if method == "POST" :
+                return self.create_household(self._json(request))
+            raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET or POST.")
+
+        house_name = segments[0]
+        resource = segments[1] if len(segments) == 2 else None
+        if len(segments) > 2 or (method, resource) not in self._ROUTES :
+            raise HttpError(HTTPStatus.NOT_FOUND, "No such resource.")
+        return self._ROUTES[(method, resource)](self, house_name, request)
+
+    def _json(self, request) :
+        try :
+            body = json.loads(request["body"] or b"{}")
+        except ValueError :
+            raise HttpError(HTTPStatus.BAD_REQUEST, "The request body is not valid JSON.")
+        if not isinstance(body, dict) :
+            raise HttpError(HTTPStatus.BAD_REQUEST, "The request body must be a JSON object.")
+        return body
+
+    def _items(self, body, key, fields) :
+        # The objects in body[key], each checked for the fields they need,
+        # so that a missing field is a bad request rather than a KeyError.
+        items = body.get(key, [])
+        if not isinstance(items, list) :
+            raise HttpError(HTTPStatus.BAD_REQUEST, "{} must be a list.".format(key))
+        for item in items :
+            if not isinstance(item, dict) or any(field not in item for field in fields) :
+                raise HttpError(HTTPStatus.BAD_REQUEST, "Each of {} needs {}.".format(
+                    key, " and ".join('"{}"'.format(field) for field in fields)))
+        return items
+
+    def _names(self, body, key) :
+        # The strings in body[key], so that a single name is a bad request
+        # rather than being read one character at a time.
+        names = body.get(key, [])
+        if not isinstance(names, list) or not all(isinstance(name, str) for name in names) :
+            raise HttpError(HTTPStatus.BAD_REQUEST, "{} must be a list of names.".format(key))
+        return names
+
+    def _require_household(self, house_name) :
+        if not self.store.household_exists(house_name) :
+            raise LookupError("Household {} does not exist.".format(house_name))
+
+    ##  POST /households
+    #
+    def create_household(self, body) :
+        house_name = body.get("household")
+        participants = self._names(body, "participants")
+        chores = [(chore["name"], chore["frequency"])
+                  for chore in self._items(body, "chores", ("name", "frequency"))]
+        import_module.validate_record(import_module.HouseholdRecord(None, house_name,
+                                                                    participants, chores))
+        if self.store.household_exists(house_name) :
+            raise HttpError(HTTPStatus.CONFLICT, "Household {} already exists.".format(house_name))
+
+        self.store.add_to_household(house_name, participants,
+                                    [Chore(name, int(frequency)) for name, frequency in chores])
+        return (HTTPStatus.CREATED, self.view_household(house_name, None)[1])
+
+    ##  GET /households
+    #
+    def list_households(self, request) :
+        query = request["query"]
+        page = self.store.list_households(query.get("after", [None])[0],
+                                          self._query_int(request, "limit") or
+                                          listing_module.PAGE_SIZE,
+                                          query.get("prefix", [None])[0], query.get("q", [None])[0])
+        return (HTTPStatus.OK, {"households": page.names, "next": page.next})
+
+    ##  GET /households/{house}
+    #
+    def view_household(self, house_name, request) :
+        self._require_household(house_name)
+        return (HTTPStatus.OK, {"household": house_name,
+                                "participants": self.store.participant_names(house_name),
+                                "chores": self._chores(house_name)})
+
+    def _chores(self, house_name) :
+        return [{"name": chore_name, "frequency": chore_freq}
+                for chore_name, chore_freq in self.store.chores(house_name)]
+
+    ##  GET /households/{house}/participants
+    #
+    def get_participants(self, house_name, request) :
+        self._require_household(house_name)
+        return (HTTPStatus.OK, {"participants": self.store.participant_names(house_name)})
+
+    ##  POST /households/{house}/participants
+    #
+    def add_participants(self, house_name, request) :
+        participants = self._names(self._json(request), "participants")
+        self.store.validate_addition(house_name, participants, [])
+        self.store.add_to_household(house_name, participants, [])
+        return self.get_participants(house_name, request)
+
+    ##  GET /households/{house}/chores
+    #
+    def get_chores(self, house_name, request) :
+        self._require_household(house_name)
+        return (HTTPStatus.OK, {"chores": self._chores(house_name)})
+
+    ##  POST /households/{house}/chores
+    #
+    def add_chores(self, house_name, request) :
+        chores = [Chore(chore["name"], int(chore["frequency"]))
+                  for chore in self._items(self._json(request), "chores", ("name", "frequency"))]
+        self.store.validate_addition(house_name, [], chores)
+        self.store.add_to_household(house_name, [], chores)
+        return self.get_chores(house_name, request)
+
+    ##  POST /households/{house}/scores
+    #
+    def log_scores(self, house_name, request) :
+        self._require_household(house_name)
+        logs = [(log["participant"], log["chore"], log["count"])
+                for log in self._items(self._json(request), "logs",
+                                       ("participant", "chore", "count"))]
+        if not logs :
+            raise ValueError("Nothing to log: give logs.")
+        scores = self.store.log_scores(house_name, logs)
+        return (HTTPStatus.OK, {"household": house_name,
+                                "scores": [{"participant": person_name, "chore": chore_name,
+                                            "score": score}
+                                           for (person_name, chore_name, count), score
+                                           in zip(logs, scores)]})
+
+    ##  GET /households/{house}/leaderboard
+    #
+    #   ?limit=n             the top n participants
+    #   ?period=week&count=n  the last n weeks (or months), this one included
+    #   ?from=day&to=day      a range of days, widened to whole weeks
+    #
+    def get_leaderboard(self, house_name, request) :
+        self._require_household(house_name)
+        limit = self._query_int(request, "limit")
+        window = self._window(request)
+        if window is None :
+            entries = self.store.leaderboard(house_name, limit)
+            result = {"household": house_name}
+        else :
+            entries = self.store.window_leaderboard(house_name, *window, limit=limit)
+            result = {"household": house_name, "period": window[0],
+                      "start": window[1], "end": window[2]}
+        result["leaderboard"] = [entry._asdict() for entry in entries]
+        return (HTTPStatus.OK, result)
+
+    ##  GET /leaderboard, the top participants across all households, with
+    #   the same query as GET /households/{house}/leaderboard.
+    #
+    def get_top_participants(self, request) :
+        limit = self._query_int(request, "limit") or 10
+        window = self._window(request)
+        if window is None :
+            ranks = [{"house_name": house_name, "person_name": person_name, "total": total}
+                     for house_name, person_name, total in self.store.top_participants(limit)]
+            result = {}
+        else :
+            ranks = [rank._asdict() for rank in
+                     self.store.window_top_participants(*window, limit=limit)]
+            result = {"period": window[0], "start": window[1], "end": window[2]}
+        result["leaderboard"] = ranks
+        return (HTTPStatus.OK, result)
+
+    def _query_int(self, request, name) :
+        value = request["query"].get(name)
+        return int(value[0]) if value else None
+
+    def _window(self, request) :
+        query = request["query"]
+        if "to" in query and "from" not in query :
+            raise HttpError(HTTPStatus.BAD_REQUEST, 'A "to" day needs a "from" day.')
+        if "from" in query :
+            last_day = query.get("to", [datetime.datetime.now(datetime.timezone.utc).date()])[0]
+            return ("week",) + rollups_module.range_window(query["from"][0], last_day)
+        if "period" in query :
+            period = query["period"][0]
+            return (period,) + rollups_module.recent_window(period,
+                                                            self._query_int(request, "count") or 1)
+        return None
+
+    _ROUTES = {("GET", None): view_household,
+               ("GET", "participants"): get_participants,
+               ("POST", "participants"): add_participants,
+               ("GET", "chores"): get_chores,
+               ("POST", "chores"): add_chores,
+               ("POST", "scores"): log_scores,
+               ("GET", "leaderboard"): get_leaderboard}
+
+
+## Run the server from the command line.
+#
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Chore Chart JSON API.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--database", default=ChoreStore.DEFAULT_FILE)
+    args = parser.parse_args(argv)
+
+    store = ChoreStore(args.database)
+    store.install_signal_handlers()
+    server = ChoreServer(store, args.workers)
+    print("Serving on http://{}:{} with {} workers".format(args.host, args.port, args.workers))
+    try :
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt :
+        pass
+    finally :
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,609 @@
+##
+#  Storage layer for Chore Chart.
+#
+#  A ChoreStore owns the connections to a chore_chart.db file and all of the
+#  SQL used by the application. Connections are opened lazily, one per thread,
+#  in WAL journal mode so readers never block the writer. Every write runs in
+#  its own explicit transaction and is committed when the operation finishes.
+#
+#  Statements are kept as module constants so that each connection's
+#  prepared statement cache (sqlite3's cached_statements) reuses them.
+
+import atexit
+import contextlib
+import signal
+import sqlite3
+import threading
+import time
+
+import events_module
+import leaderboard_module
+import listing_module
+import profile_module
+import rollups_module
+import scheduler_module
+import schema_module
+import scores_module
+import totals_module
+from chores_list_module import ChoresList
+from household_module import Household
+from participants_list_module import Participants
+
+_HOUSEHOLD_NAMES_SQL = "SELECT house_name FROM Households ORDER BY house_name"
+_HOUSEHOLD_EXISTS_SQL = "SELECT 1 FROM Households WHERE house_name=?"
+_PARTICIPANTS_SQL = ("SELECT person_name FROM HouseData WHERE house_name=? "
+                     "ORDER BY person_num, person_name")
+_CHORES_SQL = ("SELECT chore_name, chore_freq FROM ChoreData WHERE house_name=? "
+               "ORDER BY chore_num, chore_name")
+_SCORES_SQL = "SELECT person_name, chore_name, chore_score FROM ScoreLog WHERE house_name=?"
+_NEXT_PERSON_NUM_SQL = "SELECT COALESCE(MAX(person_num), 0) + 1 FROM HouseData WHERE house_name=?"
+_NEXT_CHORE_NUM_SQL = "SELECT COALESCE(MAX(chore_num), 0) + 1 FROM ChoreData WHERE house_name=?"
+_INSERT_PARTICIPANT_SQL = ("INSERT OR IGNORE INTO HouseData (house_name, person_num, person_name) "
+                           "VALUES (?, ?, ?)")
+_INSERT_CHORE_SQL = ("INSERT OR IGNORE INTO ChoreData (house_name, chore_num, chore_name, chore_freq) "
+                     "VALUES (?, ?, ?, ?)")
+_INSERT_SCORES_SQL = ("INSERT OR IGNORE INTO ScoreLog (house_name, person_num, person_name, chore_name) "
+                      "SELECT p.house_name, p.person_num, p.person_name, c.chore_name "
+                      "FROM HouseData AS p JOIN ChoreData AS c ON c.house_name = p.house_name "
+                      "WHERE p.house_name=?")
+_INSERT_HOUSEHOLD_SQL = "INSERT OR IGNORE INTO Households (house_name) VALUES (?)"
+# The scores and events of the participant or chore are deleted by the
+# foreign keys (see schema_module). A household keeps at least its minimum
+# number of participants and chores; only remove_household removes it.
+_REMOVE_PARTICIPANT_SQL = "DELETE FROM HouseData WHERE house_name=? AND person_name=?"
+_REMOVE_CHORE_SQL = "DELETE FROM ChoreData WHERE house_name=? AND chore_name=?"
+_REMOVE_HOUSEHOLD_SQL = "DELETE FROM Households WHERE house_name=?"
+_COUNT_PARTICIPANTS_SQL = "SELECT COUNT(*) FROM HouseData WHERE house_name=?"
+_COUNT_CHORES_SQL = "SELECT COUNT(*) FROM ChoreData WHERE house_name=?"
+# Children before parents, and the tables the triggers update first, so no
+# delete cascades and the triggers find nothing to update.
+_WIPE_SQL = ["DELETE FROM ScoreRollups", "DELETE FROM ScoreTotals", "DELETE FROM HouseTotals",
+             "DELETE FROM ChoreEvents", "DELETE FROM ScoreLog", "DELETE FROM HouseData",
+             "DELETE FROM ChoreData", "DELETE FROM Households"]
+
+
+# PRAGMA auto_vacuum value of INCREMENTAL.
+_AUTO_VACUUM_INCREMENTAL = 2
+
+
+class ChoreStore() :
+
+    DEFAULT_FILE = "chore_chart.db"
+
+    ## Size of the prepared statement cache of each connection.
+    CACHED_STATEMENTS = 128
+
+    ## Constructor for the store. No connection is opened until one is needed.
+    #
+    #  By default every write is committed as soon as it finishes. Group
+    #  commit is enabled by commit_every > 1 or by commit_interval_ms: writes
+    #  from all threads then share one writer connection and one open
+    #  transaction, which is committed after commit_every writes or once the
+    #  oldest uncommitted write is commit_interval_ms old, whichever comes
+    #  first. At most that many writes are lost on a crash. flush() and
+    #  close() commit immediately; install_signal_handlers() does the same on
+    #  SIGTERM and SIGHUP.
+    #
+    #  With incremental_vacuum the file is switched to auto_vacuum=INCREMENTAL
+    #  (with one VACUUM, the first time) and the pages freed by removals and
+    #  wipes are given back to the file system in the same transaction, so
+    #  the file shrinks by what was removed.
+    #
+    #  @param sqlite_file the path of the database file
+    #  @param commit_every the number of writes committed together
+    #  @param commit_interval_ms the longest time a write stays uncommitted,
+    #         None for no limit
+    #  @param incremental_vacuum True to reclaim space after removals
+    #  @param profiler a profile_module.Profiler to time every statement
+    #         with, None for no profiling. It must be set before the first
+    #         connection is opened.
+    #
+    def __init__(self, sqlite_file=DEFAULT_FILE, commit_every=1, commit_interval_ms=None,
+                 incremental_vacuum=False, profiler=None) :
+        if commit_every < 1 :
+            raise ValueError("commit_every must be at least 1.")
+        if commit_interval_ms is not None and commit_interval_ms <= 0 :
+            raise ValueError("commit_interval_ms must be positive.")
+
+        self.sqlite_file = sqlite_file
+        self.commit_every = commit_every
+        self.commit_interval_ms = commit_interval_ms
+        self.incremental_vacuum = incremental_vacuum
+        self.profiler = profiler
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._migrated = False
+
+        # Group commit state, guarded by _write_lock.
+        self._write_lock = threading.RLock()
+        self._writer = None
+        self._pending = 0
+        self._batch_started = None
+        self._in_write = False
+        self._flusher = None
+        self._stop = threading.Event()
+
+    ## True if writes are committed in groups.
+    #
+    @property
+    def group_commit(self) :
+        return self.commit_every > 1 or self.commit_interval_ms is not None
+
+    ## Return the connection of the calling thread, opening it (and bringing
+    #  the schema up to date) on first use.
+    #
+    def connection(self) :
+        conn = getattr(self._local, "conn", None)
+        if conn is None :
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def _connect(self) :
+        # isolation_level=None: no implicit transactions, every write goes
+        # through transaction() below.
+        conn = sqlite3.connect(self.sqlite_file, timeout=scores_module.BUSY_TIMEOUT,
+                               isolation_level=None, check_same_thread=False,
+                               cached_statements=ChoreStore.CACHED_STATEMENTS,
+                               factory=profile_module.ProfiledConnection if self.profiler
+                               else sqlite3.Connection)
+        if self.profiler is None :
+            self._set_up(conn, contextlib.nullcontext)
+        else :
+            conn.profiler = self.profiler
+            self._set_up(conn, self.profiler.action)
+        return conn
+
+    def _set_up(self, conn, action) :
+        # action(name) labels the statements for the profiler.
+        with action(profile_module.CONNECT) :
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+
+            with self._lock :
+                if not self._migrated :
+                    with action(profile_module.MIGRATE) :
+                        schema_module.migrate(conn)
+                        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+                        if self.incremental_vacuum and auto_vacuum != _AUTO_VACUUM_INCREMENTAL :
+                            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                            conn.execute("VACUUM")
+                    self._migrated = True
+                self._connections.append(conn)
+
+            conn.execute("PRAGMA foreign_keys=ON")
+
+    ## Run a block of statements as one write. Nested calls join the outer
+    #  write.
+    #
+    #  with store.transaction() as conn :
+    #      conn.execute(...)
+    #
+    #  Without group commit the block is one IMMEDIATE transaction on the
+    #  calling thread's connection. With group commit it is a savepoint in
+    #  the shared batch: a failing block is rolled back on its own and the
+    #  batch is committed when it is full or old enough.
+    #
+    @contextlib.contextmanager
+    def transaction(self) :
+        if self.group_commit :
+            with self._write_lock :
+                conn = self._writer_connection()
+                if self._in_write :
+                    # Nested inside another write on this thread.
+                    yield conn
+                    return
+                with self._batch_write(conn) :
+                    yield conn
+            return
+
+        conn = self.connection()
+        if conn.in_transaction :
+            yield conn
+            return
+
+        scores_module.begin_immediate(conn)
+        try :
+            yield conn
+        except BaseException :
+            conn.rollback()
+            raise
+        conn.commit()
+
+    @contextlib.contextmanager
+    def _batch_write(self, conn) :
+        if not conn.in_transaction :
+            scores_module.begin_immediate(conn)
+            self._batch_started = time.monotonic()
+
+        conn.execute("SAVEPOINT write")
+        self._in_write = True
+        try :
+            yield conn
+        except BaseException :
+            conn.execute("ROLLBACK TO write")
+            conn.execute("RELEASE write")
+            raise
+        finally :
+            self._in_write = False
+        conn.execute("RELEASE write")
+        self._pending = self._pending + 1
+
+        if self._pending >= self.commit_every or self._batch_expired() :
+            self._commit_batch()
+
+    def _writer_connection(self) :
+        if self._writer is None :
+            self._writer = self._connect()
+            if self.commit_interval_ms is not None :
+                self._flusher = threading.Thread(target=self._flush_periodically,
+                                                 name="ChoreStore-flusher", daemon=True)
+                self._flusher.start()
+            atexit.register(self.flush)
+        return self._writer
+
+    def _batch_expired(self) :
+        return self.commit_interval_ms is not None and self._batch_started is not None \
+            and (time.monotonic() - self._batch_started) * 1000 >= self.commit_interval_ms
+
+    def _commit_batch(self) :
+        if self._writer is not None and self._writer.in_transaction :
+            self._writer.commit()
+        self._pending = 0
+        self._batch_started = None
+
+    def _flush_periodically(self) :
+        interval = self.commit_interval_ms / 1000.0
+        while not self._stop.wait(interval / 2) :
+            with self._write_lock :
+                if self._pending and self._batch_expired() :
+                    self._commit_batch()
+
+    ## Commit the writes that group commit is holding back.
+    #
+    def flush(self) :
+        with self._write_lock :
+            self._commit_batch()
+
+    ## Flush on SIGTERM and SIGHUP, then let the previous handler run (or
+    #  exit). Must be called from the main thread.
+    #
+    def install_signal_handlers(self) :
+        for name in ("SIGTERM", "SIGHUP") :
+            signum = getattr(signal, name, None)
+            if signum is None :
+                continue
+            previous = signal.getsignal(signum)
+
+            def handler(received, frame, previous=previous) :
+                self.flush()
+                if callable(previous) :
+                    previous(received, frame)
+                elif previous != signal.SIG_IGN :
+                    raise SystemExit(128 + received)
+
+            signal.signal(signum, handler)
+
+    ## Yield the connection to read from. Reads normally use the calling
+    #  thread's connection; while group commit holds uncommitted writes they
+    #  use the writer connection, so a thread always sees its own writes.
+    #
+    @contextlib.contextmanager
+    def reading(self) :
+        if self._pending :
+            with self._write_lock :
+                if self._pending :
+                    yield self._writer
+                    return
+        yield self.connection()
+
+    ## Yield the calling thread's connection inside a read transaction, so
+    #  that several queries see the same snapshot of the database. In WAL
+    #  mode the snapshot does not block writers.
+    #
+    @contextlib.contextmanager
+    def snapshot(self) :
+        self.flush()
+        conn = self.connection()
+        if conn.in_transaction :
+            yield conn
+            return
+
+        conn.execute("BEGIN")
+        try :
+            yield conn
+        finally :
+            conn.rollback()
+
+    ## Commit any pending writes and close every connection opened by the store.
+    #
+    def close(self) :
+        self._stop.set()
+        if self._flusher is not None :
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+
+        with self._lock :
+            for conn in self._connections :
+                if conn.in_transaction :
+                    conn.commit()
+                conn.close()
+            self._connections = []
+            self._local = threading.local()
+            self._writer = None
+        self._stop.clear()
+
+    ##  Return the names of all households.
+    #
+    def household_names(self) :
+        with self.reading() as conn :
+            return [row[0] for row in conn.execute(_HOUSEHOLD_NAMES_SQL)]
+
+    ##  Check whether a household exists.
+    #
+    #   @param house_name the household name
+    #   @return True or False
+    #
+    def household_exists(self, house_name) :
+        with self.reading() as conn :
+            return conn.execute(_HOUSEHOLD_EXISTS_SQL, (house_name,)).fetchone() is not None
+
+    ##  Return a page of household names, optionally matching a prefix or a
+    #   substring. See listing_module.list_households.
+    #
+    #   @return a listing_module.HouseholdPage
+    #
+    def list_households(self, after=None, limit=listing_module.PAGE_SIZE, prefix=None,
+                        contains=None) :
+        with self.reading() as conn :
+            return listing_module.list_households(conn, after, limit, prefix, contains)
+
+    ##  Return the names of the participants of a household in the order they
+    #   were added.
+    #
+    def participant_names(self, house_name) :
+        with self.reading() as conn :
+            return [row[0] for row in conn.execute(_PARTICIPANTS_SQL, (house_name,))]
+
+    ##  Return the chores of a household in the order they were added.
+    #
+    #   @return a list of (chore_name, chore_freq)
+    #
+    def chores(self, house_name) :
+        with self.reading() as conn :
+            return conn.execute(_CHORES_SQL, (house_name,)).fetchall()
+
+    ##  Read everything about a household from one snapshot.
+    #
+    #   @param house_name the household name
+    #   @return a tuple (participant names, chores, scores) where chores is a
+    #           list of (chore_name, chore_freq) and scores a list of
+    #           (person_name, chore_name, chore_score), or None if there is no
+    #           such household
+    #
+    def household_data(self, house_name) :
+        with self.snapshot() as conn :
+            participant_names = [row[0] for row in conn.execute(_PARTICIPANTS_SQL, (house_name,))]
+            if not participant_names :
+                return None
+            return (participant_names, conn.execute(_CHORES_SQL, (house_name,)).fetchall(),
+                    conn.execute(_SCORES_SQL, (house_name,)).fetchall())
+
+    ##  Add participants and chores to a household, creating it if needed.
+    #   Every participant of the household gets a zero score for every chore
+    #   that they do not have a score for yet. Names that already exist in the
+    #   household are ignored. Runs in one transaction.
+    #
+    #   @param house_name the household name
+    #   @param participant_names an iterable of participant names
+    #   @param chores an iterable of Chore objects
+    #
+    def add_to_household(self, house_name, participant_names, chores) :
+        with self.transaction() as conn :
+            conn.execute(_INSERT_HOUSEHOLD_SQL, (house_name,))
+            person_num = conn.execute(_NEXT_PERSON_NUM_SQL, (house_name,)).fetchone()[0]
+            conn.executemany(_INSERT_PARTICIPANT_SQL,
+                             [(house_name, person_num + i, name)
+                              for i, name in enumerate(participant_names)])
+
+            chore_num = conn.execute(_NEXT_CHORE_NUM_SQL, (house_name,)).fetchone()[0]
+            conn.executemany(_INSERT_CHORE_SQL,
+                             [(house_name, chore_num + i, chore.chore_name, int(chore.frequency))
+                              for i, chore in enumerate(chores)])
+
+            conn.execute(_INSERT_SCORES_SQL, (house_name,))
+
+    ##  Check that participants and chores can be added to an existing
+    #   household. See Household.check_addition.
+    #
+    #   @return True if they can be added, raise ValueError or LookupError if not.
+    #
+    def validate_addition(self, house_name, participant_names, chores) :
+        with self.reading() as conn :
+            if conn.execute(_HOUSEHOLD_EXISTS_SQL, (house_name,)).fetchone() is None :
+                raise LookupError("Household {} does not exist.".format(house_name))
+            participants = {row[0] for row in conn.execute(_PARTICIPANTS_SQL, (house_name,))}
+            chore_names = {row[0] for row in conn.execute(_CHORES_SQL, (house_name,))}
+        return Household.check_addition(house_name, participants, chore_names,
+                                        participant_names, chores)
+
+    ##  Return the number of times a participant has done a chore, None if
+    #   there is no such score.
+    #
+    def get_score(self, house_name, person_name, chore_name) :
+        with self.reading() as conn :
+            return scores_module.get_score(conn, house_name, person_name, chore_name)
+
+    ##  Add to the number of times a participant has done a chore.
+    #   See scores_module.increment_score.
+    #
+    #   @return the new score
+    #
+    def increment_score(self, house_name, person_name, chore_name, number_completed) :
+        with self.transaction() as conn :
+            return scores_module.increment_score(conn, house_name, person_name,
+                                                 chore_name, number_completed)
+
+    ##  Add to several scores of a household in one transaction. If any
+    #   increment fails none of them are applied.
+    #
+    #   @param house_name the name of the household
+    #   @param entries an iterable of (person_name, chore_name, number_completed)
+    #   @return a list of the new scores, in the order of entries
+    #
+    def log_scores(self, house_name, entries) :
+        entries = list(entries)
+        for person_name, chore_name, number_completed in entries :
+            scores_module.is_valid_number_completed(number_completed)
+
+        with self.transaction() as conn :
+            return [scores_module.increment_score(conn, house_name, person_name,
+                                                  chore_name, number_completed)
+                    for person_name, chore_name, number_completed in entries]
+
+    ##  Return the most recent chore events of a household.
+    #   See events_module.history.
+    #
+    def history(self, house_name, person_name=None, limit=100) :
+        with self.reading() as conn :
+            return events_module.history(conn, house_name, person_name, limit)
+
+    ##  Apply any events not yet in the scores, or rebuild the scores from the
+    #   first event.
+    #
+    #   @param full True to replay every event, False to catch up from the
+    #          checkpoint
+    #   @return the new checkpoint
+    #
+    def replay_events(self, full=False) :
+        with self.transaction() as conn :
+            if full :
+                return events_module.replay(conn)
+            return events_module.catch_up(conn)
+
+    ##  Return the leaderboard of a household.
+    #   See leaderboard_module.get_leaderboard.
+    #
+    def leaderboard(self, house_name, limit=None) :
+        with self.reading() as conn :
+            return leaderboard_module.get_leaderboard(conn, house_name, limit)
+
+    ##  Return the leaderboard of a household over a window of weeks or
+    #   months. See rollups_module.window_leaderboard and
+    #   rollups_module.recent_window for the window.
+    #
+    def window_leaderboard(self, house_name, period, start, end, limit=None) :
+        with self.reading() as conn :
+            return rollups_module.window_leaderboard(conn, house_name, period, start, end, limit)
+
+    ##  Return the participants with the highest totals over a window across
+    #   all households. See rollups_module.window_top_participants.
+    #
+    def window_top_participants(self, period, start, end, limit) :
+        with self.reading() as conn :
+            return rollups_module.window_top_participants(conn, period, start, end, limit)
+
+    ##  Make a week's rota for a household. See scheduler_module.weekly_rota.
+    #
+    #   @return a Rota, or None if there is no such household
+    #
+    def rota(self, house_name, history_weight=1) :
+        data = self.household_data(house_name)
+        if data is None :
+            return None
+        participant_names, chores, scores = data
+        return scheduler_module.weekly_rota(house_name, participant_names, chores, scores,
+                                            history_weight)
+
+    ##  Make a week's rota for every household, from one snapshot.
+    #   See scheduler_module.household_rotas.
+    #
+    #   @return a list of Rota, in household name order
+    #
+    def rotas(self, history_weight=1) :
+        with self.snapshot() as conn :
+            return list(scheduler_module.household_rotas(conn, history_weight))
+
+    def _remove(self, statement, parameters, message, remaining=None) :
+        # remaining is (count query, minimum, message): if fewer rows than
+        # the minimum are left, the removal is rolled back.
+        with self.transaction() as conn :
+            if conn.execute(statement, parameters).rowcount == 0 :
+                raise LookupError(message)
+            if remaining is not None :
+                count_sql, minimum, too_few = remaining
+                if conn.execute(count_sql, parameters[:1]).fetchone()[0] < minimum :
+                    raise ValueError(too_few)
+            self._vacuum(conn)
+
+    def _vacuum(self, conn) :
+        if self.incremental_vacuum :
+            # The pragma frees one page per step, and sqlite3 only steps a
+            # statement that returns no columns once, even with fetchall(),
+            # so it is run once per free page.
+            for page in range(conn.execute("PRAGMA freelist_count").fetchone()[0]) :
+                conn.execute("PRAGMA incremental_vacuum")
+
+    ##  Remove a participant of a household with their scores and events.
+    #
+    #   @exception LookupError raised if there is no such participant
+    #   @exception ValueError raised if the household would have fewer than
+    #              Participants.MINIMUM_HOUSEHOLD_SIZE participants left
+    #
+    def remove_participant(self, house_name, person_name) :
+        self._remove(_REMOVE_PARTICIPANT_SQL, (house_name, person_name),
+                     "{} is not a participant of household {}.".format(person_name, house_name),
+                     (_COUNT_PARTICIPANTS_SQL, Participants.MINIMUM_HOUSEHOLD_SIZE,
+                      "The number of participants in household {} must be more than {}."
+                      .format(house_name, Participants.MINIMUM_HOUSEHOLD_SIZE - 1)))
+
+    ##  Remove a chore of a household with its scores and events.
+    #
+    #   @exception LookupError raised if there is no such chore
+    #   @exception ValueError raised if the household would have fewer than
+    #              ChoresList.MINIMUM_NUMBER_OF_CHORES chores left
+    #
+    def remove_chore(self, house_name, chore_name) :
+        self._remove(_REMOVE_CHORE_SQL, (house_name, chore_name),
+                     "{} is not a chore of household {}.".format(chore_name, house_name),
+                     (_COUNT_CHORES_SQL, ChoresList.MINIMUM_NUMBER_OF_CHORES,
+                      "The number of chores in household {} must be more than {}."
+                      .format(house_name, ChoresList.MINIMUM_NUMBER_OF_CHORES - 1)))
+
+    ##  Remove a household with everything in it.
+    #
+    def remove_household(self, house_name) :
+        self._remove(_REMOVE_HOUSEHOLD_SQL, (house_name,),
+                     "Household {} does not exist.".format(house_name))
+
+    ##  Remove every household.
+    #
+    def wipe(self) :
+        with self.transaction() as conn :
+            for statement in _WIPE_SQL :
+                conn.execute(statement)
+            self._vacuum(conn)
+
+    ##  Return the participants with the highest totals across all households.
+    #   See totals_module.top_participants.
+    #
+    def top_participants(self, limit) :
+        with self.reading() as conn :
+            return totals_module.top_participants(conn, limit)
+
+    ##  Return a participant's total and rank within their household.
+    #   See totals_module.participant_rank.
+    #
+    def participant_rank(self, house_name, person_name) :
+        with self.reading() as conn :
+            return totals_module.participant_rank(conn, house_name, person_name)
+
+    ##  Recompute the materialized totals and return any remaining mismatches.
+    #   See totals_module.rebuild_totals and totals_module.check_totals.
+    #
+    def rebuild_totals(self) :
+        self.flush()
+        totals_module.rebuild_totals(self.connection())
+        return totals_module.check_totals(self.connection())
@@ -0,0 +1,184 @@
+##
+#  Materialized score totals.
+#
+#  ScoreTotals and HouseTotals are maintained by triggers on ScoreLog and
+#  HouseData (see schema_module), so reading a total, a rank or the top N is
+#  an index lookup.
+#  This module reads them and can rebuild and check them against ScoreLog.
+#
+#  Usage: python totals_module.py [--check] [database]
+#         rebuilds the totals, or with --check only reports mismatches.
+
+import sqlite3
+import sys
+from collections import namedtuple
+
+## A participant's total and rank.
+#  rank       position within the household, equal totals share a rank
+#  total      the participant's total score
+#
+ParticipantRank = namedtuple("ParticipantRank", ["house_name", "person_name", "total", "rank"])
+
+## A difference between ScoreTotals/HouseTotals and the totals computed from ScoreLog.
+#  stored     the materialized total, None if the row is missing
+#  expected   the total computed from ScoreLog, None if there should be no row
+#
+TotalMismatch = namedtuple("TotalMismatch", ["house_name", "person_name", "stored", "expected"])
+
+# Every participant and household has a total, zero if it has no scores.
+_PERSON_TOTALS_SQL = ("SELECT house_name, person_name, SUM(score) AS total FROM ("
+                      "SELECT house_name, person_name, chore_score AS score FROM ScoreLog "
+                      "UNION ALL SELECT house_name, person_name, 0 FROM HouseData) "
+                      "GROUP BY house_name, person_name")
+_HOUSE_TOTALS_SQL = ("SELECT house_name, SUM(score) AS total FROM ("
+                     "SELECT house_name, chore_score AS score FROM ScoreLog "
+                     "UNION ALL SELECT house_name, 0 FROM HouseData) "
+                     "GROUP BY house_name")
+
+
+##  Return the participants with the highest totals across all households.
+#
+#   @param conn an open sqlite3 connection
+#   @param limit the number of participants to return
+#   @return a list of (house_name, person_name, total), best first
+#
+def top_participants(conn, limit) :
+    if not isinstance(limit, int) or limit < 1 :
+        raise ValueError("Leaderboard limit must be a positive integer.")
+    return conn.execute("SELECT house_name, person_name, total FROM ScoreTotals "
+                        "ORDER BY total DESC LIMIT ?", (limit,)).fetchall()
+
+
+##  Return the households with the highest totals.
+#
+#   @param conn an open sqlite3 connection
+#   @param limit the number of households to return
+#   @return a list of (house_name, total), best first
+#
+def top_households(conn, limit) :
+    if not isinstance(limit, int) or limit < 1 :
+        raise ValueError("Leaderboard limit must be a positive integer.")
+    return conn.execute("SELECT house_name, total FROM HouseTotals "
+                        "ORDER BY total DESC LIMIT ?", (limit,)).fetchall()
+
+
+##  Return a participant's total and rank within their household.
+#
+#   @param conn an open sqlite3 connection
+#   @param house_name the name of the household
+#   @param person_name the name of the participant
+#   @return a ParticipantRank, or None if the participant has no scores
+#
+def participant_rank(conn, house_name, person_name) :
+    row = conn.execute("SELECT total FROM ScoreTotals WHERE house_name=? AND person_name=?",
+                       (house_name, person_name)).fetchone()
+    if row is None :
+        return None
+
+    total = row[0]
+    better = conn.execute("SELECT COUNT(*) FROM ScoreTotals WHERE house_name=? AND total>?",
+                          (house_name, total)).fetchone()[0]
+    return ParticipantRank(house_name, person_name, total, better + 1)
+
+
+##  Return a participant's rank across all households.
+#
+#   @param conn an open sqlite3 connection
+#   @param house_name the name of the household
+#   @param person_name the name of the participant
+#   @return a ParticipantRank, or None if the participant has no scores
+#
+def overall_rank(conn, house_name, person_name) :
+    row = conn.execute("SELECT total FROM ScoreTotals WHERE house_name=? AND person_name=?",
+                       (house_name, person_name)).fetchone()
+    if row is None :
+        return None
+
+    total = row[0]
+    better = conn.execute("SELECT COUNT(*) FROM ScoreTotals WHERE total>?",
+                          (total,)).fetchone()[0]
+    return ParticipantRank(house_name, person_name, total, better + 1)
+
+
+##  Recompute ScoreTotals and HouseTotals from ScoreLog in one transaction.
+#
+#   @param conn an open sqlite3 connection with no transaction in progress
+#
+def rebuild_totals(conn) :
+    conn.execute("BEGIN IMMEDIATE")
+    try :
+        conn.execute("DELETE FROM ScoreTotals")
+        conn.execute("DELETE FROM HouseTotals")
+        conn.execute("INSERT INTO ScoreTotals (house_name, person_name, total) " + _PERSON_TOTALS_SQL)
+        conn.execute("INSERT INTO HouseTotals (house_name, total) " + _HOUSE_TOTALS_SQL)
+    except sqlite3.Error :
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+##  Compare the materialized totals with the totals computed from ScoreLog.
+#
+#   @param conn an open sqlite3 connection
+#   @return a list of TotalMismatch, empty if the totals are consistent.
+#           Household mismatches have person_name None.
+#
+def check_totals(conn) :
+    mismatches = []
+
+    rows = conn.execute(
+        "WITH expected AS (" + _PERSON_TOTALS_SQL + ") "
+        "SELECT e.house_name, e.person_name, t.total, e.total FROM expected AS e "
+        "LEFT JOIN ScoreTotals AS t "
+        "ON t.house_name = e.house_name AND t.person_name = e.person_name "
+        "WHERE t.total IS NOT e.total "
+        "UNION ALL "
+        "SELECT t.house_name, t.person_name, t.total, NULL FROM ScoreTotals AS t "
+        "WHERE NOT EXISTS (SELECT 1 FROM ScoreLog AS s "
+        "WHERE s.house_name = t.house_name AND s.person_name = t.person_name) "
+        "AND NOT EXISTS (SELECT 1 FROM HouseData AS p "
+        "WHERE p.house_name = t.house_name AND p.person_name = t.person_name)")
+    mismatches.extend(TotalMismatch(*row) for row in rows)
+
+    rows = conn.execute(
+        "WITH expected AS (" + _HOUSE_TOTALS_SQL + ") "
+        "SELECT e.house_name, NULL, t.total, e.total FROM expected AS e "
+        "LEFT JOIN HouseTotals AS t ON t.house_name = e.house_name "
+        "WHERE t.total IS NOT e.total "
+        "UNION ALL "
+        "SELECT t.house_name, NULL, t.total, NULL FROM HouseTotals AS t "
+        "WHERE NOT EXISTS (SELECT 1 FROM ScoreLog AS s WHERE s.house_name = t.house_name) "
+        "AND NOT EXISTS (SELECT 1 FROM HouseData AS p WHERE p.house_name = t.house_name)")
+    mismatches.extend(TotalMismatch(*row) for row in rows)
+
+    return mismatches
+
+
+## Rebuild or check the totals of a database file.
+#
+def main(argv=None):
+    import schema_module
+
+    args = sys.argv[1:] if argv is None else argv
+    check_only = "--check" in args
+    files = [arg for arg in args if arg != "--check"]
+    sqlite_file = files[0] if files else "chore_chart.db"
+
+    conn = sqlite3.connect(sqlite_file)
+    schema_module.migrate(conn)
+
+    if not check_only :
+        rebuild_totals(conn)
+        print("Totals rebuilt from ScoreLog.")
+
+    mismatches = check_totals(conn)
+    conn.close()
+    for mismatch in mismatches :
+        print("\tMISMATCH: ", mismatch)
+    print("{} mismatches found.".format(len(mismatches)))
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
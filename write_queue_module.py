@@ -0,0 +1,276 @@
+##
+#  Coalescing write queue for score updates.
+#
+#  Increments submitted by any thread are held in a dictionary keyed by
+#  (house_name, person_name, chore_name); increments for the same key are
+#  merged into one delta. A worker thread takes everything pending as a batch,
+#  appends it to the event log with one executemany() and applies it to
+#  ScoreLog with one catch-up, in one transaction, then resolves a Future per
+#  submission with the new score.
+#
+#  The queue is opt-in: ChoreStore.increment_score, the menu and the HTTP
+#  server still write each increment in its own transaction, and nothing in
+#  Chore Chart creates a queue. A program that logs many increments from many
+#  threads puts one in front of the store and calls submit() or increment()
+#  instead of ChoreStore.increment_score:
+#
+#      queue = ScoreWriteQueue(store)
+#      future = queue.submit("House1", "fred", "wash up", 2)
+#      future.result()     # the new score, once the batch is committed
+#      queue.close()
+
+import threading
+import time
+from concurrent.futures import Future
+
+import events_module
+import scores_module
+
+_SCORES_SQL = ("SELECT house_name, person_name, chore_name, chore_score FROM ScoreLog "
+               "WHERE (house_name, person_name, chore_name) IN (VALUES {})")
+
+## Number of keys looked up per SELECT after a batch is applied.
+_LOOKUP_CHUNK = 250
+
+
+class ScoreWriteQueue() :
+
+    ## Constructor. Starts the worker thread.
+    #
+    #  @param store the ChoreStore the scores are written to
+    #  @param max_batch the largest number of keys applied in one transaction
+    #  @param linger_ms how long the worker waits for more increments after
+    #         the first one arrives, 0 to apply immediately
+    #
+    def __init__(self, store, max_batch=1000, linger_ms=2) :
+        self._store = store
+        self.max_batch = max_batch
+        self.linger_ms = linger_ms
+
+        self._condition = threading.Condition()
+        self._pending = {}          # key -> [delta, [futures], first submitted]
+        self._queued = 0            # submissions in _pending
+        self._in_flight = 0         # submissions being applied
+        self._closed = False
+
+        self._submitted = 0
+        self._batches = 0
+        self._applied_keys = 0
+        self._flush_total = 0.0
+        self._flush_max = 0.0
+        self._flush_last = 0.0
+        self._wait_max = 0.0
+
+        self._worker = threading.Thread(target=self._run, name="ScoreWriteQueue", daemon=True)
+        self._worker.start()
+
+    ##  Queue an increment.
+    #
+    #   @param house_name the name of the household
+    #   @param person_name the name of the participant
+    #   @param chore_name the name of the chore
+    #   @param number_completed the number to add on to the existing total
+    #   @return a Future whose result is the score after the batch containing
+    #           this increment was committed. Its exception is LookupError if
+    #           the household has no such participant or chore.
+    #
+    def submit(self, house_name, person_name, chore_name, number_completed) :
+        scores_module.is_valid_number_completed(number_completed)
+        future = Future()
+        key = (house_name, person_name, chore_name)
+
+        with self._condition :
+            if self._closed :
+                raise RuntimeError("The write queue is closed.")
+            entry = self._pending.get(key)
+            if entry is None :
+                self._pending[key] = [number_completed, [future], time.monotonic()]
+            else :
+                entry[0] = entry[0] + number_completed
+                entry[1].append(future)
+            self._queued = self._queued + 1
+            self._submitted = self._submitted + 1
+            self._condition.notify()
+
+        return future
+
+    ##  Queue an increment and wait for it to be committed.
+    #
+    #   @return the new score
+    #
+    def increment(self, house_name, person_name, chore_name, number_completed, timeout=None) :
+        return self.submit(house_name, person_name, chore_name, number_completed).result(timeout)
+
+    ##  Return the number of distinct keys waiting to be written.
+    #
+    def depth(self) :
+        with self._condition :
+            return len(self._pending)
+
+    ##  Return statistics for sizing the queue.
+    #
+    #   @return a dictionary containing:
+    #           depth           keys waiting to be written
+    #           queued          submissions waiting to be written
+    #           submitted       submissions since the queue was created
+    #           batches         batches applied
+    #           applied_keys    keys written; submitted / applied_keys is the
+    #                           coalescing ratio
+    #           flush_ms_last, flush_ms_mean, flush_ms_max
+    #                           time to apply and commit a batch
+    #           wait_ms_max     longest time a submission waited to be applied
+    #
+    def stats(self) :
+        with self._condition :
+            return {"depth": len(self._pending),
+                    "queued": self._queued,
+                    "submitted": self._submitted,
+                    "batches": self._batches,
+                    "applied_keys": self._applied_keys,
+                    "flush_ms_last": self._flush_last * 1000,
+                    "flush_ms_mean": self._flush_total * 1000 / self._batches if self._batches else 0.0,
+                    "flush_ms_max": self._flush_max * 1000,
+                    "wait_ms_max": self._wait_max * 1000}
+
+    ##  Wait until everything submitted so far has been written.
+    #
+    def flush(self, timeout=None) :
+        with self._condition :
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda : not self._queued and not self._in_flight,
+                                            timeout)
+
+    ##  Write everything pending and stop the worker.
+    #
+    def close(self) :
+        with self._condition :
+            self._closed = True
+            self._condition.notify_all()
+        self._worker.join()
+
+    def _take_batch(self) :
+        with self._condition :
+            self._condition.wait_for(lambda : self._pending or self._closed)
+            if not self._pending :
+                return None
+
+            if self.linger_ms and not self._closed and len(self._pending) < self.max_batch :
+                self._condition.wait(self.linger_ms / 1000.0)
+
+            if len(self._pending) <= self.max_batch :
+                batch = self._pending
+                self._pending = {}
+            else :
+                keys = list(self._pending)[:self.max_batch]
+                batch = {key: self._pending.pop(key) for key in keys}
+
+            taken = sum(len(entry[1]) for entry in batch.values())
+            self._queued = self._queued - taken
+            self._in_flight = taken
+            return batch
+
+    def _run(self) :
+        while True :
+            batch = self._take_batch()
+            if batch is None :
+                return
+
+            started = time.monotonic()
+            try :
+                scores = self._apply(batch)
+                error = None
+            except Exception as err :
+                scores = {}
+                error = err
+            finished = time.monotonic()
+
+            for key, (delta, futures, submitted) in batch.items() :
+                for future in futures :
+                    if error is not None :
+                        future.set_exception(error)
+                    elif key in scores :
+                        future.set_result(scores[key])
+                    else :
+                        future.set_exception(LookupError(("{} has no chore {} in household {}.")
+                                                         .format(key[1], key[2], key[0])))
+
+            with self._condition :
+                elapsed = finished - started
+                self._batches = self._batches + 1
+                self._applied_keys = self._applied_keys + len(batch)
+                self._flush_last = elapsed
+                self._flush_total = self._flush_total + elapsed
+                self._flush_max = max(self._flush_max, elapsed)
+                oldest = min(entry[2] for entry in batch.values())
+                self._wait_max = max(self._wait_max, finished - oldest)
+                self._in_flight = 0
+                self._condition.notify_all()
+
+    def _apply(self, batch) :
+        keys = list(batch)
+        scores = {}
+        with self._store.transaction() as conn :
+            events_module.append_events(conn, [key + (batch[key][0],) for key in keys])
+            events_module.catch_up(conn)
+            for start in range(0, len(keys), _LOOKUP_CHUNK) :
+                chunk = keys[start:start + _LOOKUP_CHUNK]
+                sql = _SCORES_SQL.format(", ".join(["(?, ?, ?)"] * len(chunk)))
+                params = [value for key in chunk for value in key]
+                for house_name, person_name, chore_name, chore_score in conn.execute(sql, params) :
+                    scores[(house_name, person_name, chore_name)] = chore_score
+        return scores
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import os
+    import tempfile
+    from chores_list_module import Chore
+    from storage_module import ChoreStore
+
+    directory = tempfile.mkdtemp()
+    store = ChoreStore(os.path.join(directory, "write_queue.db"))
+    store.add_to_household("House1", ["fred", "walt"], [Chore("wash up", 3), Chore("dusting", 1)])
+    queue = ScoreWriteQueue(store, linger_ms=50)
+
+    print("Test 1: Increments for the same key are coalesced")
+    futures = [queue.submit("House1", "fred", "wash up", 1) for i in range(10)]
+    futures.append(queue.submit("House1", "walt", "dusting", 2))
+    print("\tSCORES (expect 10 x 10, 2): ", [future.result(5) for future in futures])
+    stats = queue.stats()
+    print("\tCOALESCED (expect 11 submitted, 2 keys): ", stats["submitted"], stats["applied_keys"])
+
+    print("\nTest 2: Unknown keys fail with LookupError, the rest of the batch is written")
+    unknown = queue.submit("House1", "jane", "wash up", 1)
+    known = queue.submit("House1", "walt", "wash up", 4)
+    try:
+        unknown.result(5)
+    except LookupError as err:
+        print("\tERROR: ", err)
+    print("\tSCORE (expect 4): ", known.result(5))
+
+    print("\nTest 3: Flush waits for everything submitted")
+    for i in range(5) :
+        queue.submit("House1", "fred", "dusting", 1)
+    print("\tFLUSHED: ", queue.flush(5), queue.depth())
+    print("\tDATABASE (expect 5): ", store.get_score("House1", "fred", "dusting"))
+
+    print("\nTest 4: Statistics")
+    print("\tVALID: ", queue.stats())
+
+    print("\nTest 5: Close writes what is pending, then refuses more")
+    last = queue.submit("House1", "walt", "dusting", 1)
+    queue.close()
+    print("\tSCORE (expect 3): ", last.result(0))
+    try:
+        queue.submit("House1", "walt", "dusting", 1)
+    except RuntimeError as err:
+        print("\tERROR: ", err)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()